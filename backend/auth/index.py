@@ -1,21 +1,34 @@
 '''
 Business: Authentication system for admin panel
-Args: event with httpMethod, body, headers, queryStringParameters
+Args: event with httpMethod, body, headers, queryStringParameters (mode=stats for admin timings)
 Returns: HTTP response with JWT token or user data
 '''
 
 import json
+import math
 import os
-import jwt
-import bcrypt
-from datetime import datetime, timedelta
 from typing import Dict, Any
-import psycopg2
 from psycopg2.extras import RealDictCursor
+from db import get_connection, get_pool, release_connection
+from instrumentation import annotate, instrumented, phase, stats as timing_stats
+from querystats import report as query_report
+from tokens import AuthError, authenticate, cache_stats, issue_token, load_user, revoke_tokens
+from limiter import attempt_keys, client_ip, record_failure, record_success, retry_after
+from passwords import BcryptBusyError, check_password, hash_password, needs_rehash
 
-def escape_sql_string(value: str) -> str:
-    return value.replace("'", "''")
+def too_many_attempts(wait: float) -> Dict[str, Any]:
+    return {
+        'statusCode': 429,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Retry-After': str(int(math.ceil(wait)))
+        },
+        'body': json.dumps({'ok': False, 'error': 'Too many login attempts, try again later'}),
+        'isBase64Encoded': False
+    }
 
+@instrumented
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
     
@@ -24,7 +37,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'statusCode': 200,
             'headers': {
                 'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+                'Access-Control-Allow-Methods': 'GET, POST, DELETE, OPTIONS',
                 'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Auth-Token',
                 'Access-Control-Max-Age': '86400'
             },
@@ -46,7 +59,8 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     
     conn = None
     try:
-        conn = psycopg2.connect(dsn)
+        with phase('connect'):
+            conn = get_connection(dsn)
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         
         if method == 'POST':
@@ -65,12 +79,23 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'isBase64Encoded': False
                 }
             
-            escaped_username = escape_sql_string(username)
-            query = f"SELECT id, username, password_hash, email, full_name, role, is_active FROM t_p37006348_real_estate_agency_w.admin_users WHERE username = '{escaped_username}'"
-            cursor.execute(query)
+            keys = attempt_keys(username, client_ip(event))
+            wait = retry_after(cursor, keys)
+            if wait:
+                return too_many_attempts(wait)
+            
+            cursor.execute(
+                'SELECT id, username, password_hash, email, full_name, role, is_active, token_version '
+                'FROM t_p37006348_real_estate_agency_w.admin_users WHERE username = %s',
+                (username,)
+            )
             user = cursor.fetchone()
             
             if not user:
+                wait = record_failure(cursor, keys)
+                conn.commit()
+                if wait:
+                    return too_many_attempts(wait)
                 return {
                     'statusCode': 401,
                     'headers': {
@@ -92,22 +117,20 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'isBase64Encoded': False
                 }
             
-            password_hash = user['password_hash']
-            print(f"DEBUG: password_hash type: {type(password_hash)}, value: {password_hash}")
-            
-            if isinstance(password_hash, str):
-                password_hash_bytes = password_hash.encode('utf-8')
-            else:
-                password_hash_bytes = password_hash
-            
-            print(f"DEBUG: password_hash_bytes type: {type(password_hash_bytes)}, value: {password_hash_bytes}")
-            print(f"DEBUG: password to check: {password}")
-            
             try:
-                password_match = bcrypt.checkpw(password.encode('utf-8'), password_hash_bytes)
-                print(f"DEBUG: password_match result: {password_match}")
-            except Exception as e:
-                print(f"DEBUG: bcrypt.checkpw error: {str(e)}, type: {type(e)}")
+                password_match = check_password(password, user['password_hash'])
+            except BcryptBusyError:
+                return {
+                    'statusCode': 503,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*',
+                        'Retry-After': '1'
+                    },
+                    'body': json.dumps({'ok': False, 'error': 'Too many logins in progress, try again'}),
+                    'isBase64Encoded': False
+                }
+            except ValueError as e:
                 return {
                     'statusCode': 500,
                     'headers': {
@@ -119,6 +142,10 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 }
             
             if not password_match:
+                wait = record_failure(cursor, keys)
+                conn.commit()
+                if wait:
+                    return too_many_attempts(wait)
                 return {
                     'statusCode': 401,
                     'headers': {
@@ -129,20 +156,21 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'isBase64Encoded': False
                 }
             
-            update_query = f"UPDATE t_p37006348_real_estate_agency_w.admin_users SET last_login = CURRENT_TIMESTAMP WHERE id = {user['id']}"
-            cursor.execute(update_query)
+            record_success(cursor, keys[0])
+            if needs_rehash(user['password_hash']):
+                cursor.execute(
+                    'UPDATE t_p37006348_real_estate_agency_w.admin_users '
+                    'SET last_login = CURRENT_TIMESTAMP, password_hash = %s WHERE id = %s',
+                    (hash_password(password), user['id'])
+                )
+            else:
+                cursor.execute(
+                    'UPDATE t_p37006348_real_estate_agency_w.admin_users SET last_login = CURRENT_TIMESTAMP WHERE id = %s',
+                    (user['id'],)
+                )
             conn.commit()
             
-            secret_key = os.environ.get('JWT_SECRET', 'default-secret-change-in-production')
-            payload = {
-                'user_id': user['id'],
-                'username': user['username'],
-                'role': user['role'],
-                'exp': datetime.utcnow() + timedelta(days=7),
-                'iat': datetime.utcnow()
-            }
-            
-            token = jwt.encode(payload, secret_key, algorithm='HS256')
+            token = issue_token(user)
             
             return {
                 'statusCode': 200,
@@ -167,81 +195,94 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             }
         
         elif method == 'GET':
-            headers = event.get('headers', {})
-            token = headers.get('X-Auth-Token') or headers.get('x-auth-token', '')
-            
-            if not token:
+            query_params = event.get('queryStringParameters') or {}
+            show_stats = query_params.get('mode') == 'stats'
+            if show_stats:
+                annotate(route='GET stats')
+            try:
+                with phase('auth'):
+                    payload = authenticate(event.get('headers') or {}, cursor, require_admin=show_stats)
+            except AuthError as e:
                 return {
-                    'statusCode': 401,
+                    'statusCode': e.status_code,
                     'headers': {
                         'Content-Type': 'application/json',
                         'Access-Control-Allow-Origin': '*'
                     },
-                    'body': json.dumps({'ok': False, 'error': 'No token provided'}),
+                    'body': json.dumps({'ok': False, 'error': e.message}),
                     'isBase64Encoded': False
                 }
-            secret_key = os.environ.get('JWT_SECRET', 'default-secret-change-in-production')
             
-            try:
-                payload = jwt.decode(token, secret_key, algorithms=['HS256'])
-                user_id = payload.get('user_id')
-                
-                query = f"SELECT id, username, email, full_name, role, is_active FROM t_p37006348_real_estate_agency_w.admin_users WHERE id = {user_id}"
-                cursor.execute(query)
-                user = cursor.fetchone()
-                
-                if not user or not user['is_active']:
-                    return {
-                        'statusCode': 401,
-                        'headers': {
-                            'Content-Type': 'application/json',
-                            'Access-Control-Allow-Origin': '*'
-                        },
-                        'body': json.dumps({'ok': False, 'error': 'User not found or inactive'}),
-                        'isBase64Encoded': False
-                    }
-                
+            if show_stats:
                 return {
                     'statusCode': 200,
                     'headers': {
                         'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*'
+                        'Access-Control-Allow-Origin': '*',
+                        'Cache-Control': 'no-store'
                     },
                     'body': json.dumps({
                         'ok': True,
                         'data': {
-                            'user': {
-                                'id': user['id'],
-                                'username': user['username'],
-                                'email': user['email'],
-                                'full_name': user['full_name'],
-                                'role': user['role']
-                            }
+                            'timings': timing_stats(),
+                            'queries': query_report(query_params),
+                            'auth': cache_stats(),
+                            'pool': get_pool(dsn).stats()
                         }
                     }),
                     'isBase64Encoded': False
                 }
-                
-            except jwt.ExpiredSignatureError:
-                return {
-                    'statusCode': 401,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*'
-                    },
-                    'body': json.dumps({'ok': False, 'error': 'Token expired'}),
-                    'isBase64Encoded': False
-                }
-            except jwt.InvalidTokenError:
+            
+            # authenticate() has just loaded the user through the short-lived user cache
+            user = load_user(cursor, payload['user_id'])
+            return {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps({
+                    'ok': True,
+                    'data': {
+                        'user': {
+                            'id': user['id'],
+                            'username': user['username'],
+                            'email': user['email'],
+                            'full_name': user['full_name'],
+                            'role': user['role']
+                        }
+                    }
+                }),
+                'isBase64Encoded': False
+            }
+        
+        elif method == 'DELETE':
+            # Sign out everywhere: every token issued to the caller so far stops working
+            try:
+                with phase('auth'):
+                    payload = authenticate(event.get('headers') or {}, cursor, require_admin=False)
+            except AuthError as e:
                 return {
-                    'statusCode': 401,
+                    'statusCode': e.status_code,
                     'headers': {
                         'Content-Type': 'application/json',
                         'Access-Control-Allow-Origin': '*'
                     },
-                    'body': json.dumps({'ok': False, 'error': 'Invalid token'}),
+                    'body': json.dumps({'ok': False, 'error': e.message}),
                     'isBase64Encoded': False
                 }
+            
+            revoke_tokens(cursor, payload['user_id'])
+            conn.commit()
+            return {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps({'ok': True}),
+                'isBase64Encoded': False
+            }
     
     except Exception as e:
         return {
@@ -256,7 +297,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     
     finally:
         if conn:
-            conn.close()
+            release_connection(conn)
     
     return {
         'statusCode': 405,
@@ -0,0 +1,264 @@
+'''
+Business: Per-invocation timing for the cloud-function handlers: phase timers, one JSON log line per invocation and in-process latency histograms
+Args: the handler to wrap; INSTRUMENTATION_ENABLED, INSTRUMENTATION_LOG and INSTRUMENTATION_LOG_MIN_MS from the environment
+Returns: the handler's response unchanged; timings are printed to stdout and accumulated for stats()
+'''
+
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+ENABLED = os.environ.get('INSTRUMENTATION_ENABLED', '1') != '0'
+LOG_ENABLED = os.environ.get('INSTRUMENTATION_LOG', '1') != '0'
+# Only invocations at least this slow are logged; histograms always see every invocation
+LOG_MIN_MS = float(os.environ.get('INSTRUMENTATION_LOG_MIN_MS', '0'))
+
+# Bucket upper bounds in ms: 0.05 ms doubling up to ~26 s, then overflow
+BUCKET_BOUNDS = [0.05 * 2 ** k for k in range(20)]
+
+_local = threading.local()
+_loaded_at = time.time()
+
+
+class Histogram:
+    '''Fixed log-spaced buckets: constant memory, an observe() is a bisect and three additions.'''
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value_ms: float) -> None:
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+        if value_ms > self.max:
+            self.max = value_ms
+
+    def percentile(self, p: float) -> float:
+        '''Linear interpolation inside the bucket holding the p-th observation.'''
+        if not self.count:
+            return 0.0
+        rank = p / 100 * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                low = BUCKET_BOUNDS[index - 1] if index else 0.0
+                high = BUCKET_BOUNDS[index] if index < len(BUCKET_BOUNDS) else self.max
+                return min(self.max, low + (high - low) * (rank - seen) / bucket_count)
+            seen += bucket_count
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count, 3) if self.count else 0.0,
+            'p50_ms': round(self.percentile(50), 3),
+            'p95_ms': round(self.percentile(95), 3),
+            'p99_ms': round(self.percentile(99), 3),
+            'max_ms': round(self.max, 3)
+        }
+
+
+class _RouteStats:
+    def __init__(self) -> None:
+        self.total = Histogram()
+        self.phases: Dict[str, Histogram] = {}
+        self.statuses: Dict[int, int] = {}
+        self.cold = 0
+        self.bytes = 0
+
+
+_routes: Dict[str, _RouteStats] = {}
+_routes_lock = threading.Lock()
+_invocations = 0
+_warm = False
+
+
+class Invocation:
+    '''
+    Timing state of one handler call. Phases are exclusive: time spent in a
+    phase nested inside another (a query inside auth) is counted only for
+    the inner one, so the phases and 'other' add up to the total.
+    '''
+
+    def __init__(self, event: Dict[str, Any], context: Any, cold: bool):
+        self.started = time.perf_counter()
+        self.cold = cold
+        method = event.get('httpMethod')
+        self.route = method or 'trigger'
+        self.function = getattr(context, 'function_name', None) or os.environ.get('FUNCTION_NAME', '')
+        self.request_id = getattr(context, 'request_id', None) or (event.get('requestContext') or {}).get('requestId')
+        self.phases: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self.fields: Dict[str, Any] = {}
+        self._stack: List[List[Any]] = []
+
+    def enter(self, name: str) -> None:
+        # [name, started, time spent in nested phases]
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def exit(self) -> None:
+        name, started, nested = self._stack.pop()
+        elapsed = time.perf_counter() - started
+        self.phases[name] = self.phases.get(name, 0.0) + elapsed - nested
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+
+class _Phase:
+    __slots__ = ('invocation', 'name')
+
+    def __init__(self, invocation: Invocation, name: str):
+        self.invocation = invocation
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.invocation.enter(self.name)
+
+    def __exit__(self, *exc: Any) -> None:
+        self.invocation.exit()
+
+
+class _NoPhase:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+
+_NO_PHASE = _NoPhase()
+
+
+def phase(name: str) -> Any:
+    '''Context manager timing a phase of the current invocation; a no-op outside an instrumented handler.'''
+    invocation = getattr(_local, 'invocation', None)
+    return _Phase(invocation, name) if invocation is not None else _NO_PHASE
+
+
+def count(name: str, amount: int = 1) -> None:
+    invocation = getattr(_local, 'invocation', None)
+    if invocation is not None:
+        invocation.counters[name] = invocation.counters.get(name, 0) + amount
+
+
+def annotate(route: Optional[str] = None, **fields: Any) -> None:
+    '''Name the route the invocation is grouped under (e.g. 'GET list') and add fields to its log line.'''
+    invocation = getattr(_local, 'invocation', None)
+    if invocation is not None:
+        if route:
+            invocation.route = route
+        invocation.fields.update(fields)
+
+
+def _body_bytes(response: Optional[Dict[str, Any]]) -> int:
+    body = (response or {}).get('body') or ''
+    if isinstance(body, bytes):
+        return len(body)
+    # json.dumps escapes non-ASCII by default, so this is usually just len()
+    return len(body) if body.isascii() else len(body.encode('utf-8'))
+
+
+def _finish(invocation: Invocation, response: Optional[Dict[str, Any]], error: Optional[BaseException]) -> None:
+    total = (time.perf_counter() - invocation.started) * 1000
+    status = (response or {}).get('statusCode', 500 if error else 200)
+    size = _body_bytes(response)
+    phases = {name: seconds * 1000 for name, seconds in invocation.phases.items()}
+    phases['other'] = max(0.0, total - sum(phases.values()))
+
+    with _routes_lock:
+        stats = _routes.get(invocation.route)
+        if stats is None:
+            stats = _routes[invocation.route] = _RouteStats()
+        stats.total.observe(total)
+        for name, value in phases.items():
+            histogram = stats.phases.get(name)
+            if histogram is None:
+                histogram = stats.phases[name] = Histogram()
+            histogram.observe(value)
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+        stats.cold += invocation.cold
+        stats.bytes += size
+
+    if LOG_ENABLED and total >= LOG_MIN_MS:
+        line = {
+            'type': 'invocation',
+            'function': invocation.function,
+            'request_id': invocation.request_id,
+            'route': invocation.route,
+            'status': status,
+            'cold': invocation.cold,
+            'total_ms': round(total, 3),
+            'phases_ms': {name: round(value, 3) for name, value in phases.items()},
+            'response_bytes': size,
+            **invocation.counters,
+            **invocation.fields
+        }
+        if error is not None:
+            line['error'] = f'{type(error).__name__}: {error}'
+        print(json.dumps(line, ensure_ascii=False, default=str), flush=True)
+
+
+def instrumented(handler: Callable[[Dict[str, Any], Any], Dict[str, Any]]) -> Callable[[Dict[str, Any], Any], Dict[str, Any]]:
+    '''Wrap handler(event, context) so each call is timed, logged and counted.'''
+    if not ENABLED:
+        return handler
+
+    @functools.wraps(handler)
+    def wrapper(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+        global _invocations, _warm
+        with _routes_lock:
+            cold, _warm = not _warm, True
+            _invocations += 1
+        invocation = Invocation(event, context, cold)
+        previous = getattr(_local, 'invocation', None)
+        _local.invocation = invocation
+        response = None
+        error = None
+        try:
+            response = handler(event, context)
+            return response
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _local.invocation = previous
+            try:
+                _finish(invocation, response, error)
+            except Exception as e:
+                print(f'Instrumentation failed: {str(e)}')
+
+    return wrapper
+
+
+def stats() -> Dict[str, Any]:
+    with _routes_lock:
+        return {
+            'invocations': _invocations,
+            'uptime_seconds': round(time.time() - _loaded_at, 1),
+            'routes': {
+                route: {
+                    'total': stats.total.snapshot(),
+                    'phases': {name: histogram.snapshot() for name, histogram in sorted(stats.phases.items())},
+                    'statuses': {str(status): n for status, n in sorted(stats.statuses.items())},
+                    'cold_starts': stats.cold,
+                    'response_bytes': stats.bytes
+                }
+                for route, stats in sorted(_routes.items())
+            }
+        }
+
+
+def reset() -> None:
+    global _invocations
+    with _routes_lock:
+        _routes.clear()
+        _invocations = 0
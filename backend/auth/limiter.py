@@ -0,0 +1,138 @@
+'''
+Business: Login throttling by username and client IP, stored in login_attempts with an in-process front cache of locked keys
+Args: a cursor on the database, attempt keys built by attempt_keys(); LOGIN_* limits from the environment
+Returns: seconds until a locked key may retry, or None when the login may proceed
+'''
+
+import os
+import time
+from typing import Any, Dict, List, Optional
+from cache import TTLCache
+
+LOGIN_ATTEMPTS_TABLE = 't_p37006348_real_estate_agency_w.login_attempts'
+USER_MAX_FAILURES = int(os.environ.get('LOGIN_USER_MAX_FAILURES', '5'))
+IP_MAX_FAILURES = int(os.environ.get('LOGIN_IP_MAX_FAILURES', '30'))
+WINDOW_SECONDS = int(os.environ.get('LOGIN_WINDOW_SECONDS', '900'))
+LOCKOUT_SECONDS = int(os.environ.get('LOGIN_LOCKOUT_SECONDS', '900'))
+USERNAME_KEY_MAX_LENGTH = 150
+# Expired keys deleted per failed login; a failure adds at most two keys, so
+# the table stays bounded by the keys seen within one window or lockout
+PURGE_BATCH = int(os.environ.get('LOGIN_PURGE_BATCH', '100'))
+
+# attempt key -> locked_until (epoch seconds). Only locked keys are cached, so
+# a throttled burst is answered from memory without touching the database.
+locked_cache = TTLCache(
+    max_entries=int(os.environ.get('LOGIN_LOCK_CACHE_SIZE', '4096')),
+    ttl=LOCKOUT_SECONDS
+)
+
+
+def client_ip(event: Dict[str, Any]) -> str:
+    identity = (event.get('requestContext') or {}).get('identity') or {}
+    if identity.get('sourceIp'):
+        return identity['sourceIp']
+    for name, value in (event.get('headers') or {}).items():
+        if name.lower() == 'x-forwarded-for' and value:
+            return value.split(',')[0].strip()
+    return ''
+
+
+def attempt_keys(username: str, ip: str) -> List[str]:
+    keys = ['user:' + username.lower()[:USERNAME_KEY_MAX_LENGTH]]
+    if ip:
+        keys.append('ip:' + ip)
+    return keys
+
+
+def _remember(rows: List[Dict[str, Any]]) -> Optional[float]:
+    '''Cache locks returned as (attempt_key, wait seconds) rows; the longest wait wins.'''
+    now = time.time()
+    waits = []
+    for row in rows:
+        wait = float(row['wait'])
+        if wait > 0:
+            locked_cache.set(row['attempt_key'], now + wait)
+            waits.append(wait)
+    return max(waits) if waits else None
+
+
+def retry_after(cursor: Any, keys: List[str]) -> Optional[float]:
+    '''Seconds the caller must wait if any of the keys is locked.'''
+    now = time.time()
+    cached = [locked_cache.get(key) for key in keys]
+    waits = [locked_until - now for locked_until in cached if locked_until is not None and locked_until > now]
+    if waits:
+        return max(waits)
+    cursor.execute(
+        f'SELECT attempt_key, extract(epoch FROM locked_until - CURRENT_TIMESTAMP) AS wait FROM {LOGIN_ATTEMPTS_TABLE} '
+        'WHERE attempt_key = ANY(%s) AND locked_until > CURRENT_TIMESTAMP',
+        (keys,)
+    )
+    return _remember(cursor.fetchall())
+
+
+def _purge_expired(cursor: Any, batch: Optional[int] = None) -> None:
+    '''
+    Delete keys whose window and lock have both run out (up to batch of them,
+    oldest window first); such a key behaves exactly like a missing one.
+    Rows another login holds are skipped rather than waited for.
+    '''
+    cursor.execute(
+        f'''
+        DELETE FROM {LOGIN_ATTEMPTS_TABLE} WHERE attempt_key IN (
+            SELECT attempt_key FROM {LOGIN_ATTEMPTS_TABLE}
+            WHERE window_started_at < CURRENT_TIMESTAMP - %s::interval
+              AND (locked_until IS NULL OR locked_until < CURRENT_TIMESTAMP)
+            ORDER BY window_started_at LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+        ''',
+        (f'{WINDOW_SECONDS} seconds', batch)
+    )
+
+
+def record_failure(cursor: Any, keys: List[str]) -> Optional[float]:
+    '''
+    Count one failed login against every key in a single upsert. A key's
+    count restarts when its window has passed; reaching the key's limit
+    locks it for LOCKOUT_SECONDS. Returns the wait if this locked a key.
+    Failures also purge a batch of expired keys, so usernames that never
+    log in (a spray of made-up ones) do not accumulate.
+    '''
+    _purge_expired(cursor, PURGE_BATCH)
+    window = f'{WINDOW_SECONDS} seconds'
+    cursor.execute(
+        f'''
+        INSERT INTO {LOGIN_ATTEMPTS_TABLE} AS attempts (attempt_key, failures, window_started_at)
+        SELECT attempt_key, 1, CURRENT_TIMESTAMP FROM unnest(%s::text[]) AS attempt_key
+        ON CONFLICT (attempt_key) DO UPDATE SET
+            failures = CASE WHEN attempts.window_started_at < CURRENT_TIMESTAMP - %s::interval
+                            THEN 1 ELSE attempts.failures + 1 END,
+            window_started_at = CASE WHEN attempts.window_started_at < CURRENT_TIMESTAMP - %s::interval
+                                     THEN CURRENT_TIMESTAMP ELSE attempts.window_started_at END
+        RETURNING attempt_key, failures
+        ''',
+        (keys, window, window)
+    )
+    over_limit = [
+        row['attempt_key'] for row in cursor.fetchall()
+        if row['failures'] >= (IP_MAX_FAILURES if row['attempt_key'].startswith('ip:') else USER_MAX_FAILURES)
+    ]
+    if not over_limit:
+        return None
+    cursor.execute(
+        f'UPDATE {LOGIN_ATTEMPTS_TABLE} SET locked_until = CURRENT_TIMESTAMP + %s::interval '
+        'WHERE attempt_key = ANY(%s) RETURNING attempt_key, extract(epoch FROM locked_until - CURRENT_TIMESTAMP) AS wait',
+        (f'{LOCKOUT_SECONDS} seconds', over_limit)
+    )
+    return _remember(cursor.fetchall())
+
+
+def record_success(cursor: Any, username_key: str) -> None:
+    '''
+    A successful login clears its username's failures (the IP keeps its
+    count) and purges keys whose window and lock have both run out.
+    '''
+    cursor.execute(f'DELETE FROM {LOGIN_ATTEMPTS_TABLE} WHERE attempt_key = %s', (username_key,))
+    _purge_expired(cursor)
+    locked_cache.discard(username_key)
@@ -0,0 +1,55 @@
+'''
+Business: bcrypt password checks with a bound on how many run at once, and rehashing to the configured cost
+Args: plaintext password and stored hash; BCRYPT_ROUNDS, AUTH_BCRYPT_CONCURRENCY and AUTH_BCRYPT_WAIT_SECONDS from the environment
+Returns: whether the password matches, or BcryptBusyError when no bcrypt slot frees up in time
+'''
+
+import os
+import threading
+from typing import Union
+import bcrypt
+from instrumentation import phase
+
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+BCRYPT_CONCURRENCY = int(os.environ.get('AUTH_BCRYPT_CONCURRENCY', '2'))
+BCRYPT_WAIT_SECONDS = float(os.environ.get('AUTH_BCRYPT_WAIT_SECONDS', '2'))
+
+# Each check burns ~0.25s of CPU at cost 12; capping concurrent checks keeps a
+# burst of logins from starving every other request the container serves.
+_bcrypt_slots = threading.BoundedSemaphore(BCRYPT_CONCURRENCY)
+
+
+class BcryptBusyError(Exception):
+    pass
+
+
+def _as_bytes(value: Union[str, bytes]) -> bytes:
+    return value.encode('utf-8') if isinstance(value, str) else value
+
+
+def check_password(password: str, password_hash: Union[str, bytes]) -> bool:
+    with phase('bcrypt_wait'):
+        acquired = _bcrypt_slots.acquire(timeout=BCRYPT_WAIT_SECONDS)
+    if not acquired:
+        raise BcryptBusyError()
+    try:
+        with phase('bcrypt'):
+            return bcrypt.checkpw(password.encode('utf-8'), _as_bytes(password_hash))
+    finally:
+        _bcrypt_slots.release()
+
+
+def needs_rehash(password_hash: Union[str, bytes]) -> bool:
+    '''True when the hash's cost ($2b$<cost>$...) differs from BCRYPT_ROUNDS.'''
+    parts = _as_bytes(password_hash).split(b'$')
+    return len(parts) < 4 or not parts[2].isdigit() or int(parts[2]) != BCRYPT_ROUNDS
+
+
+def hash_password(password: str) -> str:
+    with phase('bcrypt_wait'):
+        _bcrypt_slots.acquire()
+    try:
+        with phase('bcrypt'):
+            return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(BCRYPT_ROUNDS)).decode('utf-8')
+    finally:
+        _bcrypt_slots.release()
@@ -0,0 +1,163 @@
+'''
+Business: In-process statement statistics without pg_stat_statements: SQL fingerprints with literals stripped, per-fingerprint call counts and latency histograms, slow statements logged with their EXPLAIN plan
+Args: SQL text, duration and row count of each statement run through db.py cursors; DB_SLOW_QUERY_MS, DB_SLOW_QUERY_EXPLAIN, DB_SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS and DB_QUERY_STATS_MAX_FINGERPRINTS from the environment
+Returns: the top fingerprints by total time for the admin stats; slow statements are printed as JSON lines
+'''
+
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from cache import TTLCache
+from instrumentation import Histogram
+
+SLOW_QUERY_MS = float(os.environ.get('DB_SLOW_QUERY_MS', '200'))
+EXPLAIN_SLOW = os.environ.get('DB_SLOW_QUERY_EXPLAIN', '1') != '0'
+# A fingerprint that keeps being slow is explained again at most this often
+EXPLAIN_INTERVAL_SECONDS = float(os.environ.get('DB_SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS', '300'))
+MAX_FINGERPRINTS = int(os.environ.get('DB_QUERY_STATS_MAX_FINGERPRINTS', '500'))
+QUERY_TEXT_MAX_LENGTH = 2000
+ORDERS = ('total_ms', 'calls', 'mean_ms', 'p95_ms', 'max_ms', 'rows', 'errors', 'slow')
+# Statements past MAX_FINGERPRINTS are folded into this entry instead of growing memory
+OVERFLOW_FINGERPRINT = 'overflow'
+
+_COMMENT_RE = re.compile(r'--[^\n]*|/\*.*?\*/', re.DOTALL)
+_STRING_RE = re.compile(r"[eE]?'(?:[^']|'')*'")
+_PARAM_RE = re.compile(r'%\(\w+\)s|%s|\$\d+')
+_NUMBER_RE = re.compile(r'(?<![\w$.])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?(?![\w.])')
+_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_ARRAY_RE = re.compile(r'ARRAY\[\s*\?(?:\s*,\s*\?)*\s*\]', re.IGNORECASE)
+_ROWS_RE = re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+')
+_SPACE_RE = re.compile(r'\s+')
+
+# SQL text -> (fingerprint id, normalised text); most handlers send a few dozen distinct texts
+_normalised = TTLCache(max_entries=2048, ttl=3600)
+_explained = TTLCache(max_entries=1024, ttl=EXPLAIN_INTERVAL_SECONDS)
+
+
+def normalize(sql: str) -> str:
+    '''
+    The statement with comments dropped, string and number literals and
+    placeholders replaced by ?, IN lists, ARRAY[...] and multi-row VALUES
+    collapsed to one entry, and whitespace squeezed: the same query shape
+    gives the same text whatever its values or list lengths.
+    '''
+    text = _COMMENT_RE.sub(' ', sql)
+    text = _STRING_RE.sub('?', text)
+    text = _PARAM_RE.sub('?', text)
+    text = _NUMBER_RE.sub('?', text)
+    text = _LIST_RE.sub('(...)', text)
+    text = _ARRAY_RE.sub('ARRAY[...]', text)
+    text = _ROWS_RE.sub('(...)', text)
+    return _SPACE_RE.sub(' ', text).strip().replace('%%', '%')
+
+
+def fingerprint(sql: str) -> Tuple[str, str]:
+    '''(short id, normalised text) of a statement; cached per distinct SQL text.'''
+    cached = _normalised.get(sql)
+    if cached is None:
+        text = normalize(sql)
+        cached = (hashlib.md5(text.encode('utf-8')).hexdigest()[:12], text[:QUERY_TEXT_MAX_LENGTH])
+        _normalised.set(sql, cached)
+    return cached
+
+
+class _FingerprintStats:
+    def __init__(self, text: str):
+        self.text = text
+        self.latency = Histogram()
+        self.rows = 0
+        self.errors = 0
+        self.slow = 0
+        self.last_plan: Optional[List[str]] = None
+
+
+_stats: Dict[str, _FingerprintStats] = {}
+_stats_lock = threading.Lock()
+
+
+def record(sql: str, duration_ms: float, rows: int, failed: bool = False,
+           explain: Optional[Callable[[], List[str]]] = None) -> None:
+    '''
+    Account one statement. Over SLOW_QUERY_MS it is printed as a JSON line;
+    explain, when given, returns the statement's plan lines and is called at
+    most once per fingerprint every EXPLAIN_INTERVAL_SECONDS. Parameter values
+    are never logged: lead statements carry names and phone numbers.
+    '''
+    fingerprint_id, text = fingerprint(sql)
+    with _stats_lock:
+        stats = _stats.get(fingerprint_id)
+        if stats is None:
+            if len(_stats) >= MAX_FINGERPRINTS:
+                fingerprint_id = OVERFLOW_FINGERPRINT
+                stats = _stats.get(fingerprint_id)
+            if stats is None:
+                stats = _stats[fingerprint_id] = _FingerprintStats(
+                    text if fingerprint_id != OVERFLOW_FINGERPRINT else '<other statements>'
+                )
+        stats.latency.observe(duration_ms)
+        stats.rows += max(rows, 0)
+        stats.errors += failed
+        slow = duration_ms >= SLOW_QUERY_MS
+        stats.slow += slow
+
+    if not slow:
+        return
+    plan = None
+    if explain is not None and EXPLAIN_SLOW and not failed and _explained.get(fingerprint_id) is None:
+        _explained.set(fingerprint_id, True)
+        try:
+            plan = explain()
+            stats.last_plan = plan
+        except Exception as e:
+            plan = [f'EXPLAIN failed: {type(e).__name__}: {e}']
+    print(json.dumps({
+        'type': 'slow_query',
+        'fingerprint': fingerprint_id,
+        'query': text,
+        'duration_ms': round(duration_ms, 3),
+        'rows': rows,
+        'failed': failed,
+        'plan': plan
+    }, ensure_ascii=False), flush=True)
+
+
+def top(limit: int = 20, order: str = 'total_ms') -> List[Dict[str, Any]]:
+    '''The limit fingerprints with the largest total_ms, or another of ORDERS.'''
+    with _stats_lock:
+        entries = []
+        for fingerprint_id, stats in _stats.items():
+            latency = stats.latency.snapshot()
+            entries.append({
+                'fingerprint': fingerprint_id,
+                'query': stats.text,
+                'calls': latency['count'],
+                'total_ms': round(stats.latency.total, 3),
+                'mean_ms': latency['mean_ms'],
+                'p95_ms': latency['p95_ms'],
+                'max_ms': latency['max_ms'],
+                'rows': stats.rows,
+                'errors': stats.errors,
+                'slow': stats.slow,
+                'last_plan': stats.last_plan
+            })
+    key = order if order in ORDERS else 'total_ms'
+    entries.sort(key=lambda entry: entry[key], reverse=True)
+    return entries[:max(0, limit)]
+
+
+def report(params: Dict[str, str]) -> List[Dict[str, Any]]:
+    '''top() for the top=N (default 20, at most MAX_FINGERPRINTS) and order= parameters of an admin stats request.'''
+    try:
+        limit = int((params.get('top') or '').strip() or 20)
+    except ValueError:
+        limit = 20
+    return top(max(1, min(limit, MAX_FINGERPRINTS)), (params.get('order') or '').strip())
+
+
+def reset() -> None:
+    with _stats_lock:
+        _stats.clear()
+    _explained.clear()
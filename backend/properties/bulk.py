@@ -0,0 +1,230 @@
+'''
+Business: Bulk import and export of properties for admins (NDJSON or CSV)
+Args: an open connection, the request body text and its format; external_id identifies a row across imports
+Returns: import counts with per-line errors, or the export body text
+'''
+
+import csv
+import io
+import json
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+import psycopg2
+from queries import ValidationError, WRITABLE_FIELDS, validate_fields
+
+FORMATS = ('ndjson', 'csv')
+CONTENT_TYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv; charset=utf-8'}
+LIST_FIELDS = ('features', 'images', 'badges')
+IMPORT_COLUMNS = ['external_id'] + list(WRITABLE_FIELDS)
+EXPORT_COLUMNS = ['id'] + IMPORT_COLUMNS + ['created_at', 'updated_at']
+EXTERNAL_ID_MAX_LENGTH = 100
+ERRORS_REPORTED_MAX = 100
+
+
+# A reader yields (input line, record) or (input line, the error that made the line unreadable)
+Record = Tuple[int, Union[Dict[str, Any], ValidationError]]
+
+
+class BulkImportError(Exception):
+    def __init__(self, message: str, line: Optional[int] = None):
+        super().__init__(message)
+        self.message = message
+        self.line = line
+
+
+def _csv_records(body: str) -> Iterator[Record]:
+    '''CSV cells are strings: empty cells fall back to defaults, list cells hold JSON arrays.'''
+    reader = csv.DictReader(io.StringIO(body))
+    try:
+        for record in reader:
+            parsed: Dict[str, Any] = {}
+            error = None
+            for column, value in record.items():
+                if column is None or value is None or value == '':
+                    continue
+                column = column.strip()
+                if column in LIST_FIELDS:
+                    try:
+                        value = json.loads(value)
+                    except ValueError:
+                        error = ValidationError(column, 'expected a JSON array')
+                        break
+                parsed[column] = value
+            yield reader.line_num, error or parsed
+    except csv.Error as e:
+        raise BulkImportError(f'Malformed CSV: {e}', reader.line_num)
+
+
+def _ndjson_records(body: str) -> Iterator[Record]:
+    for line_no, line in enumerate(body.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line_no, ValidationError('line', 'invalid JSON')
+            continue
+        if not isinstance(record, dict):
+            yield line_no, ValidationError('line', 'expected a JSON object')
+            continue
+        yield line_no, record
+
+
+def _validate_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    external_id = record.get('external_id')
+    if not isinstance(external_id, (str, int)) or not str(external_id).strip():
+        raise ValidationError('external_id', 'required')
+    external_id = str(external_id).strip()
+    if len(external_id) > EXTERNAL_ID_MAX_LENGTH:
+        raise ValidationError('external_id', 'too long')
+    values = validate_fields(record, partial=False)
+    values['external_id'] = external_id
+    return values
+
+
+def _array_literal(items: List[str]) -> str:
+    return '{' + ','.join('"' + item.replace('\\', '\\\\').replace('"', '\\"') + '"' for item in items) + '}'
+
+
+class _CopySource:
+    '''
+    File-like object for COPY FROM STDIN that validates records as psycopg2
+    reads from it, so the body is never held as a list of converted rows.
+    Invalid records are skipped and reported; lines maps COPY row -> input line.
+    '''
+
+    def __init__(self, records: Iterator[Record]):
+        self.records = records
+        self.errors: List[Dict[str, Any]] = []
+        self.error_count = 0
+        self.lines: List[int] = []
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, quoting=csv.QUOTE_NONNUMERIC, lineterminator='\n')
+        self._pending = ''
+
+    def _error(self, line_no: int, field: str, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < ERRORS_REPORTED_MAX:
+            self.errors.append({'line': line_no, 'field': field, 'error': message})
+
+    def _next_row(self) -> Optional[str]:
+        for line_no, record in self.records:
+            try:
+                if isinstance(record, ValidationError):
+                    raise record
+                values = _validate_record(record)
+            except ValidationError as e:
+                self._error(line_no, e.field, e.message)
+                continue
+            row = [len(self.lines) + 1] + [
+                _array_literal(values[column]) if column in LIST_FIELDS else values[column]
+                for column in IMPORT_COLUMNS
+            ]
+            self.lines.append(line_no)
+            self._buffer.seek(0)
+            self._buffer.truncate()
+            self._writer.writerow(row)
+            return self._buffer.getvalue()
+        return None
+
+    def read(self, size: int = -1) -> str:
+        chunks = [self._pending]
+        length = len(self._pending)
+        while size < 0 or length < size:
+            row = self._next_row()
+            if row is None:
+                break
+            chunks.append(row)
+            length += len(row)
+        data = ''.join(chunks)
+        if size < 0:
+            self._pending = ''
+            return data
+        self._pending = data[size:]
+        return data[:size]
+
+
+def import_properties(conn: Any, body: str, fmt: str, dry_run: bool = False) -> Dict[str, Any]:
+    '''
+    Stream valid records into a temporary staging table with COPY, then
+    upsert the whole batch on external_id in one statement. Within one body
+    the last record for an external_id wins. Invalid records are skipped and
+    reported by input line; a value the database rejects aborts the batch.
+    '''
+    records = _ndjson_records(body) if fmt == 'ndjson' else _csv_records(body)
+    source = _CopySource(records)
+    columns = ', '.join(IMPORT_COLUMNS)
+    cursor = conn.cursor()
+    cursor.execute(
+        'CREATE TEMP TABLE properties_import ON COMMIT DROP AS '
+        f'SELECT 0 AS row_no, {columns} FROM properties WITH NO DATA'
+    )
+    try:
+        cursor.copy_expert(f'COPY properties_import (row_no, {columns}) FROM STDIN WITH (FORMAT csv)', source)
+    except psycopg2.DataError as e:
+        conn.rollback()
+        match = re.search(r'line (\d+)', e.diag.context or '')
+        row_no = int(match.group(1)) if match else 0
+        line_no = source.lines[row_no - 1] if 0 < row_no <= len(source.lines) else None
+        raise BulkImportError(e.diag.message_primary or 'Rejected by the database', line_no)
+    except BulkImportError:
+        conn.rollback()
+        raise
+
+    inserted = updated = 0
+    if dry_run:
+        conn.rollback()
+    else:
+        assignments = ', '.join(f'{column} = EXCLUDED.{column}' for column in IMPORT_COLUMNS if column != 'external_id')
+        cursor.execute(
+            f'INSERT INTO properties ({columns}) '
+            f'SELECT DISTINCT ON (external_id) {columns} FROM properties_import ORDER BY external_id, row_no DESC '
+            f'ON CONFLICT (external_id) DO UPDATE SET {assignments} '
+            'RETURNING (xmax = 0) AS inserted'
+        )
+        for (was_inserted,) in cursor.fetchall():
+            if was_inserted:
+                inserted += 1
+            else:
+                updated += 1
+        conn.commit()
+
+    return {
+        'received': len(source.lines) + source.error_count,
+        'valid': len(source.lines),
+        'inserted': inserted,
+        'updated': updated,
+        'error_count': source.error_count,
+        'errors': source.errors,
+        'dry_run': dry_run
+    }
+
+
+def export_properties(conn: Any, fmt: str, include_inactive: bool) -> str:
+    '''
+    CSV is produced by COPY TO STDOUT (list columns as JSON arrays so the file
+    re-imports as is); NDJSON is read through a server-side cursor in batches.
+    '''
+    where_sql = '' if include_inactive else " WHERE status = 'active'"
+    output = io.StringIO()
+    if fmt == 'csv':
+        select_sql = ', '.join(
+            f'array_to_json({column}) AS {column}' if column in LIST_FIELDS else column for column in EXPORT_COLUMNS
+        )
+        conn.cursor().copy_expert(
+            f'COPY (SELECT {select_sql} FROM properties{where_sql} ORDER BY id) TO STDOUT WITH (FORMAT csv, HEADER)',
+            output
+        )
+    else:
+        cursor = conn.cursor(name='properties_export')
+        cursor.itersize = 1000
+        cursor.execute(
+            f"SELECT row_to_json(export)::text FROM (SELECT {', '.join(EXPORT_COLUMNS)} "
+            f'FROM properties{where_sql} ORDER BY id) AS export'
+        )
+        for (line,) in cursor:
+            output.write(line)
+            output.write('\n')
+        cursor.close()
+        conn.rollback()
+    return output.getvalue()
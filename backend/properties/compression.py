@@ -0,0 +1,83 @@
+'''
+Business: Compress large JSON responses for clients that accept it, since the gateway passes bodies through as-is
+Args: the request's Accept-Encoding header and the response body; COMPRESSION_ENABLED, COMPRESSION_MIN_BYTES, COMPRESSION_GZIP_LEVEL and COMPRESSION_BROTLI_QUALITY from the environment
+Returns: the chosen content coding and the compressed body as base64 text for an isBase64Encoded response
+'''
+
+import base64
+import gzip
+import os
+from typing import Dict, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ENABLED = os.environ.get('COMPRESSION_ENABLED', '1') != '0'
+# Below about one TCP segment compression saves no round trip and only costs CPU
+MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '1400'))
+GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '6'))
+
+# Preferred first when the client gives several codings the same q-value
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    '''
+    The coding to use for a request's Accept-Encoding, or None for identity.
+    Codings with q=0 are refused, '*' stands for any coding not listed.
+    '''
+    if not ENABLED or not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if coding == 'x-gzip':
+            coding = 'gzip'
+        q = 1.0
+        params = params.strip().lower()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            weights[coding] = q
+
+    best, best_q = None, 0.0
+    for coding in ENCODINGS:
+        q = weights.get(coding, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(body: str, encoding: str) -> bytes:
+    data = body.encode('utf-8')
+    if encoding == 'br':
+        return brotli.compress(data, mode=brotli.MODE_TEXT, quality=BROTLI_QUALITY)
+    # mtime=0 keeps the output identical for identical bodies
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def encode(body: str, encoding: Optional[str]) -> Optional[str]:
+    '''body compressed with encoding as base64 text, or None when it is not worth compressing.'''
+    if encoding is None or len(body) < MIN_BYTES:
+        return None
+    return base64.b64encode(compress(body, encoding)).decode('ascii')
+
+
+def tag_etag(etag: str, encoding: str) -> str:
+    '''A distinct strong ETag per coding, as the bytes differ: "abc" -> "abc-gzip".'''
+    return etag[:-1] + '-' + encoding + '"'
+
+
+def untag_etag(etag: str) -> Tuple[str, Optional[str]]:
+    for encoding in ('br', 'gzip'):
+        suffix = '-' + encoding + '"'
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)] + '"', encoding
+    return etag, None
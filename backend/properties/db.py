@@ -0,0 +1,349 @@
+'''
+Business: Pooled PostgreSQL connections that survive warm invocations of a cloud function
+Args: DATABASE_URL passed by the handler, DB_POOL_* tuning variables from the environment
+Returns: psycopg2 connections checked out for the duration of one invocation; their cursors time queries and fetches for instrumentation and record every statement in querystats
+'''
+
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import psycopg2
+import psycopg2.extensions
+from instrumentation import count, phase
+import querystats
+
+POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+POOL_MAX_IDLE_SECONDS = float(os.environ.get('DB_POOL_MAX_IDLE_SECONDS', '300'))
+POOL_HEALTHCHECK_AFTER_SECONDS = float(os.environ.get('DB_POOL_HEALTHCHECK_AFTER_SECONDS', '30'))
+POOL_CHECKOUT_TIMEOUT_SECONDS = float(os.environ.get('DB_POOL_CHECKOUT_TIMEOUT_SECONDS', '10'))
+CONNECT_TIMEOUT_SECONDS = int(os.environ.get('DB_CONNECT_TIMEOUT_SECONDS', '5'))
+# Server-side prepared statements do not survive a transaction-mode pgbouncer; set to 0 behind one.
+PREPARED_STATEMENTS_ENABLED = os.environ.get('DB_PREPARED_STATEMENTS', '1') != '0'
+# Per connection; the least recently used statement is deallocated past this, since
+# fields=, sort and filter combinations give an open-ended number of SQL texts
+PREPARED_STATEMENTS_MAX = max(1, int(os.environ.get('DB_PREPARED_STATEMENTS_MAX', '100')))
+
+
+class PoolExhaustedError(Exception):
+    pass
+
+
+_timed_cursor_classes: Dict[type, type] = {}
+
+
+EXPLAINABLE_PREFIXES = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'EXECUTE')
+
+
+def _explainer(conn: psycopg2.extensions.connection, query: str, vars: Any) -> Callable[[], List[str]]:
+    '''
+    Plan lines of query without running it (no ANALYZE), on a separate plain
+    cursor so the caller's result set stays intact. Inside a transaction the
+    EXPLAIN runs under a savepoint, so a failing EXPLAIN cannot abort it.
+    '''
+    def explain() -> List[str]:
+        in_transaction = conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+        with psycopg2.extensions.connection.cursor(conn) as cursor:
+            if in_transaction:
+                cursor.execute('SAVEPOINT querystats_explain')
+            try:
+                cursor.execute('EXPLAIN ' + query, vars)
+                plan = [row[0] for row in cursor.fetchall()]
+            except Exception:
+                if in_transaction:
+                    cursor.execute('ROLLBACK TO SAVEPOINT querystats_explain')
+                raise
+            if in_transaction:
+                cursor.execute('RELEASE SAVEPOINT querystats_explain')
+        return plan
+
+    return explain
+
+
+def _timed_cursor_class(base: type) -> type:
+    '''
+    A subclass of the requested cursor class whose executes count as the
+    'query' phase and whose fetches (row typecasting) as 'fetch'. Every
+    statement is also recorded in querystats under its SQL template.
+    '''
+    timed = _timed_cursor_classes.get(base)
+    if timed is not None:
+        return timed
+
+    class TimedCursor(base):
+        def execute(self, query: Any, vars: Any = None) -> Any:
+            return self.execute_statement(query, vars, query)
+
+        def execute_statement(self, query: str, vars: Any, stats_sql: str) -> Any:
+            '''Run query, accounting it under stats_sql (the template behind an EXECUTE of a prepared statement).'''
+            count('queries')
+            failed = True
+            started = time.perf_counter()
+            try:
+                with phase('query'):
+                    result = super().execute(query, vars)
+                failed = False
+                return result
+            finally:
+                duration_ms = (time.perf_counter() - started) * 1000
+                explain = None
+                if (duration_ms >= querystats.SLOW_QUERY_MS and not failed and self.name is None
+                        and isinstance(query, str) and query.lstrip()[:7].upper().startswith(EXPLAINABLE_PREFIXES)):
+                    explain = _explainer(self.connection, query, vars)
+                querystats.record(stats_sql, duration_ms, -1 if failed else self.rowcount, failed, explain)
+
+        def executemany(self, query: Any, vars_list: Any) -> Any:
+            count('queries')
+            started = time.perf_counter()
+            failed = True
+            try:
+                with phase('query'):
+                    result = super().executemany(query, vars_list)
+                failed = False
+                return result
+            finally:
+                querystats.record(query, (time.perf_counter() - started) * 1000, -1 if failed else self.rowcount, failed)
+
+        def fetchone(self) -> Any:
+            with phase('fetch'):
+                row = super().fetchone()
+            count('rows', row is not None)
+            return row
+
+        def fetchmany(self, size: Optional[int] = None) -> Any:
+            with phase('fetch'):
+                rows = super().fetchmany(size) if size is not None else super().fetchmany()
+            count('rows', len(rows))
+            return rows
+
+        def fetchall(self) -> Any:
+            with phase('fetch'):
+                rows = super().fetchall()
+            count('rows', len(rows))
+            return rows
+
+    TimedCursor.__name__ = 'Timed' + base.__name__
+    _timed_cursor_classes[base] = TimedCursor
+    return TimedCursor
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        # statement name -> None, least recently executed first
+        self.prepared: 'OrderedDict[str, None]' = OrderedDict()
+
+    def cursor(self, *args: Any, **kwargs: Any) -> psycopg2.extensions.cursor:
+        base = kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs['cursor_factory'] = _timed_cursor_class(base)
+        return super().cursor(*args, **kwargs)
+
+
+class ConnectionPool:
+    '''
+    Keeps idle connections at module scope so a warm container reuses them.
+    Connections idle longer than max_idle are closed instead of reused, and
+    connections idle longer than healthcheck_after are pinged before checkout;
+    a failed ping silently replaces the connection with a fresh one.
+    '''
+
+    def __init__(self, dsn: str, max_size: int = POOL_MAX_SIZE,
+                 max_idle: float = POOL_MAX_IDLE_SECONDS,
+                 healthcheck_after: float = POOL_HEALTHCHECK_AFTER_SECONDS):
+        self.dsn = dsn
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.healthcheck_after = healthcheck_after
+        self._idle: List[Tuple[psycopg2.extensions.connection, float]] = []
+        self._checked_out = 0
+        self._cond = threading.Condition()
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+
+    def _connect(self) -> psycopg2.extensions.connection:
+        conn = psycopg2.connect(self.dsn, connect_timeout=CONNECT_TIMEOUT_SECONDS,
+                                connection_factory=PooledConnection)
+        self.created += 1
+        return conn
+
+    def _close_quietly(self, conn: psycopg2.extensions.connection) -> None:
+        self.discarded += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, conn: psycopg2.extensions.connection) -> bool:
+        try:
+            # A plain cursor: the ping belongs to the checkout, not to the invocation's queries
+            with psycopg2.extensions.connection.cursor(conn) as cursor:
+                cursor.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            return False
+
+    def _prune_expired(self, now: float) -> None:
+        fresh = []
+        for conn, last_used in self._idle:
+            if conn.closed or now - last_used > self.max_idle:
+                self._close_quietly(conn)
+            else:
+                fresh.append((conn, last_used))
+        self._idle = fresh
+
+    def getconn(self, timeout: float = POOL_CHECKOUT_TIMEOUT_SECONDS) -> psycopg2.extensions.connection:
+        deadline = time.monotonic() + timeout
+        conn: Optional[psycopg2.extensions.connection] = None
+        last_used = 0.0
+        with self._cond:
+            while True:
+                self._prune_expired(time.monotonic())
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._checked_out < self.max_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolExhaustedError(f'No free database connection after {timeout}s')
+                self._cond.wait(remaining)
+            self._checked_out += 1
+
+        try:
+            if conn is not None and time.monotonic() - last_used > self.healthcheck_after:
+                if not self._is_healthy(conn):
+                    self._close_quietly(conn)
+                    conn = None
+            if conn is None:
+                conn = self._connect()
+            else:
+                self.reused += 1
+            return conn
+        except Exception:
+            with self._cond:
+                self._checked_out -= 1
+                self._cond.notify()
+            raise
+
+    def putconn(self, conn: psycopg2.extensions.connection, discard: bool = False) -> None:
+        if not conn.closed and not discard:
+            try:
+                if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                discard = True
+
+        with self._cond:
+            self._checked_out -= 1
+            if conn.closed or discard:
+                self._close_quietly(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def closeall(self) -> None:
+        with self._cond:
+            for conn, _ in self._idle:
+                self._close_quietly(conn)
+            self._idle = []
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                'idle': len(self._idle),
+                'checked_out': self._checked_out,
+                'created': self.created,
+                'reused': self.reused,
+                'discarded': self.discarded
+            }
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+_owners: Dict[int, ConnectionPool] = {}
+
+
+def get_pool(dsn: str) -> ConnectionPool:
+    pool = _pools.get(dsn)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(dsn)
+            if pool is None:
+                pool = ConnectionPool(dsn)
+                _pools[dsn] = pool
+    return pool
+
+
+def get_connection(dsn: str) -> psycopg2.extensions.connection:
+    pool = get_pool(dsn)
+    conn = pool.getconn()
+    _owners[id(conn)] = pool
+    return conn
+
+
+def release_connection(conn: psycopg2.extensions.connection, discard: bool = False) -> None:
+    pool = _owners.pop(id(conn), None)
+    if pool is None:
+        conn.close()
+        return
+    pool.putconn(conn, discard=discard)
+
+
+def close_all() -> None:
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.closeall()
+
+
+def _number_placeholders(sql: str) -> Tuple[str, int]:
+    count = 0
+
+    def replace(match: 're.Match[str]') -> str:
+        nonlocal count
+        if match.group(0) == '%%':
+            return '%'
+        count += 1
+        return f'${count}'
+
+    return re.sub(r'%%|%s', replace, sql), count
+
+
+def execute_prepared(cursor: psycopg2.extensions.cursor, sql: str, params: Sequence[Any] = ()) -> None:
+    '''
+    Execute sql (with %s placeholders) through a named server-side prepared
+    statement, so repeated shapes skip parse and plan on a pooled connection.
+    The statement name is derived from the SQL text, not from the values.
+    '''
+    conn = cursor.connection
+    if not PREPARED_STATEMENTS_ENABLED or not isinstance(conn, PooledConnection):
+        cursor.execute(sql, params)
+        return
+
+    name = 'stmt_' + hashlib.md5(sql.encode('utf-8')).hexdigest()[:16]
+    if name in conn.prepared:
+        conn.prepared.move_to_end(name)
+    else:
+        numbered, placeholder_count = _number_placeholders(sql)
+        if placeholder_count != len(params):
+            raise ValueError(f'Expected {placeholder_count} parameters, got {len(params)}')
+        while len(conn.prepared) >= PREPARED_STATEMENTS_MAX:
+            evicted = next(iter(conn.prepared))
+            # A plain cursor: bookkeeping, not one of the invocation's queries. The name is
+            # forgotten only once the server has dropped it, so a failed DEALLOCATE (aborted
+            # transaction) cannot lead to a duplicate PREPARE later.
+            with psycopg2.extensions.connection.cursor(conn) as plain:
+                plain.execute(f'DEALLOCATE {evicted}')
+            del conn.prepared[evicted]
+        cursor.execute(f'PREPARE {name} AS {numbered}')
+        conn.prepared[name] = None
+
+    # Statistics and slow-query plans are kept under the SQL template, not the EXECUTE
+    if params:
+        cursor.execute_statement(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params, sql)
+    else:
+        cursor.execute_statement(f'EXECUTE {name}', None, sql)
@@ -4,16 +4,226 @@ Args: event with httpMethod, body, queryStringParameters, headers, pathParameter
 Returns: HTTP response with property data or success status
 '''
 
+import base64
+import hashlib
 import json
 import os
-import jwt
-from typing import Dict, Any
-import psycopg2
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Any, List, Optional, Tuple
 from psycopg2.extras import RealDictCursor
+from db import get_connection, get_pool, release_connection, execute_prepared
+from cache import TTLCache, VersionCounter
+from serializers import fetch_page, property_to_json
+from tokens import AuthError, authenticate, extract_token, cache_stats as auth_cache_stats
+from instrumentation import annotate, instrumented, phase, stats as timing_stats
+from querystats import report as query_report
+from compression import negotiate, encode, tag_etag, untag_etag
+from bulk import FORMATS, CONTENT_TYPES, BulkImportError, import_properties, export_properties
+from queries import (
+    ValidationError, validate_fields, parse_property_id, parse_filters, parse_filter_object, parse_fields, filter_key,
+    MAP_COLUMNS, SORTS, SEARCH_SORT, CELL_BITS, MAX_CLUSTER_ZOOM, FACET_GROUPING_IDS, FACET_ROOMS_MAX_BUCKET,
+    parse_sort, tiles_for_bbox, apply_currency, output_columns, facet_base_filters, cluster_area_filters,
+    validate_patches, build_count, build_detail, build_listing, build_map, build_clusters, build_facets, build_search,
+    build_insert, build_update, build_delete, build_batch_update, build_filtered_update
+)
 
-def escape_sql_string(value: str) -> str:
-    return value.replace("'", "''")
+PAGE_SIZE_DEFAULT = int(os.environ.get('CATALOG_PAGE_SIZE', '50'))
+PAGE_SIZE_MAX = int(os.environ.get('CATALOG_MAX_PAGE_SIZE', '100'))
+# mode=map returns compact markers, so it may return many more rows than a listing page
+MAP_POINTS_MAX = int(os.environ.get('CATALOG_MAP_MAX_POINTS', '500'))
+CLUSTER_MAX_TILES = int(os.environ.get('CATALOG_CLUSTER_MAX_TILES', '64'))
+FACET_PRICE_BINS = int(os.environ.get('CATALOG_FACET_PRICE_BINS', '10'))
+BATCH_MAX_PATCHES = int(os.environ.get('CATALOG_BATCH_MAX_PATCHES', '1000'))
+# Values of GET ?mode=; a request with ?id= or /{id} is always 'detail'
+GET_MODES = ('list', 'search', 'map', 'clusters', 'facets', 'stats', 'export')
 
+count_cache = TTLCache(
+    max_entries=int(os.environ.get('CATALOG_COUNT_CACHE_SIZE', '256')),
+    ttl=float(os.environ.get('CATALOG_COUNT_TTL_SECONDS', '30'))
+)
+
+# Anonymous responses, keyed by (catalog version, mode, filters, limit, cursor); each entry
+# also keeps the compressed bodies already produced for it, per content coding
+response_cache = TTLCache(
+    max_entries=int(os.environ.get('CATALOG_RESPONSE_CACHE_SIZE', '512')),
+    ttl=float(os.environ.get('CATALOG_RESPONSE_TTL_SECONDS', '60'))
+)
+
+# Cluster lists per (catalog version, zoom, tile, filters without bbox): panning
+# the map only computes the tiles that scrolled into view
+cluster_cache = TTLCache(
+    max_entries=int(os.environ.get('CATALOG_CLUSTER_CACHE_SIZE', '4096')),
+    ttl=float(os.environ.get('CATALOG_CLUSTER_TTL_SECONDS', '300'))
+)
+
+# Sidebar facet counts per (catalog version, filter set), so they never outlive the ETag they are sent with
+facet_cache = TTLCache(
+    max_entries=int(os.environ.get('CATALOG_FACET_CACHE_SIZE', '256')),
+    ttl=float(os.environ.get('CATALOG_FACET_TTL_SECONDS', '15'))
+)
+
+# currency_rates rows (AMD per unit) for currency=; rates move rarely
+rates_cache = TTLCache(
+    max_entries=1,
+    ttl=float(os.environ.get('CATALOG_RATES_TTL_SECONDS', '60'))
+)
+
+# Admins get inactive listings from the same URLs, so a shared cache must key on the credential too
+CATALOG_VARY = 'Accept-Encoding, X-Auth-Token, Authorization'
+PUBLIC_CACHE_CONTROL = 'public, max-age={}, stale-while-revalidate={}'.format(
+    int(os.environ.get('CATALOG_CACHE_MAX_AGE_SECONDS', '30')),
+    int(os.environ.get('CATALOG_STALE_WHILE_REVALIDATE_SECONDS', '120'))
+)
+
+# How long a warm container trusts its last read of catalog_version.version
+catalog_version = VersionCounter(
+    check_interval=float(os.environ.get('CATALOG_VERSION_CHECK_SECONDS', '2'))
+)
+
+def parse_limit(raw: Optional[str], default: int = PAGE_SIZE_DEFAULT, maximum: int = PAGE_SIZE_MAX) -> int:
+    try:
+        limit = int(raw) if raw else default
+    except ValueError:
+        limit = default
+    return max(1, min(limit, maximum))
+
+def encode_cursor(sort: str, sort_key: Any, property_id: int) -> str:
+    if isinstance(sort_key, datetime):
+        sort_key = sort_key.isoformat()
+    elif isinstance(sort_key, Decimal):
+        sort_key = str(sort_key)
+    raw = json.dumps([sort, sort_key, property_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor_value: str, sort: str) -> Tuple[Any, int]:
+    '''A cursor is only valid for the sort order that produced it.'''
+    padded = cursor_value + '=' * (-len(cursor_value) % 4)
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if len(payload) == 2:
+            # cursors issued before sort orders existed: [created_at, id]
+            payload = ['newest'] + payload
+        cursor_sort, sort_key, property_id = payload
+        if cursor_sort != sort:
+            raise ValueError('Cursor belongs to another sort order')
+        if sort == SEARCH_SORT:
+            return float(sort_key), int(property_id)
+        spec = SORTS[sort]
+        if sort_key is None and spec.nullable:
+            # last row of the page had no sort key: paging through those rows by id
+            return None, int(property_id)
+        return spec.key_type(sort_key), int(property_id)
+    except (ValueError, TypeError, UnicodeError, KeyError, ArithmeticError):
+        raise ValueError('Invalid cursor')
+
+def load_facets(cursor: Any, filters: Dict[str, Any]) -> Dict[str, Any]:
+    facets_sql, facets_params = build_facets(filters, FACET_PRICE_BINS)
+    execute_prepared(cursor, facets_sql, facets_params)
+    rows = cursor.fetchall()
+    
+    facets: Dict[str, List[Dict[str, Any]]] = {name: [] for name in FACET_GROUPING_IDS.values() if name}
+    total = 0
+    low = high = None
+    for row in rows:
+        facet = FACET_GROUPING_IDS[row['grouping_id']]
+        if facet is None:
+            total, low, high = row['total'], row['low'], row['high']
+        elif facet != 'price':
+            value = row['rooms_bucket' if facet == 'rooms' else facet]
+            if value is not None and row[f'{facet}_count']:
+                if facet == 'rooms' and value == FACET_ROOMS_MAX_BUCKET:
+                    value = f'{value}+'
+                facets[facet].append({'value': str(value), 'count': row[f'{facet}_count']})
+    
+    if low is not None:
+        width = (max(high, low + 1) - low) / FACET_PRICE_BINS
+        bins = {row['price_bin']: row['price_count'] for row in rows
+                if FACET_GROUPING_IDS[row['grouping_id']] == 'price' and row['price_bin'] is not None}
+        facets['price'] = [
+            {'from': low + width * (index - 1), 'to': low + width * index, 'count': bins.get(index, 0)}
+            for index in range(1, FACET_PRICE_BINS + 1)
+        ]
+    
+    for name in ('district', 'property_type', 'transaction_type'):
+        facets[name].sort(key=lambda option: (-option['count'], option['value']))
+    facets['rooms'].sort(key=lambda option: option['value'])
+    return {'facets': facets, 'count': total}
+
+def get_header(headers: Dict[str, str], name: str) -> str:
+    lowered = name.lower()
+    for key, value in (headers or {}).items():
+        if key.lower() == lowered:
+            return value or ''
+    return ''
+
+def make_etag(total: int, last_updated: Optional[datetime], request_key: Tuple) -> str:
+    raw = f"{total}|{last_updated.isoformat() if last_updated else ''}|{request_key!r}"
+    return '"' + hashlib.sha1(raw.encode('utf-8')).hexdigest() + '"'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag == '*' or untag_etag(tag)[0] == etag:
+            return True
+    return False
+
+def not_modified_etag(if_none_match: str, etag: str, encoding: Optional[str]) -> str:
+    '''
+    The validator for a 304: what the 200 it revalidates carried, i.e. the
+    ETag tagged with the coding when the client holds that compressed copy,
+    and the plain ETag when it holds an uncompressed one (small bodies).
+    '''
+    if encoding:
+        tagged = tag_etag(etag, encoding)
+        for tag in if_none_match.split(','):
+            tag = tag.strip()
+            if (tag[2:] if tag.startswith('W/') else tag) == tagged:
+                return tagged
+    return etag
+
+def body_response(headers: Dict[str, str], body: str, encoding: Optional[str], encoded: Optional[str]) -> Dict[str, Any]:
+    '''200 response carrying encoded, the body compressed with encoding, when there is one.'''
+    if encoded is None:
+        return {
+            'statusCode': 200,
+            'headers': headers,
+            'body': body,
+            'isBase64Encoded': False
+        }
+    annotate(encoding=encoding)
+    headers = {**headers, 'Content-Encoding': encoding}
+    if 'ETag' in headers:
+        headers['ETag'] = tag_etag(headers['ETag'], encoding)
+    return {
+        'statusCode': 200,
+        'headers': headers,
+        'body': encoded,
+        'isBase64Encoded': True
+    }
+
+def load_catalog_version(cursor: Any) -> int:
+    execute_prepared(cursor, 'SELECT version FROM catalog_version WHERE id = 1')
+    row = cursor.fetchone()
+    return row['version'] if row else 0
+
+def load_currency_rates(cursor: Any) -> Dict[str, float]:
+    rates = rates_cache.get('rates')
+    if rates is None:
+        execute_prepared(cursor, 'SELECT currency, amd_per_unit FROM currency_rates')
+        rates = {row['currency']: float(row['amd_per_unit']) for row in cursor.fetchall()}
+        rates_cache.set('rates', rates)
+    return rates
+
+def invalidate_catalog_caches() -> None:
+    catalog_version.invalidate()
+    response_cache.clear()
+    count_cache.clear()
+    facet_cache.clear()
+
+@instrumented
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
     
@@ -22,8 +232,8 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'statusCode': 200,
             'headers': {
                 'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Auth-Token',
+                'Access-Control-Allow-Methods': 'GET, POST, PUT, PATCH, DELETE, OPTIONS',
+                'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Auth-Token, If-None-Match',
                 'Access-Control-Max-Age': '86400'
             },
             'body': '',
@@ -44,230 +254,460 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     
     conn = None
     try:
-        conn = psycopg2.connect(dsn)
+        with phase('connect'):
+            conn = get_connection(dsn)
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         
+        if method in ('POST', 'PUT', 'PATCH', 'DELETE'):
+            try:
+                with phase('auth'):
+                    authenticate(event.get('headers') or {}, cursor)
+            except AuthError as e:
+                return {
+                    'statusCode': e.status_code,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': json.dumps({'ok': False, 'error': e.message}),
+                    'isBase64Encoded': False
+                }
+        
         if method == 'GET':
-            headers = event.get('headers', {})
-            auth_header = headers.get('Authorization', '')
-            
+            headers = event.get('headers') or {}
             is_admin = False
-            if auth_header.startswith('Bearer '):
-                token = auth_header[7:]
-                secret_key = os.environ.get('JWT_SECRET', 'default-secret-change-in-production')
-                
+            if extract_token(headers):
                 try:
-                    payload = jwt.decode(token, secret_key, algorithms=['HS256'])
-                    if payload.get('role') == 'admin':
-                        is_admin = True
-                except jwt.InvalidTokenError:
+                    with phase('auth'):
+                        authenticate(headers, cursor)
+                    is_admin = True
+                except AuthError:
                     pass
             
             query_params = event.get('queryStringParameters', {}) or {}
+            filters = parse_filters(query_params)
+            mode = query_params.get('mode', '').strip() or 'list'
+            
+            property_id = (event.get('pathParameters') or {}).get('id') or query_params.get('id')
+            if property_id:
+                mode = 'detail'
+                filters = {k: v for k, v in filters.items() if k == 'currency'}
+            elif mode not in GET_MODES:
+                return {
+                    'statusCode': 400,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': json.dumps({'ok': False, 'error': f"mode must be one of {', '.join(GET_MODES)}"}),
+                    'isBase64Encoded': False
+                }
+            annotate(route=f'GET {mode}')
             
-            where_conditions = []
-            
-            district = query_params.get('district', '').strip()
-            if district and district != 'Все районы':
-                escaped_district = escape_sql_string(district)
-                where_conditions.append(f"district = '{escaped_district}'")
-            
-            property_type = query_params.get('type', '').strip()
-            if property_type and property_type != 'all':
-                escaped_type = escape_sql_string(property_type)
-                where_conditions.append(f"property_type = '{escaped_type}'")
-            
-            transaction_type = query_params.get('transaction', '').strip()
-            if transaction_type and transaction_type != 'all':
-                escaped_transaction = escape_sql_string(transaction_type)
-                where_conditions.append(f"transaction_type = '{escaped_transaction}'")
+            if mode == 'stats':
+                if not is_admin:
+                    return {
+                        'statusCode': 403,
+                        'headers': {
+                            'Content-Type': 'application/json',
+                            'Access-Control-Allow-Origin': '*'
+                        },
+                        'body': json.dumps({'ok': False, 'error': 'Admin access required'}),
+                        'isBase64Encoded': False
+                    }
+                
+                return {
+                    'statusCode': 200,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': json.dumps({
+                        'ok': True,
+                        'data': {
+                            'response_cache': response_cache.stats(),
+                            'count_cache': count_cache.stats(),
+                            'cluster_cache': cluster_cache.stats(),
+                            'facet_cache': facet_cache.stats(),
+                            'auth': auth_cache_stats(),
+                            'pool': get_pool(dsn).stats(),
+                            'timings': timing_stats(),
+                            'queries': query_report(query_params)
+                        }
+                    }),
+                    'isBase64Encoded': False
+                }
             
-            min_price = query_params.get('min_price', '').strip()
-            if min_price:
+            if mode == 'export':
+                export_format = query_params.get('format', 'ndjson').strip()
+                if not is_admin or export_format not in FORMATS:
+                    return {
+                        'statusCode': 403 if not is_admin else 400,
+                        'headers': {
+                            'Content-Type': 'application/json',
+                            'Access-Control-Allow-Origin': '*'
+                        },
+                        'body': json.dumps({
+                            'ok': False,
+                            'error': 'Admin access required' if not is_admin else 'format must be ndjson or csv'
+                        }),
+                        'isBase64Encoded': False
+                    }
+                
+                body = export_properties(conn, export_format, include_inactive=query_params.get('status') == 'all')
+                encoding = negotiate(get_header(headers, 'Accept-Encoding'))
+                with phase('compress'):
+                    encoded = encode(body, encoding)
+                return body_response({
+                    'Content-Type': CONTENT_TYPES[export_format],
+                    'Content-Disposition': f'attachment; filename="properties.{export_format}"',
+                    'Access-Control-Allow-Origin': '*',
+                    'Cache-Control': 'private, no-store',
+                    'Vary': 'Accept-Encoding'
+                }, body, encoding, encoded)
+            
+            zoom = None
+            tiles = []
+            if mode == 'clusters':
                 try:
-                    min_price_val = float(min_price)
-                    where_conditions.append(f"price >= {min_price_val}")
+                    zoom = int(query_params.get('zoom', ''))
                 except ValueError:
-                    pass
+                    zoom = -1
+                if 'bbox' not in filters or not 0 <= zoom <= MAX_CLUSTER_ZOOM:
+                    return {
+                        'statusCode': 400,
+                        'headers': {
+                            'Content-Type': 'application/json',
+                            'Access-Control-Allow-Origin': '*'
+                        },
+                        'body': json.dumps({'ok': False, 'error': f'Clusters mode requires bbox and zoom 0-{MAX_CLUSTER_ZOOM}'}),
+                        'isBase64Encoded': False
+                    }
+                tiles = tiles_for_bbox(filters['bbox'], zoom)
+                if len(tiles) > CLUSTER_MAX_TILES:
+                    return {
+                        'statusCode': 400,
+                        'headers': {
+                            'Content-Type': 'application/json',
+                            'Access-Control-Allow-Origin': '*'
+                        },
+                        'body': json.dumps({'ok': False, 'error': 'Viewport too large for this zoom'}),
+                        'isBase64Encoded': False
+                    }
             
-            max_price = query_params.get('max_price', '').strip()
-            if max_price:
-                try:
-                    max_price_val = float(max_price)
-                    where_conditions.append(f"price <= {max_price_val}")
-                except ValueError:
-                    pass
+            if mode == 'map':
+                limit = parse_limit(query_params.get('limit', '').strip(), MAP_POINTS_MAX, MAP_POINTS_MAX)
+            else:
+                limit = parse_limit(query_params.get('limit', '').strip())
+            cursor_value = query_params.get('cursor', '').strip()
             
-            rooms = query_params.get('rooms', '').strip()
-            if rooms:
-                try:
-                    rooms_val = int(rooms)
-                    where_conditions.append(f"rooms = {rooms_val}")
-                except ValueError:
-                    pass
+            try:
+                columns = parse_fields(query_params.get('fields', ''))
+                if property_id:
+                    property_id = parse_property_id(property_id)
+                if 'currency' in filters:
+                    apply_currency(filters, load_currency_rates(cursor))
+                sort = parse_sort(query_params.get('sort', ''), filters) if mode == 'list' else None
+                columns = output_columns(columns, filters)
+            except ValidationError as e:
+                return {
+                    'statusCode': 400,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': json.dumps({'ok': False, 'error': f'Invalid field {e.field}'}),
+                    'isBase64Encoded': False
+                }
             
-            query_text = query_params.get('query', '').strip()
-            if query_text:
-                escaped_query = escape_sql_string(query_text)
-                where_conditions.append(f"(title ILIKE '%{escaped_query}%' OR description ILIKE '%{escaped_query}%' OR address ILIKE '%{escaped_query}%')")
-            
-            where_conditions.append("status = 'active'")
-            
-            base_query = """
-                SELECT id, title, description, property_type, transaction_type, 
-                       price, currency, area, rooms, bedrooms, bathrooms, 
-                       floor, total_floors, year_built, district, address, 
-                       street_name, house_number, apartment_number,
-                       latitude, longitude, features, images, status, 
-                       created_at, updated_at
-                FROM properties
-            """
-            
-            if where_conditions:
-                query = base_query + " WHERE " + " AND ".join(where_conditions)
-            else:
-                query = base_query
-            
-            query += " ORDER BY created_at DESC"
-            
-            cursor.execute(query)
-            properties = cursor.fetchall()
-            
-            properties_list = []
-            for prop in properties:
-                prop_dict = dict(prop)
-                if prop_dict.get('price'):
-                    prop_dict['price'] = float(prop_dict['price'])
-                if prop_dict.get('area'):
-                    prop_dict['area'] = float(prop_dict['area'])
-                if prop_dict.get('latitude'):
-                    prop_dict['latitude'] = float(prop_dict['latitude'])
-                if prop_dict.get('longitude'):
-                    prop_dict['longitude'] = float(prop_dict['longitude'])
+            response_headers = {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*',
+                'Cache-Control': 'private, no-store' if is_admin else PUBLIC_CACHE_CONTROL,
+                'Vary': CATALOG_VARY
+            }
+            if_none_match = get_header(headers, 'If-None-Match')
+            encoding = negotiate(get_header(headers, 'Accept-Encoding'))
+            
+            cache_key = None
+            if not is_admin:
+                version = catalog_version.get(lambda: load_catalog_version(cursor))
+                cache_key = (version, mode, property_id, filter_key(filters), limit, cursor_value, tuple(columns), zoom, sort)
+                cached = response_cache.get(cache_key)
+                if cached is not None:
+                    annotate(cache='HIT')
+                    etag, cached_body, encoded_bodies = cached
+                    if etag_matches(if_none_match, etag):
+                        return {
+                            'statusCode': 304,
+                            'headers': {**response_headers, 'ETag': not_modified_etag(if_none_match, etag, encoding), 'X-Cache': 'HIT'},
+                            'body': '',
+                            'isBase64Encoded': False
+                        }
+                    if encoding is not None and encoding not in encoded_bodies:
+                        with phase('compress'):
+                            encoded_bodies[encoding] = encode(cached_body, encoding)
+                    return body_response(
+                        {**response_headers, 'ETag': etag, 'X-Cache': 'HIT'},
+                        cached_body, encoding, encoded_bodies.get(encoding)
+                    )
+            
+            if mode == 'detail':
+                detail_sql, detail_params = build_detail(property_id, columns, active_only=not is_admin, filters=filters)
+                execute_prepared(cursor, detail_sql, detail_params)
+                prop = cursor.fetchone()
                 
-                prop_dict['features'] = prop_dict.get('features') or []
-                prop_dict['images'] = prop_dict.get('images') or []
+                if not prop:
+                    return {
+                        'statusCode': 404,
+                        'headers': {
+                            'Content-Type': 'application/json',
+                            'Access-Control-Allow-Origin': '*'
+                        },
+                        'body': json.dumps({'ok': False, 'error': 'Property not found'}),
+                        'isBase64Encoded': False
+                    }
                 
-                if prop_dict.get('created_at'):
-                    prop_dict['created_at'] = prop_dict['created_at'].isoformat()
-                if prop_dict.get('updated_at'):
-                    prop_dict['updated_at'] = prop_dict['updated_at'].isoformat()
+                etag = None
+                if cache_key:
+                    etag = make_etag(1, prop['updated_at'], cache_key[1:])
+                    response_headers['ETag'] = etag
+                    if etag_matches(if_none_match, etag):
+                        return {
+                            'statusCode': 304,
+                            'headers': {**response_headers, 'ETag': not_modified_etag(if_none_match, etag, encoding), 'X-Cache': 'MISS'},
+                            'body': '',
+                            'isBase64Encoded': False
+                        }
                 
-                properties_list.append(prop_dict)
-            
-            return {
-                'statusCode': 200,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({
-                    'ok': True,
-                    'data': {
-                        'properties': properties_list,
-                        'count': len(properties_list)
-                    }
-                }),
-                'isBase64Encoded': False
-            }
-        
-        elif method == 'POST':
-            headers = event.get('headers', {})
-            token = headers.get('X-Auth-Token') or headers.get('x-auth-token', '')
-            
-            if not token:
-                auth_header = headers.get('Authorization', '')
-                if auth_header.startswith('Bearer '):
-                    token = auth_header[7:]
+                with phase('serialize'):
+                    body = json.dumps({'ok': True, 'data': property_to_json(prop, columns)})
+                with phase('compress'):
+                    encoded = encode(body, encoding)
+                if cache_key:
+                    response_cache.set(cache_key, (etag, body, {encoding: encoded} if encoding else {}))
+                
+                return body_response(
+                    {**response_headers, 'X-Cache': 'MISS' if cache_key else 'BYPASS'},
+                    body, encoding, encoded
+                )
             
-            if not token:
+            if mode == 'search' and 'query' not in filters:
                 return {
-                    'statusCode': 401,
+                    'statusCode': 400,
                     'headers': {
                         'Content-Type': 'application/json',
                         'Access-Control-Allow-Origin': '*'
                     },
-                    'body': json.dumps({'ok': False, 'error': 'Authentication required'}),
+                    'body': json.dumps({'ok': False, 'error': 'Search mode requires a query'}),
                     'isBase64Encoded': False
                 }
             
-            secret_key = os.environ.get('JWT_SECRET', 'default-secret-change-in-production')
+            after = None
+            if mode in ('list', 'search') and cursor_value:
+                try:
+                    after = decode_cursor(cursor_value, sort if mode == 'list' else SEARCH_SORT)
+                except ValueError:
+                    return {
+                        'statusCode': 400,
+                        'headers': {
+                            'Content-Type': 'application/json',
+                            'Access-Control-Allow-Origin': '*'
+                        },
+                        'body': json.dumps({'ok': False, 'error': 'Invalid cursor'}),
+                        'isBase64Encoded': False
+                    }
+            
+            # The summary (count and ETag inputs) covers every row the response is computed from.
+            # Search results are a subset of the rows matching the other filters, so the summary
+            # of that superset changes whenever the search result could; facet counts each leave
+            # out their own filter, so they read all rows matching the non-facet filters; clusters
+            # group whole tiles, which reach past the viewport.
+            if mode == 'search':
+                summary_filters = {k: v for k, v in filters.items() if k != 'query'}
+            elif mode == 'facets':
+                summary_filters = facet_base_filters(filters)
+            elif mode == 'clusters':
+                summary_filters = cluster_area_filters(filters, zoom, tiles)
+            else:
+                summary_filters = filters
+            summary_key = (cache_key[0], filter_key(summary_filters)) if cache_key else None
+            summary = count_cache.get(summary_key) if summary_key else None
+            if summary is None:
+                count_sql, count_params = build_count(summary_filters)
+                execute_prepared(cursor, count_sql, count_params)
+                row = cursor.fetchone()
+                summary = (row['total'], row['last_updated'])
+                if summary_key:
+                    count_cache.set(summary_key, summary)
+            
+            etag = None
+            if cache_key:
+                etag = make_etag(summary[0], summary[1], cache_key[1:])
+                response_headers['ETag'] = etag
+                if etag_matches(if_none_match, etag):
+                    return {
+                        'statusCode': 304,
+                        'headers': {**response_headers, 'ETag': not_modified_etag(if_none_match, etag, encoding), 'X-Cache': 'MISS'},
+                        'body': '',
+                        'isBase64Encoded': False
+                    }
             
-            try:
-                payload = jwt.decode(token, secret_key, algorithms=['HS256'])
-                if payload.get('role') != 'admin':
+            if mode == 'map':
+                map_sql, map_params = build_map(filters, limit + 1)
+                page = fetch_page(conn, map_sql, map_params, MAP_COLUMNS, limit, keyed=False)
+                body = (
+                    '{"ok": true, "data": {"points": ' + page.items_json
+                    + ', "count": ' + json.dumps(summary[0])
+                    + ', "truncated": ' + json.dumps(page.has_more) + '}}'
+                )
+            
+            elif mode == 'facets':
+                facets_key = (cache_key[0], filter_key(filters)) if cache_key else None
+                facets = facet_cache.get(facets_key) if facets_key else None
+                if facets is None:
+                    facets = load_facets(cursor, filters)
+                    if facets_key:
+                        facet_cache.set(facets_key, facets)
+                body = json.dumps({'ok': True, 'data': facets})
+            
+            elif mode == 'clusters':
+                tile_filters = filter_key({k: v for k, v in filters.items() if k != 'bbox'})
+                clusters_by_tile = {}
+                missing_tiles = []
+                for tile in tiles:
+                    tile_clusters = cluster_cache.get((cache_key[0], zoom, tile, tile_filters)) if cache_key else None
+                    if tile_clusters is None:
+                        missing_tiles.append(tile)
+                    else:
+                        clusters_by_tile[tile] = tile_clusters
+                
+                if missing_tiles:
+                    clusters_sql, clusters_params = build_clusters(filters, zoom, missing_tiles)
+                    execute_prepared(cursor, clusters_sql, clusters_params)
+                    computed = {tile: [] for tile in missing_tiles}
+                    for row in cursor.fetchall():
+                        tile = (row['cell_x'] >> CELL_BITS, row['cell_y'] >> CELL_BITS)
+                        if tile in computed:
+                            computed[tile].append({
+                                'lat': row['lat'],
+                                'lng': row['lng'],
+                                'count': row['count'],
+                                'min_price': row['min_price'],
+                                'median_price': row['median_price'],
+                                'id': row['id'] if row['count'] == 1 else None
+                            })
+                    for tile, tile_clusters in computed.items():
+                        clusters_by_tile[tile] = tile_clusters
+                        if cache_key:
+                            cluster_cache.set((cache_key[0], zoom, tile, tile_filters), tile_clusters)
+                
+                clusters = [cluster for tile in tiles for cluster in clusters_by_tile[tile]]
+                body = json.dumps({
+                    'ok': True,
+                    'data': {
+                        'clusters': clusters,
+                        # the listings in the returned clusters, which cover whole tiles
+                        'count': sum(cluster['count'] for cluster in clusters),
+                        'zoom': zoom
+                    }
+                })
+            
+            else:
+                if mode == 'search':
+                    search_sql, search_params = build_search(filters, limit + 1, columns, after)
+                    page = fetch_page(conn, search_sql, search_params, columns + ['relevance'], limit, counted=True)
+                    total_count = page.total if page.total is not None else page.count
+                    next_cursor = encode_cursor(SEARCH_SORT, *page.last_key) if page.has_more else None
+                
+                else:
+                    total_count = summary[0]
+                    listing_sql, listing_params = build_listing(filters, after, limit + 1, columns, sort)
+                    page = fetch_page(conn, listing_sql, listing_params, columns, limit)
+                    next_cursor = encode_cursor(sort, *page.last_key) if page.has_more else None
+                
+                # The page is already JSON text; splice it in rather than decoding and re-encoding it
+                body = (
+                    '{"ok": true, "data": {"properties": ' + page.items_json
+                    + ', "count": ' + json.dumps(total_count)
+                    + ', "next_cursor": ' + json.dumps(next_cursor) + '}}'
+                )
+            with phase('compress'):
+                encoded = encode(body, encoding)
+            if cache_key:
+                response_cache.set(cache_key, (etag, body, {encoding: encoded} if encoding else {}))
+            
+            return body_response(
+                {**response_headers, 'X-Cache': 'MISS' if cache_key else 'BYPASS'},
+                body, encoding, encoded
+            )
+        
+        elif method == 'POST':
+            query_params = event.get('queryStringParameters', {}) or {}
+            if query_params.get('mode') == 'import':
+                import_format = query_params.get('format', 'ndjson').strip()
+                if import_format not in FORMATS:
                     return {
-                        'statusCode': 403,
+                        'statusCode': 400,
                         'headers': {
                             'Content-Type': 'application/json',
                             'Access-Control-Allow-Origin': '*'
                         },
-                        'body': json.dumps({'ok': False, 'error': 'Admin access required'}),
+                        'body': json.dumps({'ok': False, 'error': 'format must be ndjson or csv'}),
                         'isBase64Encoded': False
                     }
-            except jwt.InvalidTokenError:
+                
+                raw_body = event.get('body') or ''
+                if event.get('isBase64Encoded'):
+                    raw_body = base64.b64decode(raw_body).decode('utf-8-sig')
+                
+                try:
+                    result = import_properties(conn, raw_body, import_format, dry_run=query_params.get('dry_run') == '1')
+                except BulkImportError as e:
+                    return {
+                        'statusCode': 400,
+                        'headers': {
+                            'Content-Type': 'application/json',
+                            'Access-Control-Allow-Origin': '*'
+                        },
+                        'body': json.dumps({'ok': False, 'error': e.message, 'line': e.line}),
+                        'isBase64Encoded': False
+                    }
+                
+                if result['inserted'] or result['updated']:
+                    invalidate_catalog_caches()
+                
                 return {
-                    'statusCode': 401,
+                    'statusCode': 200,
                     'headers': {
                         'Content-Type': 'application/json',
                         'Access-Control-Allow-Origin': '*'
                     },
-                    'body': json.dumps({'ok': False, 'error': 'Invalid token'}),
+                    'body': json.dumps({'ok': True, 'data': result}),
                     'isBase64Encoded': False
                 }
             
             body_data = json.loads(event.get('body', '{}'))
             
-            title = escape_sql_string(body_data.get('title', ''))
-            description = escape_sql_string(body_data.get('description', ''))
-            property_type = escape_sql_string(body_data.get('property_type', 'apartment'))
-            transaction_type = escape_sql_string(body_data.get('transaction_type', 'rent'))
-            price = float(body_data.get('price', 0))
-            currency = escape_sql_string(body_data.get('currency', 'AMD'))
-            area = float(body_data.get('area', 0)) if body_data.get('area') else 0
-            rooms = int(body_data.get('rooms', 0)) if body_data.get('rooms') else 0
-            bedrooms = int(body_data.get('bedrooms', 0)) if body_data.get('bedrooms') else 0
-            bathrooms = int(body_data.get('bathrooms', 0)) if body_data.get('bathrooms') else 0
-            floor = int(body_data.get('floor', 0)) if body_data.get('floor') else 0
-            total_floors = int(body_data.get('total_floors', 0)) if body_data.get('total_floors') else 0
-            year_built = int(body_data.get('year_built', 2020)) if body_data.get('year_built') else 2020
-            district = escape_sql_string(body_data.get('district', ''))
-            address = escape_sql_string(body_data.get('address', ''))
-            street_name = escape_sql_string(body_data.get('street_name', ''))
-            house_number = escape_sql_string(body_data.get('house_number', ''))
-            apartment_number = escape_sql_string(body_data.get('apartment_number', ''))
-            latitude = float(body_data.get('latitude', 40.1792))
-            longitude = float(body_data.get('longitude', 44.4991))
-            status = escape_sql_string(body_data.get('status', 'active'))
-            
-            features = body_data.get('features', [])
-            features_str = "ARRAY[" + ",".join([f"'{escape_sql_string(f)}'" for f in features]) + "]" if features else "'{}'"
-            
-            images = body_data.get('images', [])
-            images_str = "ARRAY[" + ",".join([f"'{escape_sql_string(img)}'" for img in images]) + "]" if images else "'{}'"
-            
-            badges = body_data.get('badges', [])
-            badges_str = "ARRAY[" + ",".join([f"'{escape_sql_string(b)}'" for b in badges]) + "]" if badges else "'{}'"
-            
-            insert_query = f"""
-                INSERT INTO properties (
-                    title, description, property_type, transaction_type, price, currency,
-                    area, rooms, bedrooms, bathrooms, floor, total_floors, year_built,
-                    district, address, street_name, house_number, apartment_number,
-                    latitude, longitude, features, images, badges, status
-                ) VALUES (
-                    '{title}', '{description}', '{property_type}', '{transaction_type}', 
-                    {price}, '{currency}', {area}, {rooms}, {bedrooms}, {bathrooms}, 
-                    {floor}, {total_floors}, {year_built}, '{district}', '{address}',
-                    '{street_name}', '{house_number}', '{apartment_number}',
-                    {latitude}, {longitude}, {features_str}, {images_str}, {badges_str}, '{status}'
-                ) RETURNING id
-            """
-            
-            cursor.execute(insert_query)
+            try:
+                values = validate_fields(body_data, partial=False)
+            except ValidationError as e:
+                return {
+                    'statusCode': 400,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': json.dumps({'ok': False, 'error': f'Invalid field {e.field}'}),
+                    'isBase64Encoded': False
+                }
+            
+            insert_query, insert_params = build_insert(values)
+            cursor.execute(insert_query, insert_params)
             result = cursor.fetchone()
             property_id = result['id'] if result else None
             conn.commit()
+            invalidate_catalog_caches()
             
             return {
                 'statusCode': 201,
@@ -286,149 +726,39 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             }
         
         elif method == 'PUT':
-            headers = event.get('headers', {})
-            token = headers.get('X-Auth-Token') or headers.get('x-auth-token', '')
-            
-            if not token:
-                auth_header = headers.get('Authorization', '')
-                if auth_header.startswith('Bearer '):
-                    token = auth_header[7:]
+            property_id = event.get('pathParameters', {}).get('id')
+            if not property_id:
+                query_params = event.get('queryStringParameters', {}) or {}
+                property_id = query_params.get('id')
             
-            if not token:
+            if not property_id:
                 return {
-                    'statusCode': 401,
+                    'statusCode': 400,
                     'headers': {
                         'Content-Type': 'application/json',
                         'Access-Control-Allow-Origin': '*'
                     },
-                    'body': json.dumps({'ok': False, 'error': 'Authentication required'}),
+                    'body': json.dumps({'ok': False, 'error': 'Property ID is required'}),
                     'isBase64Encoded': False
                 }
             
-            secret_key = os.environ.get('JWT_SECRET', 'default-secret-change-in-production')
+            body_data = json.loads(event.get('body', '{}'))
             
             try:
-                payload = jwt.decode(token, secret_key, algorithms=['HS256'])
-                if payload.get('role') != 'admin':
-                    return {
-                        'statusCode': 403,
-                        'headers': {
-                            'Content-Type': 'application/json',
-                            'Access-Control-Allow-Origin': '*'
-                        },
-                        'body': json.dumps({'ok': False, 'error': 'Admin access required'}),
-                        'isBase64Encoded': False
-                    }
-            except jwt.InvalidTokenError:
-                return {
-                    'statusCode': 401,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*'
-                    },
-                    'body': json.dumps({'ok': False, 'error': 'Invalid token'}),
-                    'isBase64Encoded': False
-                }
-            
-            property_id = event.get('pathParameters', {}).get('id')
-            if not property_id:
-                query_params = event.get('queryStringParameters', {}) or {}
-                property_id = query_params.get('id')
-            
-            if not property_id:
+                property_id = parse_property_id(property_id)
+                values = validate_fields(body_data, partial=True)
+            except ValidationError as e:
                 return {
                     'statusCode': 400,
                     'headers': {
                         'Content-Type': 'application/json',
                         'Access-Control-Allow-Origin': '*'
                     },
-                    'body': json.dumps({'ok': False, 'error': 'Property ID is required'}),
+                    'body': json.dumps({'ok': False, 'error': f'Invalid field {e.field}'}),
                     'isBase64Encoded': False
                 }
             
-            body_data = json.loads(event.get('body', '{}'))
-            
-            set_clauses = []
-            
-            if 'title' in body_data:
-                title = escape_sql_string(body_data['title'])
-                set_clauses.append(f"title = '{title}'")
-            if 'description' in body_data:
-                description = escape_sql_string(body_data['description'])
-                set_clauses.append(f"description = '{description}'")
-            if 'property_type' in body_data:
-                property_type = escape_sql_string(body_data['property_type'])
-                set_clauses.append(f"property_type = '{property_type}'")
-            if 'transaction_type' in body_data:
-                transaction_type = escape_sql_string(body_data['transaction_type'])
-                set_clauses.append(f"transaction_type = '{transaction_type}'")
-            if 'price' in body_data:
-                price = float(body_data['price'])
-                set_clauses.append(f"price = {price}")
-            if 'currency' in body_data:
-                currency = escape_sql_string(body_data['currency'])
-                set_clauses.append(f"currency = '{currency}'")
-            if 'area' in body_data:
-                area = float(body_data['area']) if body_data['area'] else 0
-                set_clauses.append(f"area = {area}")
-            if 'rooms' in body_data:
-                rooms = int(body_data['rooms']) if body_data['rooms'] else 0
-                set_clauses.append(f"rooms = {rooms}")
-            if 'bedrooms' in body_data:
-                bedrooms = int(body_data['bedrooms']) if body_data['bedrooms'] else 0
-                set_clauses.append(f"bedrooms = {bedrooms}")
-            if 'bathrooms' in body_data:
-                bathrooms = int(body_data['bathrooms']) if body_data['bathrooms'] else 0
-                set_clauses.append(f"bathrooms = {bathrooms}")
-            if 'floor' in body_data:
-                floor = int(body_data['floor']) if body_data['floor'] else 0
-                set_clauses.append(f"floor = {floor}")
-            if 'total_floors' in body_data:
-                total_floors = int(body_data['total_floors']) if body_data['total_floors'] else 0
-                set_clauses.append(f"total_floors = {total_floors}")
-            if 'year_built' in body_data:
-                year_built = int(body_data['year_built']) if body_data['year_built'] else 2020
-                set_clauses.append(f"year_built = {year_built}")
-            if 'district' in body_data:
-                district = escape_sql_string(body_data['district'])
-                set_clauses.append(f"district = '{district}'")
-            if 'address' in body_data:
-                address = escape_sql_string(body_data['address'])
-                set_clauses.append(f"address = '{address}'")
-            if 'street_name' in body_data:
-                street_name = escape_sql_string(body_data['street_name'])
-                set_clauses.append(f"street_name = '{street_name}'")
-            if 'house_number' in body_data:
-                house_number = escape_sql_string(body_data['house_number'])
-                set_clauses.append(f"house_number = '{house_number}'")
-            if 'apartment_number' in body_data:
-                apartment_number = escape_sql_string(body_data['apartment_number'])
-                set_clauses.append(f"apartment_number = '{apartment_number}'")
-            if 'latitude' in body_data:
-                latitude = float(body_data['latitude'])
-                set_clauses.append(f"latitude = {latitude}")
-            if 'longitude' in body_data:
-                longitude = float(body_data['longitude'])
-                set_clauses.append(f"longitude = {longitude}")
-            if 'status' in body_data:
-                status = escape_sql_string(body_data['status'])
-                set_clauses.append(f"status = '{status}'")
-            if 'features' in body_data:
-                features = body_data['features']
-                features_str = "ARRAY[" + ",".join([f"'{escape_sql_string(f)}'" for f in features]) + "]" if features else "'{}'"
-                set_clauses.append(f"features = {features_str}")
-            if 'images' in body_data:
-                images = body_data['images']
-                images_str = "ARRAY[" + ",".join([f"'{escape_sql_string(img)}'" for img in images]) + "]" if images else "'{}'"
-                set_clauses.append(f"images = {images_str}")
-            if 'badges' in body_data:
-                badges = body_data['badges']
-                badges_str = "ARRAY[" + ",".join([f"'{escape_sql_string(b)}'" for b in badges]) + "]" if badges else "'{}'"
-                set_clauses.append(f"badges = {badges_str}")
-            
-            set_clauses.append("updated_at = CURRENT_TIMESTAMP")
-            
-            if not set_clauses:
+            if not values:
                 return {
                     'statusCode': 400,
                     'headers': {
@@ -439,8 +769,8 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'isBase64Encoded': False
                 }
             
-            update_query = f"UPDATE properties SET {', '.join(set_clauses)} WHERE id = {property_id} RETURNING id"
-            cursor.execute(update_query)
+            update_query, update_params = build_update(values, property_id)
+            cursor.execute(update_query, update_params)
             result = cursor.fetchone()
             
             if not result:
@@ -455,6 +785,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 }
             
             conn.commit()
+            invalidate_catalog_caches()
             
             return {
                 'statusCode': 200,
@@ -472,69 +803,111 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             }
         
         elif method == 'DELETE':
-            headers = event.get('headers', {})
-            token = headers.get('X-Auth-Token') or headers.get('x-auth-token', '')
-            
-            if not token:
-                auth_header = headers.get('Authorization', '')
-                if auth_header.startswith('Bearer '):
-                    token = auth_header[7:]
+            property_id = event.get('pathParameters', {}).get('id')
+            if not property_id:
+                query_params = event.get('queryStringParameters', {}) or {}
+                property_id = query_params.get('id')
             
-            if not token:
+            if not property_id:
                 return {
-                    'statusCode': 401,
+                    'statusCode': 400,
                     'headers': {
                         'Content-Type': 'application/json',
                         'Access-Control-Allow-Origin': '*'
                     },
-                    'body': json.dumps({'ok': False, 'error': 'Authentication required'}),
+                    'body': json.dumps({'ok': False, 'error': 'Property ID is required'}),
                     'isBase64Encoded': False
                 }
             
-            secret_key = os.environ.get('JWT_SECRET', 'default-secret-change-in-production')
-            
             try:
-                payload = jwt.decode(token, secret_key, algorithms=['HS256'])
-                if payload.get('role') != 'admin':
-                    return {
-                        'statusCode': 403,
-                        'headers': {
-                            'Content-Type': 'application/json',
-                            'Access-Control-Allow-Origin': '*'
-                        },
-                        'body': json.dumps({'ok': False, 'error': 'Admin access required'}),
-                        'isBase64Encoded': False
-                    }
-            except jwt.InvalidTokenError:
+                property_id = parse_property_id(property_id)
+            except ValidationError as e:
                 return {
-                    'statusCode': 401,
+                    'statusCode': 400,
                     'headers': {
                         'Content-Type': 'application/json',
                         'Access-Control-Allow-Origin': '*'
                     },
-                    'body': json.dumps({'ok': False, 'error': 'Invalid token'}),
+                    'body': json.dumps({'ok': False, 'error': f'Invalid field {e.field}'}),
                     'isBase64Encoded': False
                 }
             
-            property_id = event.get('pathParameters', {}).get('id')
-            if not property_id:
-                query_params = event.get('queryStringParameters', {}) or {}
-                property_id = query_params.get('id')
+            delete_query, delete_params = build_delete(property_id)
+            cursor.execute(delete_query, delete_params)
+            conn.commit()
+            invalidate_catalog_caches()
             
-            if not property_id:
+            return {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps({
+                    'ok': True,
+                    'data': {
+                        'message': 'Property deleted successfully'
+                    }
+                }),
+                'isBase64Encoded': False
+            }
+    
+        elif method == 'PATCH':
+            try:
+                body_data = json.loads(event.get('body') or '{}')
+                if not isinstance(body_data, dict):
+                    raise ValidationError('body', 'expected an object')
+                if 'patches' in body_data:
+                    results = validate_patches(body_data['patches'], BATCH_MAX_PATCHES)
+                else:
+                    filters = parse_filter_object(body_data.get('filter') or {})
+                    if not filters:
+                        raise ValidationError('filter', 'at least one filter is required')
+                    values = validate_fields(body_data.get('fields') or {}, partial=True)
+                    if not values:
+                        raise ValidationError('fields', 'no fields to update')
+            except ValidationError as e:
                 return {
                     'statusCode': 400,
                     'headers': {
                         'Content-Type': 'application/json',
                         'Access-Control-Allow-Origin': '*'
                     },
-                    'body': json.dumps({'ok': False, 'error': 'Property ID is required'}),
+                    'body': json.dumps({'ok': False, 'error': f'Invalid field {e.field}'}),
                     'isBase64Encoded': False
                 }
+            except ValueError:
+                return {
+                    'statusCode': 400,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': json.dumps({'ok': False, 'error': 'Invalid JSON body'}),
+                    'isBase64Encoded': False
+                }
+            
+            if 'patches' in body_data:
+                patches = [(result['id'], result.pop('values')) for result in results if 'values' in result]
+                updated_ids = set()
+                if patches:
+                    batch_query, batch_params = build_batch_update(patches)
+                    cursor.execute(batch_query, batch_params)
+                    updated_ids = {row['id'] for row in cursor.fetchall()}
+                for result in results:
+                    if 'ok' not in result:
+                        result['ok'] = result['id'] in updated_ids
+                        if not result['ok']:
+                            result['error'] = 'Property not found'
+            else:
+                filtered_query, filtered_params = build_filtered_update(values, filters)
+                cursor.execute(filtered_query, filtered_params)
+                results = [{'id': row['id'], 'ok': True} for row in cursor.fetchall()]
             
-            delete_query = f"DELETE FROM properties WHERE id = {property_id}"
-            cursor.execute(delete_query)
             conn.commit()
+            updated_count = sum(1 for result in results if result['ok'])
+            if updated_count:
+                invalidate_catalog_caches()
             
             return {
                 'statusCode': 200,
@@ -545,7 +918,8 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'body': json.dumps({
                     'ok': True,
                     'data': {
-                        'message': 'Property deleted successfully'
+                        'updated': updated_count,
+                        'results': results
                     }
                 }),
                 'isBase64Encoded': False
@@ -564,7 +938,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     
     finally:
         if conn:
-            conn.close()
+            release_connection(conn)
     
     return {
         'statusCode': 405,
@@ -0,0 +1,795 @@
+'''
+Business: SQL builder for the properties catalog with a small fixed set of parameterised query shapes
+Args: normalised filters from queryStringParameters, request bodies for writes
+Returns: (sql, params) pairs with %s placeholders, ready for cursor.execute or execute_prepared
+'''
+
+import math
+import os
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+LIST_COLUMNS = [
+    'id', 'title', 'description', 'property_type', 'transaction_type',
+    'price', 'currency', 'area', 'rooms', 'bedrooms', 'bathrooms',
+    'floor', 'total_floors', 'year_built', 'district', 'address',
+    'street_name', 'house_number', 'apartment_number',
+    'latitude', 'longitude', 'features', 'images', 'status',
+    'created_at', 'updated_at'
+]
+
+MAP_COLUMNS = ['id', 'lat', 'lng', 'price', 'type']
+
+# Listings are indexed as points in an equirectangular projection around Yerevan:
+# longitude is scaled by cos(40.18°), so plain Euclidean distance on the point
+# ranks neighbours like metres do and the built-in GiST index can serve <-> (KNN).
+GEO_X_SCALE = 0.764
+GEO_POINT_SQL = f'point(longitude::float8 * {GEO_X_SCALE}, latitude::float8)'
+METRES_PER_DEGREE = 111320.0
+NEAR_RADIUS_DEFAULT = float(os.environ.get('CATALOG_NEAR_RADIUS_DEFAULT_M', '2000'))
+NEAR_RADIUS_MAX = float(os.environ.get('CATALOG_NEAR_RADIUS_MAX_M', '50000'))
+
+# Web-Mercator tile grid stored per row (geo_tile_x/geo_tile_y) at GRID_ZOOM. A
+# cluster cell is a tile CELL_BITS levels below the requested zoom, i.e. 4x4 cells
+# (64px at 256px tiles) per map tile, so any zoom groups by a plain bit shift.
+GRID_ZOOM = 20
+CELL_BITS = 2
+MAX_CLUSTER_ZOOM = GRID_ZOOM - CELL_BITS
+MERCATOR_MAX_LAT = 85.0511
+
+HAVERSINE_SQL = (
+    '(12742000 * asin(sqrt(power(sin(radians(latitude::float8 - %s) / 2), 2) '
+    '+ cos(radians(%s)) * cos(radians(latitude::float8)) '
+    '* power(sin(radians(longitude::float8 - %s) / 2), 2))))'
+)
+
+
+class ValidationError(ValueError):
+    def __init__(self, field: str, message: str):
+        super().__init__(f'{field}: {message}')
+        self.field = field
+        self.message = message
+
+
+def _text(value: Any) -> str:
+    if value is None:
+        return ''
+    if not isinstance(value, (str, int, float)):
+        raise TypeError('expected a string')
+    return str(value)
+
+def _number_or_zero(value: Any) -> float:
+    return float(value) if value else 0
+
+def _int_or_zero(value: Any) -> int:
+    return int(value) if value else 0
+
+def _year(value: Any) -> int:
+    return int(value) if value else 2020
+
+def _text_list(value: Any) -> List[str]:
+    if not value:
+        return []
+    if not isinstance(value, list):
+        raise TypeError('expected a list')
+    return [_text(item) for item in value]
+
+
+# column -> (converter, default used by POST when the field is missing)
+WRITABLE_FIELDS: Dict[str, Tuple[Callable[[Any], Any], Any]] = {
+    'title': (_text, ''),
+    'description': (_text, ''),
+    'property_type': (_text, 'apartment'),
+    'transaction_type': (_text, 'rent'),
+    'price': (float, 0),
+    'currency': (_text, 'AMD'),
+    'area': (_number_or_zero, 0),
+    'rooms': (_int_or_zero, 0),
+    'bedrooms': (_int_or_zero, 0),
+    'bathrooms': (_int_or_zero, 0),
+    'floor': (_int_or_zero, 0),
+    'total_floors': (_int_or_zero, 0),
+    'year_built': (_year, 2020),
+    'district': (_text, ''),
+    'address': (_text, ''),
+    'street_name': (_text, ''),
+    'house_number': (_text, ''),
+    'apartment_number': (_text, ''),
+    'latitude': (float, 40.1792),
+    'longitude': (float, 44.4991),
+    'features': (_text_list, []),
+    'images': (_text_list, []),
+    'badges': (_text_list, []),
+    'status': (_text, 'active')
+}
+
+
+def _convert(field: str, value: Any) -> Any:
+    converter, _ = WRITABLE_FIELDS[field]
+    try:
+        return converter(value)
+    except (TypeError, ValueError):
+        raise ValidationError(field, f'invalid value {value!r}')
+
+
+def validate_fields(body: Dict[str, Any], partial: bool) -> Dict[str, Any]:
+    '''
+    Convert a request body to column values. partial=True (PUT) keeps only
+    the fields present in the body; partial=False (POST) fills in defaults.
+    '''
+    values = {}
+    for field, (_, default) in WRITABLE_FIELDS.items():
+        if field in body:
+            values[field] = _convert(field, body[field])
+        elif not partial:
+            values[field] = _convert(field, default)
+    return values
+
+
+def parse_property_id(raw: Any) -> int:
+    try:
+        property_id = int(raw)
+    except (TypeError, ValueError):
+        raise ValidationError('id', f'invalid value {raw!r}')
+    if property_id <= 0:
+        raise ValidationError('id', f'invalid value {raw!r}')
+    return property_id
+
+
+def build_insert(values: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    columns = [field for field in WRITABLE_FIELDS if field in values]
+    sql = (
+        f"INSERT INTO properties ({', '.join(columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))}) RETURNING id"
+    )
+    return sql, [values[column] for column in columns]
+
+
+def build_update(values: Dict[str, Any], property_id: int) -> Tuple[str, List[Any]]:
+    columns = [field for field in WRITABLE_FIELDS if field in values]
+    assignments = [f'{column} = %s' for column in columns]
+    assignments.append('updated_at = CURRENT_TIMESTAMP')
+    sql = f"UPDATE properties SET {', '.join(assignments)} WHERE id = %s RETURNING id"
+    return sql, [values[column] for column in columns] + [property_id]
+
+
+def validate_patches(items: Any, max_patches: int) -> List[Dict[str, Any]]:
+    '''
+    [{"id": 1, "fields": {...}}, ...] -> one result per item, in order: either
+    {"id", "values"} ready for build_batch_update or {"id", "ok": False, "error"}.
+    Fields go through validate_fields(partial=True) exactly like PUT.
+    '''
+    if not isinstance(items, list) or not items:
+        raise ValidationError('patches', 'expected a non-empty list')
+    if len(items) > max_patches:
+        raise ValidationError('patches', f'at most {max_patches} patches per request')
+
+    results: List[Dict[str, Any]] = []
+    seen = set()
+    for item in items:
+        raw_id = item.get('id') if isinstance(item, dict) else None
+        try:
+            property_id = parse_property_id(raw_id)
+            fields = item.get('fields')
+            if not isinstance(fields, dict):
+                raise ValidationError('fields', 'expected an object')
+            values = validate_fields(fields, partial=True)
+        except ValidationError as e:
+            results.append({'id': raw_id, 'ok': False, 'error': f'Invalid field {e.field}'})
+            continue
+        if not values:
+            results.append({'id': property_id, 'ok': False, 'error': 'No fields to update'})
+        elif property_id in seen:
+            results.append({'id': property_id, 'ok': False, 'error': 'Duplicate id in batch'})
+        else:
+            seen.add(property_id)
+            results.append({'id': property_id, 'values': values})
+    return results
+
+
+# Postgres types of the writable columns, for casting untyped VALUES parameters
+_CONVERTER_SQL_TYPES = {
+    _text: 'text',
+    float: 'numeric',
+    _number_or_zero: 'numeric',
+    _int_or_zero: 'integer',
+    _year: 'integer',
+    _text_list: 'text[]'
+}
+FIELD_SQL_TYPES = {field: _CONVERTER_SQL_TYPES[converter] for field, (converter, _) in WRITABLE_FIELDS.items()}
+
+
+def build_batch_update(patches: List[Tuple[int, Dict[str, Any]]]) -> Tuple[str, List[Any]]:
+    '''
+    One UPDATE for many (id, values) patches. Each VALUES row carries a has_<column>
+    flag per touched column, so a patch only overwrites the fields it names.
+    '''
+    columns = [field for field in WRITABLE_FIELDS if any(field in values for _, values in patches)]
+    row_sql = '(' + ', '.join(
+        ['%s::integer'] + [f'%s::boolean, %s::{FIELD_SQL_TYPES[column]}' for column in columns]
+    ) + ')'
+    params: List[Any] = []
+    for property_id, values in patches:
+        params.append(property_id)
+        for column in columns:
+            params.extend([column in values, values.get(column)])
+
+    value_names = ', '.join(['id'] + [f'has_{column}, {column}' for column in columns])
+    assignments = [
+        f'{column} = CASE WHEN patch.has_{column} THEN patch.{column} ELSE properties.{column} END'
+        for column in columns
+    ]
+    assignments.append('updated_at = CURRENT_TIMESTAMP')
+    sql = (
+        f"UPDATE properties SET {', '.join(assignments)} "
+        f"FROM (VALUES {', '.join([row_sql] * len(patches))}) AS patch({value_names}) "
+        'WHERE properties.id = patch.id RETURNING properties.id'
+    )
+    return sql, params
+
+
+def build_filtered_update(values: Dict[str, Any], filters: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    '''The same values for every active listing matching the catalog filters.'''
+    columns = [field for field in WRITABLE_FIELDS if field in values]
+    assignments = [f'{column} = %s' for column in columns]
+    assignments.append('updated_at = CURRENT_TIMESTAMP')
+    where_sql, where_params = build_where(filters)
+    sql = f"UPDATE properties SET {', '.join(assignments)}{where_sql} RETURNING id"
+    return sql, [values[column] for column in columns] + where_params
+
+
+def build_delete(property_id: int) -> Tuple[str, List[Any]]:
+    return 'DELETE FROM properties WHERE id = %s', [property_id]
+
+
+def _optional_number(raw: str, cast: Callable[[str], Any]) -> Optional[Any]:
+    if not raw:
+        return None
+    try:
+        return cast(raw)
+    except ValueError:
+        return None
+
+
+def parse_filters(query_params: Dict[str, str]) -> Dict[str, Any]:
+    '''Normalise the catalog filters; ignored or malformed values are dropped.'''
+    filters: Dict[str, Any] = {}
+
+    district = (query_params.get('district') or '').strip()
+    if district and district != 'Все районы':
+        filters['district'] = district
+
+    property_type = (query_params.get('type') or '').strip()
+    if property_type and property_type != 'all':
+        filters['property_type'] = property_type
+
+    transaction_type = (query_params.get('transaction') or '').strip()
+    if transaction_type and transaction_type != 'all':
+        filters['transaction_type'] = transaction_type
+
+    min_price = _optional_number((query_params.get('min_price') or '').strip(), float)
+    if min_price is not None:
+        filters['min_price'] = min_price
+
+    max_price = _optional_number((query_params.get('max_price') or '').strip(), float)
+    if max_price is not None:
+        filters['max_price'] = max_price
+
+    rooms = _optional_number((query_params.get('rooms') or '').strip(), int)
+    if rooms is not None:
+        filters['rooms'] = rooms
+
+    query_text = (query_params.get('query') or '').strip()
+    if query_text:
+        filters['query'] = query_text
+
+    currency = (query_params.get('currency') or '').strip().upper()
+    if len(currency) == 3 and currency.isalpha():
+        filters['currency'] = currency
+
+    bbox = _float_list((query_params.get('bbox') or '').strip(), 4)
+    if bbox:
+        west, south, east, north = bbox
+        if -180 <= west < east <= 180 and -90 <= south < north <= 90:
+            filters['bbox'] = bbox
+
+    near = _float_list((query_params.get('near') or '').strip(), 2)
+    if near and -90 <= near[0] <= 90 and -180 <= near[1] <= 180:
+        radius = _optional_number((query_params.get('radius_m') or '').strip(), float)
+        filters['near'] = near
+        filters['radius_m'] = min(radius if radius and radius > 0 else NEAR_RADIUS_DEFAULT, NEAR_RADIUS_MAX)
+
+    return filters
+
+
+# Keys a write's "filter" object may use, and the filter each one must produce
+WRITE_FILTER_KEYS = {
+    'district': 'district', 'type': 'property_type', 'transaction': 'transaction_type',
+    'min_price': 'min_price', 'max_price': 'max_price', 'rooms': 'rooms', 'query': 'query',
+    'bbox': 'bbox', 'near': 'near', 'radius_m': 'radius_m'
+}
+
+
+def parse_filter_object(raw: Any) -> Dict[str, Any]:
+    '''
+    parse_filters for the JSON "filter" object of a bulk write, which is
+    strict where a query string is lenient: numbers and coordinate lists are
+    accepted as JSON values, and unknown keys or values parse_filters would
+    drop are errors, since a dropped filter widens the update.
+    '''
+    if not isinstance(raw, dict):
+        raise ValidationError('filter', 'expected an object')
+    params: Dict[str, str] = {}
+    for key, value in raw.items():
+        if key not in WRITE_FILTER_KEYS:
+            raise ValidationError(f'filter.{key}', 'unknown filter')
+        if isinstance(value, list) and key in ('bbox', 'near'):
+            value = ','.join(str(part) for part in value)
+        elif isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            raise ValidationError(f'filter.{key}', 'expected a string or number')
+        params[key] = str(value)
+
+    filters = parse_filters(params)
+    for key in params:
+        if WRITE_FILTER_KEYS[key] not in filters:
+            raise ValidationError(f'filter.{key}', 'invalid value')
+    return filters
+
+
+def _float_list(raw: str, size: int) -> Optional[Tuple[float, ...]]:
+    '''bbox=west,south,east,north (Leaflet's toBBoxString order), near=lat,lng'''
+    parts = raw.split(',') if raw else []
+    if len(parts) != size:
+        return None
+    try:
+        values = tuple(float(part) for part in parts)
+    except ValueError:
+        return None
+    return values if all(math.isfinite(value) for value in values) else None
+
+
+def filter_key(filters: Dict[str, Any]) -> Tuple[Tuple[str, Any], ...]:
+    return tuple(sorted(filters.items()))
+
+
+def _escape_like(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _filter_conditions(filters: Dict[str, Any]) -> Tuple[List[str], List[Any]]:
+    conditions: List[str] = []
+    params: List[Any] = []
+
+    if 'district' in filters:
+        conditions.append('district = %s')
+        params.append(filters['district'])
+    if 'property_type' in filters:
+        conditions.append('property_type = %s')
+        params.append(filters['property_type'])
+    if 'transaction_type' in filters:
+        conditions.append('transaction_type = %s')
+        params.append(filters['transaction_type'])
+    # price bounds are in the requested currency (AMD by default), compared on price_amd
+    if 'min_price' in filters:
+        conditions.append('price_amd >= %s')
+        params.append(filters['min_price'] * filters.get('currency_rate', 1.0))
+    if 'max_price' in filters:
+        conditions.append('price_amd <= %s')
+        params.append(filters['max_price'] * filters.get('currency_rate', 1.0))
+    if 'rooms' in filters:
+        conditions.append('rooms = %s')
+        params.append(filters['rooms'])
+    if 'query' in filters:
+        conditions.append('(title ILIKE %s OR description ILIKE %s OR address ILIKE %s)')
+        pattern = '%' + _escape_like(filters['query']) + '%'
+        params.extend([pattern, pattern, pattern])
+    if 'bbox' in filters:
+        west, south, east, north = filters['bbox']
+        conditions.append(f'{GEO_POINT_SQL} <@ box(point(%s, %s), point(%s, %s))')
+        params.extend([west * GEO_X_SCALE, south, east * GEO_X_SCALE, north])
+    if 'near' in filters:
+        lat, lng = filters['near']
+        radius = filters['radius_m']
+        delta_lat = radius / METRES_PER_DEGREE
+        delta_lng = radius / (METRES_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+        # the box is index-assisted; the haversine check trims its corners
+        conditions.append(f'{GEO_POINT_SQL} <@ box(point(%s, %s), point(%s, %s))')
+        params.extend([(lng - delta_lng) * GEO_X_SCALE, lat - delta_lat, (lng + delta_lng) * GEO_X_SCALE, lat + delta_lat])
+        conditions.append(f'{HAVERSINE_SQL} <= %s')
+        params.extend([lat, lat, lng, radius])
+
+    return conditions, params
+
+
+def build_where(filters: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    '''
+    The SQL text depends only on which filters are present, never on their
+    values, so every search with the same filter combination shares a shape.
+    '''
+    conditions, params = _filter_conditions(filters)
+    return ' WHERE ' + ' AND '.join(["status = 'active'"] + conditions), params
+
+
+# facet name -> the filters that facet's own options replace
+FACET_FILTERS: Dict[str, Tuple[str, ...]] = {
+    'district': ('district',),
+    'property_type': ('property_type',),
+    'transaction_type': ('transaction_type',),
+    'rooms': ('rooms',),
+    'price': ('min_price', 'max_price')
+}
+FACET_ROOMS_MAX_BUCKET = 5
+# GROUPING(district, property_type, transaction_type, rooms_bucket, price_bin) of each set
+FACET_GROUPING_IDS = {15: 'district', 23: 'property_type', 27: 'transaction_type', 29: 'rooms', 30: 'price', 31: None}
+
+
+def facet_base_filters(filters: Dict[str, Any]) -> Dict[str, Any]:
+    '''The filters all facet counts share, i.e. the rows build_facets reads: any change to them can change a facet.'''
+    return {k: v for k, v in filters.items() if not any(k in keys for keys in FACET_FILTERS.values())}
+
+
+def build_facets(filters: Dict[str, Any], price_bins: int) -> Tuple[str, List[Any]]:
+    '''
+    Option counts for the filter sidebar in one pass over the filtered rows.
+    Each facet is counted under every filter except its own (choosing another
+    district must not hide the other districts), so the facet filters become
+    per-row flags and each grouping set counts with the flags of the others.
+    Rows: one per district, type, transaction, rooms bucket (5 = "5+") and
+    price bin, plus the () set carrying the total and the price range.
+    Prices are price_amd converted to currency= (AMD when absent).
+    '''
+    where_sql, where_params = build_where(facet_base_filters(filters))
+
+    flag_sql: List[str] = []
+    flag_params: List[Any] = []
+    flags: Dict[str, str] = {}
+    for facet, keys in FACET_FILTERS.items():
+        conditions, params = _filter_conditions(
+            {k: v for k, v in filters.items() if k in keys or k == 'currency_rate'}
+        )
+        if conditions:
+            flags[facet] = f'{facet}_ok'
+            flag_sql.append(f"({' AND '.join(conditions)}) AS {facet}_ok")
+            flag_params.extend(params)
+
+    def passes(excluded: Optional[str]) -> str:
+        return ' AND '.join(flag for facet, flag in flags.items() if facet != excluded) or 'TRUE'
+
+    counts_sql = ', '.join(
+        f'count(*) FILTER (WHERE {passes(facet)}) AS {facet}_count' for facet in FACET_FILTERS
+    )
+    sql = (
+        'WITH matched AS MATERIALIZED ('
+        f'SELECT district, property_type, transaction_type, LEAST(rooms, {FACET_ROOMS_MAX_BUCKET}) AS rooms_bucket, '
+        f"price_amd::float8 / %s AS price{''.join(', ' + flag for flag in flag_sql)} "
+        f'FROM properties{where_sql}), '
+        f"bounds AS (SELECT min(price) AS low, max(price) AS high FROM matched WHERE {passes('price')}) "
+        'SELECT GROUPING(district, property_type, transaction_type, rooms_bucket, price_bin) AS grouping_id, '
+        'district, property_type, transaction_type, rooms_bucket, price_bin, '
+        f"{counts_sql}, count(*) FILTER (WHERE {passes(None)}) AS total, min(low) AS low, min(high) AS high "
+        'FROM (SELECT matched.*, bounds.low, bounds.high, '
+        'LEAST(width_bucket(price, bounds.low, GREATEST(bounds.high, bounds.low + 1), %s), %s) AS price_bin '
+        'FROM matched CROSS JOIN bounds) AS binned '
+        'GROUP BY GROUPING SETS ((district), (property_type), (transaction_type), (rooms_bucket), (price_bin), ())'
+    )
+    return sql, [filters.get('currency_rate', 1.0)] + flag_params + where_params + [price_bins, price_bins]
+
+
+def build_count(filters: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    '''Row count and newest updated_at of the filtered set: the total for the response and the ETag inputs.'''
+    where_sql, params = build_where(filters)
+    return 'SELECT COUNT(*) AS total, MAX(updated_at) AS last_updated FROM properties' + where_sql, params
+
+
+def parse_fields(raw: str) -> List[str]:
+    '''
+    fields=title,price,images -> projected columns in LIST_COLUMNS order.
+    id is always returned; an empty value means every list column.
+    '''
+    requested = [name.strip() for name in (raw or '').split(',') if name.strip()]
+    if not requested:
+        return list(LIST_COLUMNS)
+    for name in requested:
+        if name not in LIST_COLUMNS:
+            raise ValidationError(name, 'unknown field')
+    return [column for column in LIST_COLUMNS if column == 'id' or column in requested]
+
+
+def apply_currency(filters: Dict[str, Any], rates: Dict[str, float]) -> None:
+    '''Resolve currency= against currency_rates (AMD per unit); prices are then converted from price_amd.'''
+    if 'currency' not in filters:
+        return
+    if filters['currency'] not in rates:
+        raise ValidationError('currency', 'unknown currency')
+    filters['currency_rate'] = rates[filters['currency']]
+
+
+def output_columns(columns: List[str], filters: Dict[str, Any]) -> List[str]:
+    '''Projected columns plus the computed ones the filters add to every item.'''
+    extra = []
+    if 'near' in filters:
+        extra.append('distance_m')
+    if 'currency_rate' in filters and 'price' in columns:
+        extra.extend(['original_price', 'original_currency'])
+    return columns + extra
+
+
+def _select_expressions(columns: List[str], filters: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    '''
+    SELECT list for output_columns(): distance_m is metres from near=, and with
+    currency= the price/currency are converted from price_amd while the stored
+    values come back as original_price/original_currency.
+    '''
+    rate = filters.get('currency_rate')
+    expressions: List[str] = []
+    params: List[Any] = []
+    for column in columns:
+        if column == 'distance_m':
+            lat, lng = filters['near']
+            expressions.append(f'{HAVERSINE_SQL} AS distance_m')
+            params.extend([lat, lat, lng])
+        elif column == 'price' and rate:
+            expressions.append('round(price_amd / %s, 2) AS price')
+            params.append(rate)
+        elif column == 'currency' and rate:
+            expressions.append('%s::varchar AS currency')
+            params.append(filters['currency'])
+        elif column == 'original_price':
+            expressions.append('price AS original_price')
+        elif column == 'original_currency':
+            expressions.append('currency AS original_currency')
+        else:
+            expressions.append(column)
+    return ', '.join(expressions), params
+
+
+def build_detail(property_id: int, columns: List[str], active_only: bool,
+                 filters: Optional[Dict[str, Any]] = None) -> Tuple[str, List[Any]]:
+    select_sql, params = _select_expressions(columns, filters or {})
+    if 'updated_at' not in columns:
+        select_sql += ', updated_at'
+    sql = f"SELECT {select_sql} FROM properties WHERE id = %s"
+    if active_only:
+        sql += " AND status = 'active'"
+    return sql, params + [property_id]
+
+
+class SortSpec(NamedTuple):
+    key_sql: str
+    descending: bool
+    key_type: Callable[[Any], Any]
+    # rows whose key is NULL (unknown currency, no area) follow the keyed rows, by id
+    nullable: bool = False
+
+
+SORTS: Dict[str, SortSpec] = {
+    'newest': SortSpec('created_at', True, datetime.fromisoformat),
+    'distance': SortSpec(f'({GEO_POINT_SQL} <-> point(%s, %s))', False, float),
+    'price_asc': SortSpec('price_amd', False, Decimal, True),
+    'price_desc': SortSpec('price_amd', True, Decimal, True),
+    'area_asc': SortSpec('area', False, Decimal, True),
+    'area_desc': SortSpec('area', True, Decimal, True),
+    'price_per_sqm_asc': SortSpec('price_per_sqm_amd', False, Decimal, True),
+    'price_per_sqm_desc': SortSpec('price_per_sqm_amd', True, Decimal, True)
+}
+
+
+def default_sort(filters: Dict[str, Any]) -> str:
+    return 'distance' if 'near' in filters else 'newest'
+
+
+def parse_sort(raw: str, filters: Dict[str, Any]) -> str:
+    '''
+    sort= from the SORTS whitelist (default: distance with near=, else newest).
+    '''
+    sort = (raw or '').strip() or default_sort(filters)
+    if sort not in SORTS or (sort == 'distance' and 'near' not in filters):
+        raise ValidationError('sort', f'invalid value {sort!r}')
+    return sort
+
+
+def _sort_params(sort: str, filters: Dict[str, Any]) -> List[Any]:
+    if sort == 'distance':
+        lat, lng = filters['near']
+        return [lng * GEO_X_SCALE, lat]
+    return []
+
+
+def _numbered(sql: str, descending: bool) -> str:
+    '''
+    An ordered, limited page query with page_position added: each row's rank
+    by (sort_key, id), NULL keys last, which the page query must return. The serializer that
+    aggregates a page in SQL needs it, since a subquery's ORDER BY does not
+    carry over to the outer query. The rows are numbered after the LIMIT, so
+    the page query keeps its plan (index walk or top-N sort).
+    '''
+    direction = 'DESC' if descending else 'ASC'
+    return (
+        f'SELECT page_rows.*, row_number() OVER (ORDER BY page_rows.sort_key {direction} NULLS LAST, page_rows.id {direction}) '
+        f'AS page_position FROM ({sql}) AS page_rows ORDER BY page_position'
+    )
+
+
+def _nulls_last_page(spec: SortSpec, select_sql: str, select_params: List[Any], where_sql: str,
+                     where_params: List[Any], after: Optional[Tuple[Any, int]], limit: int) -> Tuple[str, List[Any]]:
+    '''
+    Page of a nullable sort: rows with the key by (key, id), then rows without
+    it by id, in the sort's direction either way. Each group is read as its
+    own ordered, limited query, so both walk the (key, id) index (a single
+    ORDER BY key DESC NULLS LAST could not). A cursor whose key is NULL is
+    already past the keyed group.
+    '''
+    direction = 'DESC' if spec.descending else 'ASC'
+    comparison = '<' if spec.descending else '>'
+    parts, params = [], []
+    if after is None or after[0] is not None:
+        keyed_sql = f'{where_sql} AND {spec.key_sql} IS NOT NULL'
+        keyed_params = list(where_params)
+        if after is not None:
+            keyed_sql += f' AND ({spec.key_sql}, id) {comparison} (%s, %s)'
+            keyed_params.extend(after)
+        parts.append(f'SELECT {select_sql} FROM properties{keyed_sql} '
+                     f'ORDER BY {spec.key_sql} {direction}, id {direction} LIMIT %s')
+        params += select_params + keyed_params + [limit]
+
+    unkeyed_sql = f'{where_sql} AND {spec.key_sql} IS NULL'
+    unkeyed_params = list(where_params)
+    if after is not None and after[0] is None:
+        unkeyed_sql += f' AND id {comparison} %s'
+        unkeyed_params.append(after[1])
+    parts.append(f'SELECT {select_sql} FROM properties{unkeyed_sql} ORDER BY id {direction} LIMIT %s')
+    params += select_params + unkeyed_params + [limit]
+    if len(parts) == 1:
+        return parts[0], params
+
+    sql = ' UNION ALL '.join(f'({part})' for part in parts)
+    return sql + f' ORDER BY sort_key {direction} NULLS LAST, id {direction} LIMIT %s', params + [limit]
+
+
+def build_listing(filters: Dict[str, Any], after: Optional[Tuple[Any, int]], limit: int,
+                  columns: List[str] = LIST_COLUMNS, sort: str = 'newest') -> Tuple[str, List[Any]]:
+    '''
+    Keyset page ordered by SORTS[sort] then id. The sort key is returned as
+    sort_key so the handler can build next_cursor from the last row; after is
+    the decoded (sort_key, id) of the previous page's last row.
+    '''
+    spec = SORTS[sort]
+    key_params = _sort_params(sort, filters)
+    select_sql, select_params = _select_expressions(columns, filters)
+    select_sql += f', {spec.key_sql} AS sort_key'
+    select_params.extend(key_params)
+
+    where_sql, where_params = build_where(filters)
+    if spec.nullable:
+        sql, params = _nulls_last_page(spec, select_sql, select_params, where_sql, where_params, after, limit)
+        return _numbered(sql, spec.descending), params
+    if after is not None:
+        where_sql += f" AND ({spec.key_sql}, id) {'<' if spec.descending else '>'} (%s, %s)"
+        where_params.extend(key_params + list(after))
+
+    direction = 'DESC' if spec.descending else 'ASC'
+    sql = (
+        f"SELECT {select_sql} FROM properties{where_sql} "
+        f"ORDER BY {spec.key_sql} {direction}, id {direction} LIMIT %s"
+    )
+    return _numbered(sql, spec.descending), select_params + where_params + key_params + [limit]
+
+
+def build_map(filters: Dict[str, Any], limit: int) -> Tuple[str, List[Any]]:
+    '''Compact marker rows (MAP_COLUMNS) for the map views, nearest or newest first.'''
+    sort = default_sort(filters)
+    spec = SORTS[sort]
+    key_params = _sort_params(sort, filters)
+    where_sql, where_params = build_where(filters)
+    direction = 'DESC' if spec.descending else 'ASC'
+    rate = filters.get('currency_rate')
+    price_sql = 'round(price_amd / %s, 2)::float8' if rate else 'price::float8'
+    sql = (
+        f'SELECT id, latitude::float8 AS lat, longitude::float8 AS lng, {price_sql} AS price, property_type AS type, '
+        f'{spec.key_sql} AS sort_key '
+        f'FROM properties{where_sql} AND latitude IS NOT NULL AND longitude IS NOT NULL '
+        f'ORDER BY {spec.key_sql} {direction}, id {direction} LIMIT %s'
+    )
+    return _numbered(sql, spec.descending), ([rate] if rate else []) + key_params + where_params + key_params + [limit]
+
+
+def lnglat_to_tile(lng: float, lat: float, zoom: int) -> Tuple[int, int]:
+    '''Same formula as the geo_tile_x/geo_tile_y generated columns, scaled to zoom.'''
+    n = 1 << zoom
+    lat = max(-MERCATOR_MAX_LAT, min(MERCATOR_MAX_LAT, lat))
+    x = int((lng + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_to_lnglat(x: int, y: int, zoom: int) -> Tuple[float, float]:
+    '''North-west corner of tile (x, y).'''
+    n = 1 << zoom
+    return x / n * 360.0 - 180.0, math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+
+
+def tiles_for_bbox(bbox: Tuple[float, float, float, float], zoom: int) -> List[Tuple[int, int]]:
+    west, south, east, north = bbox
+    x0, y0 = lnglat_to_tile(west, north, zoom)
+    x1, y1 = lnglat_to_tile(east, south, zoom)
+    return [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+
+def cluster_area_filters(filters: Dict[str, Any], zoom: int, tiles: List[Tuple[int, int]]) -> Dict[str, Any]:
+    '''filters with bbox widened to the whole tiles, which reach past the requested viewport.'''
+    x0, x1 = min(x for x, _ in tiles), max(x for x, _ in tiles)
+    y0, y1 = min(y for _, y in tiles), max(y for _, y in tiles)
+    west, north = tile_to_lnglat(x0, y0, zoom)
+    east, south = tile_to_lnglat(x1 + 1, y1 + 1, zoom)
+    area_filters = {k: v for k, v in filters.items() if k != 'bbox'}
+    area_filters['bbox'] = (west, south, east, north)
+    return area_filters
+
+
+def build_clusters(filters: Dict[str, Any], zoom: int, tiles: List[Tuple[int, int]]) -> Tuple[str, List[Any]]:
+    '''
+    Per-cell aggregates for every listing inside the given zoom-level tiles
+    (filters other than bbox still apply). The tile range is also turned into a
+    lng/lat box so the GiST point index narrows the rows before grouping.
+    Cell prices are price_amd converted to currency= (AMD when absent).
+    '''
+    cell_shift = GRID_ZOOM - zoom - CELL_BITS
+    tile_shift = GRID_ZOOM - zoom
+    x0, x1 = min(x for x, _ in tiles), max(x for x, _ in tiles)
+    y0, y1 = min(y for _, y in tiles), max(y for _, y in tiles)
+    where_sql, where_params = build_where(cluster_area_filters(filters, zoom, tiles))
+    sql = (
+        'SELECT geo_tile_x >> %s AS cell_x, geo_tile_y >> %s AS cell_y, count(*) AS count, '
+        'avg(latitude::float8) AS lat, avg(longitude::float8) AS lng, '
+        'min(price_amd)::float8 / %s AS min_price, '
+        'percentile_cont(0.5) WITHIN GROUP (ORDER BY price_amd::float8) / %s AS median_price, '
+        'min(id) AS id '
+        f'FROM properties{where_sql} '
+        'AND geo_tile_x BETWEEN %s AND %s AND geo_tile_y BETWEEN %s AND %s '
+        'GROUP BY 1, 2'
+    )
+    rate = filters.get('currency_rate', 1.0)
+    params = [cell_shift, cell_shift, rate, rate] + where_params + [
+        x0 << tile_shift, ((x1 + 1) << tile_shift) - 1, y0 << tile_shift, ((y1 + 1) << tile_shift) - 1
+    ]
+    return sql, params
+
+
+# Search pages are ordered by (relevance, id); their cursors carry this sort name
+SEARCH_SORT = 'relevance'
+
+
+def build_search(filters: Dict[str, Any], limit: int, columns: List[str] = LIST_COLUMNS,
+                 after: Optional[Tuple[float, int]] = None) -> Tuple[str, List[Any]]:
+    '''
+    Relevance-ranked search: full-text match on the weighted search_vector
+    (title > address > description, Russian stems plus unstemmed words), with
+    trigram word similarity on title/address catching partial words and typos.
+    Rows carry relevance as sort_key and total_matches, the number of matches
+    on all pages: ranking already visits every match, so the window count is
+    nearly free where a separate COUNT would repeat the match. after is the
+    (relevance, id) of the previous page's last row.
+    '''
+    text = filters['query']
+    where_sql, where_params = build_where({k: v for k, v in filters.items() if k != 'query'})
+    select_sql, select_params = _select_expressions(columns, filters)
+    # float8, so the relevance a cursor carries compares equal to the row it came from
+    sql = (
+        "SELECT ranked.*, ranked.relevance AS sort_key FROM ("
+        f"SELECT {select_sql}, "
+        "(ts_rank_cd(search_vector, tsq, 1) "
+        "+ 0.3 * greatest(word_similarity(%s, title), word_similarity(%s, address)))::float8 AS relevance, "
+        "count(*) OVER () AS total_matches "
+        "FROM properties, "
+        "(SELECT websearch_to_tsquery('russian', %s) || websearch_to_tsquery('simple', %s) AS tsq) AS search"
+        f"{where_sql} AND (search_vector @@ tsq OR %s <%% title OR %s <%% address)"
+        ") AS ranked"
+    )
+    params = select_params + [text, text, text, text] + where_params + [text, text]
+    if after is not None:
+        sql += " WHERE (ranked.relevance, ranked.id) < (%s::float8, %s)"
+        params.extend(after)
+    sql += " ORDER BY ranked.relevance DESC, ranked.id DESC LIMIT %s"
+    params.append(limit)
+    return _numbered(sql, True), params
@@ -0,0 +1,170 @@
+'''
+Business: Row-to-JSON paths for catalog pages: per-row dicts, tuple rows with a precompiled converter table, or JSON built by Postgres
+Args: an open connection, a listing/search query from queries.py, the projected columns, CATALOG_SERIALIZER from the environment
+Returns: the JSON array text of one page plus what the handler needs for next_cursor
+'''
+
+import json
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from psycopg2.extras import RealDictCursor
+from db import execute_prepared
+from instrumentation import phase
+
+SERIALIZERS = ('dict', 'tuple', 'db_json')
+SERIALIZER = os.environ.get('CATALOG_SERIALIZER', 'tuple')
+if SERIALIZER not in SERIALIZERS:
+    SERIALIZER = 'tuple'
+
+
+class Page(NamedTuple):
+    items_json: str
+    count: int
+    has_more: bool
+    last_key: Optional[Tuple[Any, int]]
+    # total_matches of a counted query; None for other queries or an empty page
+    total: Optional[int] = None
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+def _float(value: Any) -> Optional[float]:
+    return float(value) if value is not None else None
+
+def _list(value: Optional[List[str]]) -> List[str]:
+    return value or []
+
+
+PYTHON_CONVERTERS: Dict[str, Callable[[Any], Any]] = {
+    'price': _float,
+    'original_price': _float,
+    'area': _float,
+    'latitude': _float,
+    'longitude': _float,
+    'relevance': _float,
+    'distance_m': _float,
+    'features': _list,
+    'images': _list,
+    'created_at': _isoformat,
+    'updated_at': _isoformat
+}
+
+SQL_CONVERTERS: Dict[str, str] = {
+    'price': 'page.price::float8',
+    'original_price': 'page.original_price::float8',
+    'area': 'page.area::float8',
+    'latitude': 'page.latitude::float8',
+    'longitude': 'page.longitude::float8',
+    'relevance': 'page.relevance::float8',
+    'distance_m': 'page.distance_m::float8',
+    'features': "coalesce(page.features, '{}')",
+    'images': "coalesce(page.images, '{}')"
+}
+
+
+def property_to_json(prop: Dict[str, Any], columns: List[str]) -> Dict[str, Any]:
+    prop_dict = {column: prop[column] for column in columns}
+    for column, value in prop_dict.items():
+        converter = PYTHON_CONVERTERS.get(column)
+        if converter:
+            prop_dict[column] = converter(value)
+    return prop_dict
+
+
+def make_row_encoder(description: Sequence[Any], columns: List[str]) -> Callable[[tuple], Dict[str, Any]]:
+    '''Resolve column positions and converters once per query instead of once per row.'''
+    positions = {column.name: index for index, column in enumerate(description)}
+    plan = [(column, positions[column], PYTHON_CONVERTERS.get(column)) for column in columns]
+
+    def encode(row: tuple) -> Dict[str, Any]:
+        return {
+            column: converter(row[index]) if converter else row[index]
+            for column, index, converter in plan
+        }
+
+    return encode
+
+
+def _fetch_dicts(conn: Any, sql: str, params: List[Any], columns: List[str], limit: int, keyed: bool,
+                 counted: bool = False) -> Page:
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    execute_prepared(cursor, sql, params)
+    rows = cursor.fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    last_key = (rows[-1]['sort_key'], rows[-1]['id']) if keyed and rows else None
+    total = rows[0]['total_matches'] if counted and rows else None
+    with phase('convert'):
+        items = [property_to_json(row, columns) for row in rows]
+    with phase('serialize'):
+        items_json = json.dumps(items)
+    return Page(items_json, len(rows), has_more, last_key, total)
+
+
+def _fetch_tuples(conn: Any, sql: str, params: List[Any], columns: List[str], limit: int, keyed: bool,
+                  counted: bool = False) -> Page:
+    cursor = conn.cursor()
+    execute_prepared(cursor, sql, params)
+    rows = cursor.fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    encode = make_row_encoder(cursor.description, columns)
+    last_key = None
+    total = None
+    names = [column.name for column in cursor.description]
+    if keyed and rows:
+        last_key = (rows[-1][names.index('sort_key')], rows[-1][names.index('id')])
+    if counted and rows:
+        total = rows[0][names.index('total_matches')]
+    with phase('convert'):
+        items = [encode(row) for row in rows]
+    with phase('serialize'):
+        items_json = json.dumps(items)
+    return Page(items_json, len(rows), has_more, last_key, total)
+
+
+def _fetch_db_json(conn: Any, sql: str, params: List[Any], columns: List[str], limit: int, keyed: bool,
+                   counted: bool = False) -> Page:
+    '''
+    Postgres aggregates the page into one JSON text value; the handler splices
+    it into the response body without decoding it. Row order is carried by the
+    page_position column every page query numbers by its sort_key and id.
+    '''
+    pairs = ', '.join(f"'{column}', {SQL_CONVERTERS.get(column, 'page.' + column)}" for column in columns)
+    last_key_sql = (
+        'max(page.sort_key) FILTER (WHERE page.page_position = %s), max(page.id) FILTER (WHERE page.page_position = %s)'
+        if keyed else 'NULL, NULL'
+    )
+    total_sql = 'max(page.total_matches)' if counted else 'NULL'
+    wrapped = (
+        f"SELECT coalesce(json_agg(json_build_object({pairs}) ORDER BY page.page_position) "
+        "FILTER (WHERE page.page_position <= %s), '[]')::text, "
+        f"count(*), {last_key_sql}, {total_sql} "
+        f"FROM ({sql}) AS page"
+    )
+    wrapped_params = [limit] + ([limit, limit] if keyed else []) + list(params)
+    cursor = conn.cursor()
+    execute_prepared(cursor, wrapped, wrapped_params)
+    items_json, fetched, last_sort_key, last_id, total = cursor.fetchone()
+    last_key = (last_sort_key, last_id) if last_id is not None else None
+    return Page(items_json, min(fetched, limit), fetched > limit, last_key, total)
+
+
+_FETCHERS = {
+    'dict': _fetch_dicts,
+    'tuple': _fetch_tuples,
+    'db_json': _fetch_db_json
+}
+
+
+def fetch_page(conn: Any, sql: str, params: List[Any], columns: List[str], limit: int,
+               keyed: bool = True, serializer: str = SERIALIZER, counted: bool = False) -> Page:
+    '''
+    Run a listing/search query that asks for limit + 1 rows and serialise the
+    first limit rows; the extra row only tells whether another page exists.
+    keyed pages also report the (sort_key, id) of their last row, counted
+    pages the total_matches column the query computes.
+    '''
+    return _FETCHERS[serializer](conn, sql, params, columns, limit, keyed, counted)
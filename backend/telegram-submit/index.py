@@ -1,32 +1,54 @@
 '''
-Business: Отправка заявок с сайта WSE.AM в Telegram бота
-Args: event с полями name, phone, email, service, message
-Returns: HTTP response с результатом отправки
+Business: Приём заявок с сайта WSE.AM: сохранение в leads без дублей, отправка в Telegram через очередь lead_outbox, список заявок для админки
+Args: POST с полями name, contactMethod, contact, service, message, property_id; GET с X-Auth-Token и фильтрами (mode=stats — тайминги и состояние очереди); событие таймера (messages) разбирает очередь
+Returns: HTTP response с результатом: заявка сохранена и, если успела, отправлена; или страница заявок
 '''
 
+import html
 import json
-import urllib.request
-import urllib.parse
+import time
 from typing import Dict, Any
 import os
+from psycopg2.extras import RealDictCursor
+from db import get_connection, get_pool, release_connection
+from instrumentation import annotate, instrumented, phase, stats as timing_stats
+from querystats import report as query_report
+from leads import LeadError, validate_lead, save_lead, build_lead_list, lead_to_json, encode_cursor
+from outbox import drain, enqueue, stats as outbox_stats
+from telegram import get_client
+from tokens import AuthError, authenticate
 
+# The submit request tries to deliver its own lead (never the backlog) for at most this long
+# before answering; what is left, and retries, go out with the timer trigger or scripts/lead_outbox.py.
+# 0 answers as soon as the lead is queued.
+INLINE_DRAIN_SECONDS = float(os.environ.get('LEAD_INLINE_DRAIN_SECONDS', '2'))
+TRIGGER_DRAIN_SECONDS = float(os.environ.get('LEAD_TRIGGER_DRAIN_SECONDS', '25'))
+
+@instrumented
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    # Timer trigger: no HTTP method, a list of trigger messages instead
+    if 'httpMethod' not in event and event.get('messages') is not None:
+        return drain_outbox(TRIGGER_DRAIN_SECONDS)
+
     method: str = event.get('httpMethod', 'POST')
-    
+
     # CORS OPTIONS
     if method == 'OPTIONS':
         return {
             'statusCode': 200,
             'headers': {
                 'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type',
+                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+                'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Auth-Token',
                 'Access-Control-Max-Age': '86400'
             },
             'body': '',
             'isBase64Encoded': False
         }
-    
+
+    if method == 'GET':
+        return list_leads(event)
+
     if method != 'POST':
         return {
             'statusCode': 405,
@@ -37,35 +59,28 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'body': json.dumps({'error': 'Method not allowed'}),
             'isBase64Encoded': False
         }
-    
-    # Парсим тело запроса
-    body_data = json.loads(event.get('body', '{}'))
-    
-    name = body_data.get('name', '')
-    contact_method = body_data.get('contactMethod', '')
-    contact = body_data.get('contact', '')
-    service = body_data.get('service', '')
-    message = body_data.get('message', '')
-    
-    # Валидация
-    if not name or not contact:
+
+    # Парсим тело запроса и проверяем поля
+    try:
+        lead = validate_lead(json.loads(event.get('body') or '{}'))
+    except (LeadError, ValueError, AttributeError) as e:
+        print(f'Invalid lead: {str(e)}')
         return {
             'statusCode': 400,
             'headers': {
                 'Content-Type': 'application/json',
                 'Access-Control-Allow-Origin': '*'
             },
-            'body': json.dumps({'error': 'Missing required fields'}),
+            'body': json.dumps({'error': 'Missing required fields' if getattr(e, 'message', '') == 'required'
+                                else f'Invalid field {getattr(e, "field", "body")}'}),
             'isBase64Encoded': False
         }
-    
+
     # Получаем настройки из переменных окружения
     bot_token = os.environ.get('TELEGRAM_BOT_TOKEN', '')
     chat_id = os.environ.get('TELEGRAM_CHAT_ID', '')
-    
-    print(f'Bot token exists: {bool(bot_token)}')
-    print(f'Chat ID: {chat_id}')
-    
+    dsn = os.environ.get('DATABASE_URL')
+
     if not bot_token or not chat_id:
         return {
             'statusCode': 500,
@@ -76,66 +91,210 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'body': json.dumps({'error': 'Bot token or chat ID not configured'}),
             'isBase64Encoded': False
         }
-    
-    # Формируем текст сообщения
-    telegram_message = f'''🏠 <b>Новая заявка с сайта WSE.AM</b>
 
-👤 <b>Имя:</b> {name}
-📱 <b>Способ связи:</b> {contact_method}
-💬 <b>Контакт:</b> {contact}
-🔑 <b>Тип услуги:</b> {service}
+    if not dsn:
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': 'Database connection not configured'}),
+            'isBase64Encoded': False
+        }
+
+    conn = None
+    try:
+        with phase('connect'):
+            conn = get_connection(dsn)
+        lead_id, is_new = save_lead(conn.cursor(), lead)
+        if not is_new:
+            # Повторная отправка того же контакта в окне дедупликации: без второго сообщения в Telegram
+            conn.commit()
+            return {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps({'success': True, 'message': 'Заявка уже принята', 'duplicate': True}),
+                'isBase64Encoded': False
+            }
+
+        outbox_id = enqueue(conn, chat_id, {'text': format_lead_message(lead_id, lead), 'parse_mode': 'HTML'}, lead_id)
+
+        # Заявка уже сохранена: ошибка доставки здесь не должна её терять
+        delivered = False
+        if INLINE_DRAIN_SECONDS > 0:
+            try:
+                counts = drain(conn, get_client(bot_token), time.monotonic() + INLINE_DRAIN_SECONDS, ids=[outbox_id])
+                delivered = outbox_id in counts['sent_ids']
+                annotate(delivered=delivered)
+            except Exception as e:
+                conn.rollback()
+                print(f'Inline drain failed, lead {outbox_id} stays queued: {str(e)}')
+
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({
+                'success': True,
+                'message': 'Заявка отправлена в Telegram' if delivered else 'Заявка принята',
+                'delivered': delivered,
+                'duplicate': False
+            }),
+            'isBase64Encoded': False
+        }
+    except Exception as e:
+        print(f'Exception: {str(e)}')
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': f'Failed to save the request: {str(e)}'}),
+            'isBase64Encoded': False
+        }
+    finally:
+        if conn:
+            release_connection(conn)
+
+
+def format_lead_message(lead_id: int, lead: Dict[str, Any]) -> str:
+    # Поля экранируем, иначе parse_mode=HTML отклонит сообщение
+    property_line = f"\n🏢 <b>Объект:</b> #{lead['property_id']}" if lead['property_id'] else ''
+    return f'''🏠 <b>Новая заявка #{lead_id} с сайта WSE.AM</b>
+
+👤 <b>Имя:</b> {html.escape(lead['name'])}
+📱 <b>Способ связи:</b> {html.escape(lead['contactMethod'])}
+💬 <b>Контакт:</b> {html.escape(lead['contact'])}
+🔑 <b>Тип услуги:</b> {html.escape(lead['service'])}{property_line}
 
 ✉️ <b>Сообщение:</b>
-{message}'''
-    
-    # Отправляем в Telegram
-    url = f'https://api.telegram.org/bot{bot_token}/sendMessage'
-    
-    data = urllib.parse.urlencode({
-        'chat_id': chat_id,
-        'text': telegram_message,
-        'parse_mode': 'HTML'
-    }).encode('utf-8')
-    
+{html.escape(lead['message'])}'''
+
+
+def list_leads(event: Dict[str, Any]) -> Dict[str, Any]:
+    dsn = os.environ.get('DATABASE_URL')
+    if not dsn:
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'ok': False, 'error': 'Database connection not configured'}),
+            'isBase64Encoded': False
+        }
+
+    query_params = event.get('queryStringParameters') or {}
+    conn = None
     try:
-        req = urllib.request.Request(url, data=data, method='POST')
-        with urllib.request.urlopen(req) as response:
-            result = json.loads(response.read().decode('utf-8'))
-            print(f'Telegram API response: {result}')
-            
-            if result.get('ok'):
+        with phase('connect'):
+            conn = get_connection(dsn)
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            with phase('auth'):
+                authenticate(event.get('headers') or {}, cursor)
+            if query_params.get('mode') == 'stats':
+                annotate(route='GET stats')
                 return {
                     'statusCode': 200,
                     'headers': {
                         'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*'
+                        'Access-Control-Allow-Origin': '*',
+                        'Cache-Control': 'no-store'
                     },
-                    'body': json.dumps({'success': True, 'message': 'Заявка отправлена в Telegram'}),
+                    'body': json.dumps({
+                        'ok': True,
+                        'data': {
+                            'timings': timing_stats(),
+                            'queries': query_report(query_params),
+                            'outbox': outbox_stats(conn),
+                            'pool': get_pool(dsn).stats()
+                        }
+                    }),
                     'isBase64Encoded': False
                 }
-            else:
-                print(f'Telegram API error: {result}')
-                raise Exception(f"Telegram API error: {result}")
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode('utf-8')
-        print(f'HTTP Error: {e.code}, Body: {error_body}')
+            sql, params, limit = build_lead_list(query_params)
+        except AuthError as e:
+            return {
+                'statusCode': e.status_code,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps({'ok': False, 'error': e.message}),
+                'isBase64Encoded': False
+            }
+        except LeadError as e:
+            return {
+                'statusCode': 400,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps({'ok': False, 'error': f'Invalid field {e.field}'}),
+                'isBase64Encoded': False
+            }
+
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id']) if has_more else None
         return {
-            'statusCode': 500,
+            'statusCode': 200,
             'headers': {
                 'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
+                'Access-Control-Allow-Origin': '*',
+                'Cache-Control': 'no-store'
             },
-            'body': json.dumps({'error': f'Telegram API error: {error_body}'}),
+            'body': json.dumps({
+                'ok': True,
+                'data': {'leads': [lead_to_json(row) for row in rows], 'next_cursor': next_cursor}
+            }),
             'isBase64Encoded': False
         }
     except Exception as e:
-        print(f'Exception: {str(e)}')
         return {
             'statusCode': 500,
             'headers': {
                 'Content-Type': 'application/json',
                 'Access-Control-Allow-Origin': '*'
             },
-            'body': json.dumps({'error': f'Failed to send to Telegram: {str(e)}'}),
+            'body': json.dumps({'ok': False, 'error': f'Server error: {str(e)}'}),
             'isBase64Encoded': False
-        }
\ No newline at end of file
+        }
+    finally:
+        if conn:
+            release_connection(conn)
+
+
+def drain_outbox(budget_seconds: float) -> Dict[str, Any]:
+    bot_token = os.environ.get('TELEGRAM_BOT_TOKEN', '')
+    dsn = os.environ.get('DATABASE_URL')
+    if not bot_token or not dsn:
+        return {'statusCode': 500, 'body': json.dumps({'error': 'Bot token or database not configured'})}
+
+    deadline = time.monotonic() + budget_seconds
+    totals: Dict[str, Any] = {'sent': 0, 'retried': 0, 'rate_limited': 0, 'dead': 0, 'released': 0}
+    with phase('connect'):
+        conn = get_connection(dsn)
+    try:
+        client = get_client(bot_token)
+        while time.monotonic() < deadline:
+            counts = drain(conn, client, deadline)
+            for key in totals:
+                totals[key] += counts[key]
+            # An empty claim, or one that only hit waits, means nothing more is due now
+            if not counts['sent'] and not counts['retried'] and not counts['dead']:
+                break
+    finally:
+        release_connection(conn)
+    print(f'Lead outbox drain: {json.dumps(totals)}')
+    return {'statusCode': 200, 'body': json.dumps(totals)}
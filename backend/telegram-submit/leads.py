@@ -0,0 +1,187 @@
+'''
+Business: Lead storage for the site form: validation, contact normalisation, deduplicating upsert and the admin listing query
+Args: the submitted form fields, or the listing query parameters; LEAD_DEDUP_WINDOW_SECONDS from the environment
+Returns: the lead id and whether it is new, or SQL with parameters for one page of leads
+'''
+
+import base64
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+DEDUP_WINDOW_SECONDS = int(os.environ.get('LEAD_DEDUP_WINDOW_SECONDS', '600'))
+PAGE_SIZE_DEFAULT = 50
+PAGE_SIZE_MAX = 200
+FIELD_MAX_LENGTHS = {'name': 200, 'contactMethod': 50, 'contact': 200, 'service': 100, 'message': 4000}
+LIST_COLUMNS = [
+    'id', 'name', 'contact_method', 'contact', 'service', 'message', 'property_id',
+    'submit_count', 'created_at', 'last_submitted_at'
+]
+
+_PHONE_RE = re.compile(r'^\+?[\d\s().-]{7,}$')
+_TELEGRAM_LINK_RE = re.compile(r'^(?:https?://)?(?:t\.me|telegram\.me)/', re.IGNORECASE)
+
+
+class LeadError(Exception):
+    def __init__(self, field: str, message: str):
+        super().__init__(f'{field}: {message}')
+        self.field = field
+        self.message = message
+
+
+def normalize_contact(contact: str) -> str:
+    '''
+    One canonical form per person however they typed it: phones as digits
+    with the Armenian country code (0XX XXX XXX -> 374XXXXXXXX), emails and
+    Telegram handles lower-cased without @ or t.me/ prefixes.
+    '''
+    value = contact.strip()
+    if _PHONE_RE.match(value):
+        digits = re.sub(r'\D', '', value)
+        if digits.startswith('00'):
+            digits = digits[2:]
+        elif len(digits) == 9 and digits.startswith('0'):
+            digits = '374' + digits[1:]
+        return digits
+    value = _TELEGRAM_LINK_RE.sub('', value.lower())
+    return value.lstrip('@')
+
+
+def contact_hash(contact: str) -> str:
+    return hashlib.sha256(normalize_contact(contact).encode('utf-8')).hexdigest()
+
+
+def validate_lead(body: Dict[str, Any]) -> Dict[str, Any]:
+    lead = {}
+    for field, max_length in FIELD_MAX_LENGTHS.items():
+        value = body.get(field)
+        if value is None:
+            value = ''
+        if not isinstance(value, str):
+            raise LeadError(field, 'expected a string')
+        value = value.strip()
+        if len(value) > max_length:
+            raise LeadError(field, 'too long')
+        lead[field] = value
+    if not lead['name'] or not lead['contact']:
+        raise LeadError('name' if not lead['name'] else 'contact', 'required')
+
+    property_id = body.get('property_id', body.get('propertyId'))
+    if property_id in (None, ''):
+        lead['property_id'] = None
+    else:
+        try:
+            lead['property_id'] = int(property_id)
+        except (TypeError, ValueError):
+            raise LeadError('property_id', 'expected an integer')
+    return lead
+
+
+def save_lead(cursor: Any, lead: Dict[str, Any]) -> Tuple[int, bool]:
+    '''
+    Insert the lead, or fold it into the same contact's lead from the current
+    dedup window (bumping submit_count) in the same statement. Returns
+    (lead id, True if a new lead was created). An unknown property_id is
+    stored as NULL rather than rejecting the lead.
+    '''
+    cursor.execute(
+        '''
+        INSERT INTO leads (name, contact_method, contact, contact_hash, dedup_bucket, service, message, property_id)
+        VALUES (%s, %s, %s, %s, floor(extract(epoch FROM CURRENT_TIMESTAMP) / %s)::bigint, %s, %s,
+                (SELECT id FROM properties WHERE id = %s))
+        ON CONFLICT (contact_hash, dedup_bucket) DO UPDATE SET
+            submit_count = leads.submit_count + 1,
+            last_submitted_at = CURRENT_TIMESTAMP,
+            property_id = coalesce(leads.property_id, EXCLUDED.property_id)
+        RETURNING id, (xmax = 0) AS inserted
+        ''',
+        (lead['name'], lead['contactMethod'] or None, lead['contact'], contact_hash(lead['contact']),
+         DEDUP_WINDOW_SECONDS, lead['service'] or None, lead['message'] or None, lead['property_id'])
+    )
+    row = cursor.fetchone()
+    return row[0], row[1]
+
+
+def encode_cursor(created_at: datetime, lead_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), lead_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(value: str) -> Tuple[datetime, int]:
+    padded = value + '=' * (-len(value) % 4)
+    try:
+        created_at, lead_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(created_at), int(lead_id)
+    except (ValueError, TypeError, UnicodeError):
+        raise LeadError('cursor', 'invalid')
+
+
+def _parse_date(params: Dict[str, str], name: str) -> Optional[datetime]:
+    raw = (params.get(name) or '').strip()
+    if not raw:
+        return None
+    try:
+        return datetime.fromisoformat(raw)
+    except ValueError:
+        raise LeadError(name, 'expected an ISO date')
+
+
+def build_lead_list(params: Dict[str, str]) -> Tuple[str, List[Any], int]:
+    '''
+    Newest-first page of leads, keyset-paginated on (created_at, id) so deep
+    pages cost the same as the first. Filters: contact (matched by its
+    normalised hash), service, contact_method, property_id, since/until and
+    q, a substring of name, contact or message.
+    '''
+    conditions: List[str] = []
+    values: List[Any] = []
+
+    if (params.get('contact') or '').strip():
+        conditions.append('contact_hash = %s')
+        values.append(contact_hash(params['contact']))
+    for name, column in (('service', 'service'), ('contact_method', 'contact_method')):
+        if (params.get(name) or '').strip():
+            conditions.append(f'{column} = %s')
+            values.append(params[name].strip())
+    if (params.get('property_id') or '').strip():
+        try:
+            values.append(int(params['property_id']))
+        except ValueError:
+            raise LeadError('property_id', 'expected an integer')
+        conditions.append('property_id = %s')
+    since, until = _parse_date(params, 'since'), _parse_date(params, 'until')
+    if since:
+        conditions.append('created_at >= %s')
+        values.append(since)
+    if until:
+        conditions.append('created_at < %s')
+        values.append(until)
+    query = (params.get('q') or '').strip()
+    if query:
+        pattern = '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        conditions.append('(name ILIKE %s OR contact ILIKE %s OR message ILIKE %s)')
+        values.extend([pattern, pattern, pattern])
+    if (params.get('cursor') or '').strip():
+        after_created_at, after_id = decode_cursor(params['cursor'].strip())
+        conditions.append('(created_at, id) < (%s, %s)')
+        values.extend([after_created_at, after_id])
+
+    try:
+        limit = int(params.get('limit') or PAGE_SIZE_DEFAULT)
+    except ValueError:
+        raise LeadError('limit', 'expected an integer')
+    limit = max(1, min(limit, PAGE_SIZE_MAX))
+
+    where_sql = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+    sql = f"SELECT {', '.join(LIST_COLUMNS)} FROM leads{where_sql} ORDER BY created_at DESC, id DESC LIMIT %s"
+    return sql, values + [limit + 1], limit
+
+
+def lead_to_json(row: Dict[str, Any]) -> Dict[str, Any]:
+    item = dict(row)
+    for column in ('created_at', 'last_submitted_at'):
+        item[column] = item[column].isoformat() if item[column] else None
+    return item
@@ -0,0 +1,178 @@
+'''
+Business: Durable lead outbox in Postgres and the drain loop that delivers it to Telegram
+Args: an open connection, a TelegramClient, LEAD_OUTBOX_* tuning variables from the environment
+Returns: enqueue gives the outbox id; drain gives counts of sent, retried, rate-limited, dead and released messages plus the sent ids
+'''
+
+import json
+import os
+import random
+import time
+from typing import Any, Dict, List, Optional
+from psycopg2.extras import RealDictCursor
+from instrumentation import phase
+from telegram import RateLimitedError, TelegramClient, TelegramError
+
+BATCH_SIZE = int(os.environ.get('LEAD_OUTBOX_BATCH_SIZE', '20'))
+MAX_ATTEMPTS = int(os.environ.get('LEAD_OUTBOX_MAX_ATTEMPTS', '8'))
+BACKOFF_BASE_SECONDS = float(os.environ.get('LEAD_OUTBOX_BACKOFF_BASE_SECONDS', '5'))
+BACKOFF_MAX_SECONDS = float(os.environ.get('LEAD_OUTBOX_BACKOFF_MAX_SECONDS', '3600'))
+# A claimed message not finished within the lease is picked up by the next drain
+LEASE_SECONDS = int(os.environ.get('LEAD_OUTBOX_LEASE_SECONDS', '60'))
+# Telegram allows about one message per second into a single chat
+CHAT_MIN_INTERVAL_SECONDS = float(os.environ.get('TELEGRAM_CHAT_MIN_INTERVAL_SECONDS', '1'))
+
+# chat_id -> monotonic time before which nothing is sent to it (pacing and 429 retry_after)
+_chat_paused_until: Dict[str, float] = {}
+
+
+def enqueue(conn: Any, chat_id: str, payload: Dict[str, Any], lead_id: Optional[int] = None) -> int:
+    '''Queue one message and commit, together with anything the caller wrote on conn before.'''
+    cursor = conn.cursor()
+    cursor.execute(
+        'INSERT INTO lead_outbox (chat_id, payload, lead_id) VALUES (%s, %s, %s) RETURNING id',
+        (chat_id, json.dumps(payload), lead_id)
+    )
+    outbox_id = cursor.fetchone()[0]
+    conn.commit()
+    return outbox_id
+
+
+def backoff_seconds(attempts: int) -> float:
+    '''base * 2^(attempts-1) capped at BACKOFF_MAX_SECONDS, jittered down by up to half.'''
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** max(0, attempts - 1)))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def claim(conn: Any, limit: int, ids: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+    '''
+    Take up to limit due messages (or expired claims) for this worker, only
+    those in ids when given, and commit at once, so concurrent drains skip
+    them instead of double-sending.
+    '''
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    cursor.execute(
+        '''
+        UPDATE lead_outbox SET status = 'sending', attempts = attempts + 1,
+               locked_until = CURRENT_TIMESTAMP + %s::interval
+        WHERE id IN (
+            SELECT id FROM lead_outbox
+            WHERE ((status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP)
+                   OR (status = 'sending' AND locked_until < CURRENT_TIMESTAMP))
+              AND (%s::bigint[] IS NULL OR id = ANY(%s::bigint[]))
+            ORDER BY next_attempt_at, id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, chat_id, payload, attempts
+        ''',
+        (f'{LEASE_SECONDS} seconds', ids, ids, limit)
+    )
+    rows = sorted(cursor.fetchall(), key=lambda row: row['id'])
+    conn.commit()
+    return rows
+
+
+def _finish(conn: Any, outbox_id: int, status: str, delay: float = 0.0,
+            error: Optional[str] = None, refund_attempt: bool = False) -> None:
+    '''
+    Move a claimed message to sent, dead or back to pending after delay
+    seconds. refund_attempt undoes the claim's attempt count for waits that
+    are not failures (rate limits, running out of drain time).
+    '''
+    conn.cursor().execute(
+        '''
+        UPDATE lead_outbox SET status = %s, locked_until = NULL,
+               attempts = attempts - %s,
+               next_attempt_at = CURRENT_TIMESTAMP + %s::interval,
+               last_error = coalesce(%s, last_error),
+               sent_at = CASE WHEN %s = 'sent' THEN CURRENT_TIMESTAMP ELSE sent_at END
+        WHERE id = %s
+        ''',
+        (status, 1 if refund_attempt else 0, f'{delay:.3f} seconds', error, status, outbox_id)
+    )
+    conn.commit()
+
+
+def drain(conn: Any, client: TelegramClient, deadline: float, batch_size: int = BATCH_SIZE,
+          ids: Optional[List[int]] = None) -> Dict[str, Any]:
+    '''
+    Send claimed messages (only those in ids when given) until the batch is
+    done or time.monotonic() reaches deadline; no send waits on the socket
+    past it. A chat is paced to CHAT_MIN_INTERVAL_SECONDS and paused for the
+    retry_after of a 429; messages that cannot go out before the deadline
+    are released untouched for the next drain.
+    '''
+    counts: Dict[str, Any] = {'sent': 0, 'retried': 0, 'rate_limited': 0, 'dead': 0, 'released': 0, 'sent_ids': []}
+    for message in claim(conn, batch_size, ids):
+        outbox_id, chat_id = message['id'], message['chat_id']
+        wait = _chat_paused_until.get(chat_id, 0.0) - time.monotonic()
+        if wait > 0 and time.monotonic() + wait >= deadline:
+            _finish(conn, outbox_id, 'pending', delay=wait, refund_attempt=True)
+            counts['released'] += 1
+            continue
+        if wait > 0:
+            with phase('pacing'):
+                time.sleep(wait)
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            _finish(conn, outbox_id, 'pending', refund_attempt=True)
+            counts['released'] += 1
+            continue
+
+        try:
+            client.call('sendMessage', {'chat_id': chat_id, **message['payload']},
+                        timeout=min(client.timeout, remaining))
+        except RateLimitedError as e:
+            _chat_paused_until[chat_id] = time.monotonic() + e.retry_after
+            _finish(conn, outbox_id, 'pending', delay=e.retry_after, error=e.message, refund_attempt=True)
+            counts['rate_limited'] += 1
+            continue
+        except TelegramError as e:
+            if e.retryable and message['attempts'] < MAX_ATTEMPTS:
+                _finish(conn, outbox_id, 'pending', delay=backoff_seconds(message['attempts']), error=e.message)
+                counts['retried'] += 1
+            else:
+                _finish(conn, outbox_id, 'dead', error=e.message)
+                counts['dead'] += 1
+            continue
+        except Exception as e:
+            # Not a Bot API answer (a bug or a broken connection object): back off like a
+            # retryable failure rather than leave the row 'sending' until its lease runs out
+            client.close()
+            error = f'{type(e).__name__}: {e}'
+            if message['attempts'] < MAX_ATTEMPTS:
+                _finish(conn, outbox_id, 'pending', delay=backoff_seconds(message['attempts']), error=error)
+                counts['retried'] += 1
+            else:
+                _finish(conn, outbox_id, 'dead', error=error)
+                counts['dead'] += 1
+            continue
+
+        _chat_paused_until[chat_id] = time.monotonic() + CHAT_MIN_INTERVAL_SECONDS
+        _finish(conn, outbox_id, 'sent')
+        counts['sent'] += 1
+        counts['sent_ids'].append(outbox_id)
+    return counts
+
+
+def requeue_dead(conn: Any) -> int:
+    '''Give dead-lettered messages a fresh set of attempts, e.g. after fixing the bot token.'''
+    cursor = conn.cursor()
+    cursor.execute(
+        "UPDATE lead_outbox SET status = 'pending', attempts = 0, next_attempt_at = CURRENT_TIMESTAMP "
+        "WHERE status = 'dead'"
+    )
+    conn.commit()
+    return cursor.rowcount
+
+
+def stats(conn: Any) -> Dict[str, Any]:
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    cursor.execute(
+        "SELECT status, count(*) AS count, extract(epoch FROM CURRENT_TIMESTAMP - min(created_at)) AS oldest_seconds "
+        'FROM lead_outbox GROUP BY status'
+    )
+    rows = cursor.fetchall()
+    conn.rollback()
+    return {row['status']: {'count': row['count'], 'oldest_seconds': float(row['oldest_seconds'] or 0)} for row in rows}
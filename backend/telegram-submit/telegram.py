@@ -0,0 +1,131 @@
+'''
+Business: Minimal Telegram Bot API client that keeps one HTTP(S) connection open between sends and warm invocations
+Args: TELEGRAM_BOT_TOKEN, TELEGRAM_API_BASE (default https://api.telegram.org, point it at a local stand-in for tests), TELEGRAM_TIMEOUT_SECONDS
+Returns: the Bot API result, or RateLimitedError / TelegramError saying whether the send may be retried
+'''
+
+import http.client
+import json
+import os
+import threading
+import urllib.parse
+from typing import Any, Dict, Optional
+from instrumentation import phase
+
+API_BASE = os.environ.get('TELEGRAM_API_BASE', 'https://api.telegram.org').rstrip('/')
+TIMEOUT_SECONDS = float(os.environ.get('TELEGRAM_TIMEOUT_SECONDS', '5'))
+
+
+class TelegramError(Exception):
+    def __init__(self, message: str, retryable: bool):
+        super().__init__(message)
+        self.message = message
+        self.retryable = retryable
+
+
+class RateLimitedError(TelegramError):
+    '''429 from the Bot API: the chat may not be sent to for retry_after seconds.'''
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message, retryable=True)
+        self.retry_after = retry_after
+
+
+class TelegramClient:
+    '''
+    One keep-alive connection to the Bot API host, reopened once if the
+    server closed it between calls. Not shared across threads: get_client
+    gives each thread its own.
+    '''
+
+    def __init__(self, bot_token: str, api_base: str = API_BASE, timeout: float = TIMEOUT_SECONDS):
+        parts = urllib.parse.urlsplit(api_base)
+        self.bot_token = bot_token
+        self.scheme = parts.scheme
+        self.host = parts.hostname or ''
+        self.port = parts.port
+        self.path_prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self._conn: Optional[http.client.HTTPConnection] = None
+        self.requests = 0
+        self.connections = 0
+
+    def _connection(self) -> http.client.HTTPConnection:
+        if self._conn is None:
+            connection_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+            self._conn = connection_class(self.host, self.port, timeout=self.timeout)
+            self.connections += 1
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _post(self, method: str, params: Dict[str, Any], timeout: float) -> http.client.HTTPResponse:
+        body = urllib.parse.urlencode(params).encode('utf-8')
+        path = f'{self.path_prefix}/bot{self.bot_token}/{method}'
+        headers = {'Content-Type': 'application/x-www-form-urlencoded', 'Connection': 'keep-alive'}
+        for attempt in range(2):
+            conn = self._connection()
+            # A kept-alive socket keeps the timeout it was opened with unless told otherwise
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            try:
+                conn.request('POST', path, body=body, headers=headers)
+                return conn.getresponse()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                # A kept-alive connection the server has since closed; retry once on a fresh one
+                self.close()
+                if attempt:
+                    raise
+            except Exception:
+                self.close()
+                raise
+        raise AssertionError('unreachable')
+
+    def call(self, method: str, params: Dict[str, Any], timeout: Optional[float] = None) -> Any:
+        '''timeout, when given, replaces the client's socket timeout for this call only.'''
+        self.requests += 1
+        try:
+            with phase('telegram'):
+                response = self._post(method, params, self.timeout if timeout is None else timeout)
+                raw = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            self.close()
+            raise TelegramError(f'{type(e).__name__}: {e}', retryable=True)
+
+        try:
+            result = json.loads(raw.decode('utf-8'))
+        except ValueError:
+            result = {'ok': False, 'description': raw[:200].decode('utf-8', 'replace')}
+        if response.status == 200 and result.get('ok'):
+            return result.get('result')
+
+        description = f"{response.status}: {result.get('description', 'no description')}"
+        if response.status == 429:
+            retry_after = (result.get('parameters') or {}).get('retry_after')
+            if retry_after is None:
+                retry_after = response.getheader('Retry-After') or 1
+            raise RateLimitedError(description, float(retry_after))
+        # 5xx and transport trouble pass; 401/404 mean a wrong bot token, which an
+        # operator can fix, so those are retried too rather than dead-lettered at once.
+        retryable = response.status >= 500 or response.status in (401, 404)
+        raise TelegramError(description, retryable=retryable)
+
+
+# Per thread, since concurrent invocations of one warm instance (threaded dev server,
+# runtimes with instance concurrency) must not interleave requests on one connection
+_local = threading.local()
+
+
+def get_client(bot_token: str) -> TelegramClient:
+    '''Client per token and thread, so a warm container reuses its connection.'''
+    clients = getattr(_local, 'clients', None)
+    if clients is None:
+        clients = _local.clients = {}
+    client = clients.get(bot_token)
+    if client is None:
+        client = clients[bot_token] = TelegramClient(bot_token)
+    return client
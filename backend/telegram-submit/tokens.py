@@ -0,0 +1,142 @@
+'''
+Business: Admin JWT handling shared by protected functions: issue, verify with a cache of verified tokens, revoke
+Args: request headers and a RealDictCursor for admin_users lookups; JWT_SECRET, JWT_PREVIOUS_SECRETS and AUTH_* tuning variables
+Returns: the verified token payload, or AuthError carrying the HTTP status and message to send
+'''
+
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+import jwt
+from cache import TTLCache
+
+ADMIN_USERS_TABLE = 't_p37006348_real_estate_agency_w.admin_users'
+ALGORITHM = 'HS256'
+SECRET_KEY = os.environ.get('JWT_SECRET', 'default-secret-change-in-production')
+# Keys being rotated out still verify tokens issued before the rotation but never sign new ones.
+PREVIOUS_SECRET_KEYS = [key.strip() for key in os.environ.get('JWT_PREVIOUS_SECRETS', '').split(',') if key.strip()]
+TOKEN_LIFETIME = timedelta(days=float(os.environ.get('AUTH_TOKEN_LIFETIME_DAYS', '7')))
+
+# Verified payloads keyed by the token's SHA-256; an entry is still checked against exp on every hit.
+token_cache = TTLCache(
+    max_entries=int(os.environ.get('AUTH_TOKEN_CACHE_SIZE', '1024')),
+    ttl=float(os.environ.get('AUTH_TOKEN_CACHE_TTL_SECONDS', '300'))
+)
+# Active flag, role and token_version per user. Deactivation or revocation made by another
+# container takes effect here within this TTL; revocations made here take effect at once.
+user_cache = TTLCache(
+    max_entries=int(os.environ.get('AUTH_USER_CACHE_SIZE', '256')),
+    ttl=float(os.environ.get('AUTH_USER_TTL_SECONDS', '30'))
+)
+
+
+class AuthError(Exception):
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+def extract_token(headers: Optional[Dict[str, str]]) -> str:
+    '''X-Auth-Token, or an Authorization: Bearer header; header names in any case.'''
+    lowered = {name.lower(): value for name, value in (headers or {}).items() if value}
+    token = lowered.get('x-auth-token', '')
+    if not token:
+        auth_header = lowered.get('authorization', '')
+        if auth_header.startswith('Bearer '):
+            token = auth_header[7:]
+    return token.strip()
+
+
+def issue_token(user: Dict[str, Any]) -> str:
+    now = datetime.utcnow()
+    payload = {
+        'user_id': user['id'],
+        'username': user['username'],
+        'role': user['role'],
+        'ver': user.get('token_version', 0),
+        'exp': now + TOKEN_LIFETIME,
+        'iat': now
+    }
+    return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def _decode(token: str) -> Dict[str, Any]:
+    for key in [SECRET_KEY] + PREVIOUS_SECRET_KEYS:
+        try:
+            return jwt.decode(token, key, algorithms=[ALGORITHM])
+        except jwt.ExpiredSignatureError:
+            raise AuthError(401, 'Token expired')
+        except jwt.InvalidSignatureError:
+            continue
+        except jwt.InvalidTokenError:
+            break
+    raise AuthError(401, 'Invalid token')
+
+
+def verify_token(token: str) -> Dict[str, Any]:
+    '''
+    Check the signature once per token and serve repeat calls from
+    token_cache. exp is compared on every call, cached or not, so caching
+    never extends a token's life.
+    '''
+    key = hashlib.sha256(token.encode('utf-8')).digest()
+    payload = token_cache.get(key)
+    if payload is None:
+        payload = _decode(token)
+        token_cache.set(key, payload)
+    exp = payload.get('exp')
+    if exp is not None and exp <= time.time():
+        token_cache.discard(key)
+        raise AuthError(401, 'Token expired')
+    return payload
+
+
+def load_user(cursor: Any, user_id: Any) -> Optional[Dict[str, Any]]:
+    if not isinstance(user_id, int):
+        return None
+    user = user_cache.get(user_id)
+    if user is None:
+        cursor.execute(
+            f'SELECT id, username, email, full_name, role, is_active, token_version FROM {ADMIN_USERS_TABLE} WHERE id = %s',
+            (user_id,)
+        )
+        row = cursor.fetchone()
+        user = dict(row) if row else {}
+        user_cache.set(user_id, user)
+    return user or None
+
+
+def authenticate(headers: Optional[Dict[str, str]], cursor: Any, require_admin: bool = True) -> Dict[str, Any]:
+    '''
+    Verified payload of the request's token, whose user must still be
+    active and whose ver must match the user's token_version. The role is
+    taken from admin_users rather than from the token.
+    '''
+    token = extract_token(headers)
+    if not token:
+        raise AuthError(401, 'Authentication required')
+    payload = verify_token(token)
+    user = load_user(cursor, payload.get('user_id'))
+    if not user or not user['is_active']:
+        raise AuthError(401, 'User not found or inactive')
+    if payload.get('ver', 0) != user['token_version']:
+        raise AuthError(401, 'Token revoked')
+    if require_admin and user['role'] != 'admin':
+        raise AuthError(403, 'Admin access required')
+    return payload
+
+
+def revoke_tokens(cursor: Any, user_id: int) -> None:
+    '''Invalidate every token issued to the user so far; the caller commits.'''
+    cursor.execute(
+        f'UPDATE {ADMIN_USERS_TABLE} SET token_version = token_version + 1 WHERE id = %s',
+        (user_id,)
+    )
+    user_cache.discard(user_id)
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    return {'tokens': token_cache.stats(), 'users': user_cache.stats()}
@@ -0,0 +1,6 @@
+-- Keyset pagination seeks on (created_at, id): a NULL created_at would make the row comparison drop rows
+UPDATE properties SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL;
+ALTER TABLE properties ALTER COLUMN created_at SET NOT NULL;
+
+-- Ordered scan for the default catalog listing (newest first, active only)
+CREATE INDEX IF NOT EXISTS idx_properties_active_created_id ON properties (created_at DESC, id DESC) WHERE status = 'active';
@@ -0,0 +1,38 @@
+-- Full-text and trigram search for the catalog `query` filter.
+-- Russian text is stemmed with the 'russian' configuration. Postgres ships no Armenian
+-- stemmer, so every field is also indexed with 'simple' (lower-cased, unstemmed words)
+-- and Armenian queries match on whole words, or on trigrams for partial/misspelled input.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE properties ADD COLUMN IF NOT EXISTS search_vector tsvector;
+
+CREATE OR REPLACE FUNCTION properties_search_vector(title TEXT, address TEXT, street_name TEXT, district TEXT, description TEXT)
+RETURNS tsvector AS $$
+    SELECT setweight(to_tsvector('russian', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('russian', concat_ws(' ', address, street_name, district)), 'B')
+        || setweight(to_tsvector('simple', concat_ws(' ', address, street_name, district)), 'B')
+        || setweight(to_tsvector('russian', coalesce(description, '')), 'C')
+        || setweight(to_tsvector('simple', coalesce(description, '')), 'C');
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION properties_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := properties_search_vector(NEW.title, NEW.address, NEW.street_name, NEW.district, NEW.description);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_properties_search_vector ON properties;
+CREATE TRIGGER trg_properties_search_vector
+    BEFORE INSERT OR UPDATE OF title, address, street_name, district, description ON properties
+    FOR EACH ROW EXECUTE FUNCTION properties_search_vector_update();
+
+UPDATE properties SET search_vector = properties_search_vector(title, address, street_name, district, description);
+
+CREATE INDEX IF NOT EXISTS idx_properties_search_vector ON properties USING gin (search_vector);
+
+-- Trigram indexes serve the ILIKE '%...%' list filter and the word-similarity (<%) search fallback
+CREATE INDEX IF NOT EXISTS idx_properties_title_trgm ON properties USING gin (title gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_properties_address_trgm ON properties USING gin (address gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_properties_description_trgm ON properties USING gin (description gin_trgm_ops);
@@ -0,0 +1,23 @@
+-- Partial composite indexes for the catalog listing. Every anonymous query filters
+-- status = 'active', adds equality filters on transaction/type/district and sorts
+-- by created_at DESC, id DESC, so equality columns lead and the sort key follows:
+-- the planner can then walk the index in order and stop after LIMIT rows.
+CREATE INDEX IF NOT EXISTS idx_properties_active_tx_type_district_created
+    ON properties (transaction_type, property_type, district, created_at DESC, id DESC)
+    WHERE status = 'active';
+
+CREATE INDEX IF NOT EXISTS idx_properties_active_tx_type_created
+    ON properties (transaction_type, property_type, created_at DESC, id DESC)
+    WHERE status = 'active';
+
+CREATE INDEX IF NOT EXISTS idx_properties_active_district_created
+    ON properties (district, created_at DESC, id DESC)
+    WHERE status = 'active';
+
+-- Price ranges and the per-filter COUNT(*): all referenced columns are in the index,
+-- so counts can be answered by an index-only scan
+CREATE INDEX IF NOT EXISTS idx_properties_active_tx_type_district_price
+    ON properties (transaction_type, property_type, district, price)
+    WHERE status = 'active';
+
+ANALYZE properties;
@@ -0,0 +1,21 @@
+-- Single-row counter bumped by every write to properties. Cached catalog responses
+-- are keyed by it, so any writer (handler, bulk import, manual SQL) invalidates them.
+CREATE TABLE IF NOT EXISTS catalog_version (
+    id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO catalog_version (id, version) VALUES (1, 0) ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_catalog_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE catalog_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_properties_catalog_version ON properties;
+CREATE TRIGGER trg_properties_catalog_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON properties
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version();
@@ -0,0 +1,19 @@
+-- Catalog ETags are derived from COUNT(*) and MAX(updated_at) of the filtered set, so every
+-- UPDATE must move updated_at, whichever code path issues it.
+CREATE OR REPLACE FUNCTION properties_touch_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at := CURRENT_TIMESTAMP;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_properties_touch_updated_at ON properties;
+CREATE TRIGGER trg_properties_touch_updated_at
+    BEFORE UPDATE ON properties
+    FOR EACH ROW EXECUTE FUNCTION properties_touch_updated_at();
+
+-- Keep the count/ETag summary query index-only by carrying updated_at in the count index
+CREATE INDEX IF NOT EXISTS idx_properties_active_tx_type_district_price_upd
+    ON properties (transaction_type, property_type, district, price) INCLUDE (updated_at)
+    WHERE status = 'active';
+DROP INDEX IF EXISTS idx_properties_active_tx_type_district_price;
@@ -0,0 +1,7 @@
+-- Spatial index for bbox/near filters and nearest-first ordering without PostGIS.
+-- The expression must match queries.GEO_POINT_SQL exactly: longitude is scaled by
+-- cos(40.18°) (Yerevan's latitude) so Euclidean distance on the point tracks metres
+-- and the built-in GiST point opclass serves both <@ box and <-> (KNN) ordering.
+CREATE INDEX IF NOT EXISTS idx_properties_active_geo_point
+    ON properties USING gist (point(longitude::float8 * 0.764, latitude::float8))
+    WHERE status = 'active';
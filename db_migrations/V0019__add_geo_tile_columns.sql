@@ -0,0 +1,14 @@
+-- Web-Mercator tile coordinates at zoom 20 for server-side map clustering.
+-- A cluster cell at any lower zoom is geo_tile_x >> (20 - zoom - 2), so grouping
+-- needs no per-row trigonometry. The formula must match queries.lnglat_to_tile.
+ALTER TABLE properties
+    ADD COLUMN IF NOT EXISTS geo_tile_x INTEGER GENERATED ALWAYS AS (
+        LEAST(GREATEST(floor((longitude::float8 + 180) / 360 * 1048576), 0), 1048575)::integer
+    ) STORED;
+
+ALTER TABLE properties
+    ADD COLUMN IF NOT EXISTS geo_tile_y INTEGER GENERATED ALWAYS AS (
+        LEAST(GREATEST(floor(
+            (1 - asinh(tan(radians(LEAST(GREATEST(latitude::float8, -85.0511), 85.0511)))) / pi()) / 2 * 1048576
+        ), 0), 1048575)::integer
+    ) STORED;
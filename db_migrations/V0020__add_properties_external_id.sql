@@ -0,0 +1,7 @@
+-- Stable identifier from the agency's source inventory, used by the bulk
+-- import to upsert instead of duplicating rows. NULL for listings created
+-- through the admin form; UNIQUE allows any number of NULLs.
+ALTER TABLE properties ADD COLUMN IF NOT EXISTS external_id VARCHAR(100);
+
+ALTER TABLE properties DROP CONSTRAINT IF EXISTS properties_external_id_key;
+ALTER TABLE properties ADD CONSTRAINT properties_external_id_key UNIQUE (external_id);
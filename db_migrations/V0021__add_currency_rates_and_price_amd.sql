@@ -0,0 +1,72 @@
+-- Listings are priced in AMD or USD, so filtering and sorting on the raw price
+-- mixes currencies. price_amd is the price normalised to drams, kept in step by
+-- triggers: per row when a listing's price/currency changes, and in one set-based
+-- UPDATE when a rate changes.
+CREATE TABLE IF NOT EXISTS currency_rates (
+    currency VARCHAR(3) PRIMARY KEY,
+    amd_per_unit NUMERIC(14, 6) NOT NULL CHECK (amd_per_unit > 0),
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO currency_rates (currency, amd_per_unit) VALUES
+    ('AMD', 1),
+    ('USD', 387),
+    ('EUR', 420),
+    ('RUB', 4.2)
+ON CONFLICT (currency) DO NOTHING;
+
+ALTER TABLE properties ADD COLUMN IF NOT EXISTS price_amd NUMERIC(16, 2);
+
+CREATE OR REPLACE FUNCTION properties_set_price_amd() RETURNS trigger AS $$
+BEGIN
+    NEW.price_amd := NEW.price * (
+        SELECT amd_per_unit FROM currency_rates WHERE currency = upper(NEW.currency)
+    );
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_properties_price_amd ON properties;
+CREATE TRIGGER trg_properties_price_amd
+    BEFORE INSERT OR UPDATE OF price, currency ON properties
+    FOR EACH ROW EXECUTE FUNCTION properties_set_price_amd();
+
+CREATE OR REPLACE FUNCTION currency_rates_recompute_prices() RETURNS trigger AS $$
+BEGIN
+    UPDATE properties
+    SET price_amd = properties.price * changed.amd_per_unit
+    FROM changed
+    WHERE upper(properties.currency) = changed.currency
+      AND properties.price_amd IS DISTINCT FROM properties.price * changed.amd_per_unit;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_currency_rates_insert ON currency_rates;
+CREATE TRIGGER trg_currency_rates_insert
+    AFTER INSERT ON currency_rates
+    REFERENCING NEW TABLE AS changed
+    FOR EACH STATEMENT EXECUTE FUNCTION currency_rates_recompute_prices();
+
+DROP TRIGGER IF EXISTS trg_currency_rates_update ON currency_rates;
+CREATE TRIGGER trg_currency_rates_update
+    AFTER UPDATE ON currency_rates
+    REFERENCING NEW TABLE AS changed
+    FOR EACH STATEMENT EXECUTE FUNCTION currency_rates_recompute_prices();
+
+UPDATE properties
+SET price_amd = properties.price * currency_rates.amd_per_unit
+FROM currency_rates
+WHERE upper(properties.currency) = currency_rates.currency;
+
+-- Price filters and the count/ETag summary now read price_amd
+CREATE INDEX IF NOT EXISTS idx_properties_active_tx_type_district_price_amd_upd
+    ON properties (transaction_type, property_type, district, price_amd) INCLUDE (updated_at)
+    WHERE status = 'active';
+DROP INDEX IF EXISTS idx_properties_active_tx_type_district_price_upd;
+
+CREATE INDEX IF NOT EXISTS idx_properties_active_price_amd
+    ON properties (price_amd, id)
+    WHERE status = 'active';
+
+ANALYZE properties;
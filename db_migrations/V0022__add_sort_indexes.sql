@@ -0,0 +1,24 @@
+-- Index-backed ORDER BY for the catalog sort= orders. Every sort pages by
+-- (key, id), so each key is indexed together with id; DESC orders walk the same
+-- indexes backwards. Rows without a sort key are excluded from that order.
+ALTER TABLE properties
+    ADD COLUMN IF NOT EXISTS price_per_sqm_amd NUMERIC(16, 2)
+    GENERATED ALWAYS AS (round(price_amd / NULLIF(area, 0), 2)) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_properties_active_area
+    ON properties (area, id)
+    WHERE status = 'active';
+
+CREATE INDEX IF NOT EXISTS idx_properties_active_price_per_sqm
+    ON properties (price_per_sqm_amd, id)
+    WHERE status = 'active';
+
+-- The sidebar's most common shape: transaction + type, ordered by price
+CREATE INDEX IF NOT EXISTS idx_properties_active_tx_type_price_amd
+    ON properties (transaction_type, property_type, price_amd, id)
+    WHERE status = 'active';
+
+-- Raw price mixes currencies and is no longer filtered or sorted on
+DROP INDEX IF EXISTS idx_properties_price;
+
+ANALYZE properties;
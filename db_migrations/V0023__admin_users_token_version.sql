@@ -0,0 +1,3 @@
+-- Bumping token_version revokes every JWT issued to the user before the bump
+ALTER TABLE t_p37006348_real_estate_agency_w.admin_users
+  ADD COLUMN IF NOT EXISTS token_version INTEGER NOT NULL DEFAULT 0;
@@ -0,0 +1,11 @@
+-- Failed logins counted per attempt key ('user:<username>' or 'ip:<address>').
+-- A key whose failures reach its limit within the window is locked until
+-- locked_until; the auth function rejects it before running bcrypt.
+CREATE TABLE IF NOT EXISTS login_attempts (
+    attempt_key VARCHAR(200) PRIMARY KEY,
+    failures INTEGER NOT NULL DEFAULT 0,
+    window_started_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    locked_until TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_login_attempts_window_started_at ON login_attempts (window_started_at);
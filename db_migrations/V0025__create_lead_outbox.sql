@@ -0,0 +1,19 @@
+-- Leads from the site form are stored here before delivery to Telegram, so a slow
+-- or rate-limited Bot API never loses a lead or holds up the visitor's request.
+-- pending -> sending (claimed until locked_until) -> sent | dead; a claim whose
+-- lease ran out (worker died mid-send) is picked up again.
+CREATE TABLE IF NOT EXISTS lead_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    chat_id VARCHAR(64) NOT NULL,
+    payload JSONB NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'sending', 'sent', 'dead')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    locked_until TIMESTAMP,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_lead_outbox_due ON lead_outbox (next_attempt_at, id) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_lead_outbox_sending ON lead_outbox (locked_until) WHERE status = 'sending';
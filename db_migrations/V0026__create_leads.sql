@@ -0,0 +1,27 @@
+-- Every form submission is kept as a lead. Repeat submits from one contact are
+-- folded into the existing row by a single INSERT ... ON CONFLICT on
+-- (contact_hash, dedup_bucket): dedup_bucket is the submit time divided into
+-- fixed windows (LEAD_DEDUP_WINDOW_SECONDS), so a double-click costs one upsert
+-- and no second Telegram message.
+CREATE TABLE IF NOT EXISTS leads (
+    id BIGSERIAL PRIMARY KEY,
+    name VARCHAR(200) NOT NULL,
+    contact_method VARCHAR(50),
+    contact VARCHAR(200) NOT NULL,
+    contact_hash CHAR(64) NOT NULL,
+    dedup_bucket BIGINT NOT NULL,
+    service VARCHAR(100),
+    message TEXT,
+    property_id INTEGER REFERENCES properties(id) ON DELETE SET NULL,
+    submit_count INTEGER NOT NULL DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_leads_contact_hash_bucket ON leads (contact_hash, dedup_bucket);
+CREATE INDEX IF NOT EXISTS idx_leads_created_at_id ON leads (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_leads_contact_hash_created_at ON leads (contact_hash, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_leads_property_id ON leads (property_id, created_at DESC) WHERE property_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_leads_service_created_at ON leads (service, created_at DESC);
+
+ALTER TABLE lead_outbox ADD COLUMN IF NOT EXISTS lead_id BIGINT REFERENCES leads(id) ON DELETE SET NULL;
@@ -0,0 +1,170 @@
+'''
+Business: Shared helpers for the backend benchmark scripts
+Args: function directory names under backend/, callables to time
+Returns: loaded cloud-function handlers and latency summaries
+'''
+
+import importlib.util
+import os
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+
+
+def load_function(name: str) -> Any:
+    '''Import backend/<name>/index.py the way the cloud runtime does: with its own directory on sys.path.'''
+    function_dir = os.path.abspath(os.path.join(BACKEND_DIR, name))
+    if function_dir not in sys.path:
+        sys.path.insert(0, function_dir)
+    module_name = 'fn_' + name.replace('-', '_')
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(function_dir, 'index.py'))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_event(method: str = 'GET', query: Dict[str, str] = None, headers: Dict[str, str] = None,
+               body: str = None, path_parameters: Dict[str, str] = None) -> Dict[str, Any]:
+    return {
+        'httpMethod': method,
+        'headers': headers or {},
+        'queryStringParameters': query or {},
+        'pathParameters': path_parameters or {},
+        'body': body,
+        'isBase64Encoded': False
+    }
+
+
+def time_calls(fn: Callable[[], Any], iterations: int, warmup: int = 0) -> List[float]:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        'n': len(ordered),
+        'mean_ms': statistics.fmean(ordered),
+        'p50_ms': pct(50),
+        'p95_ms': pct(95),
+        'p99_ms': pct(99),
+        'max_ms': ordered[-1]
+    }
+
+
+def print_table(rows: List[Dict[str, Any]], columns: List[str]) -> None:
+    widths = {c: max(len(c), *(len(_fmt(r.get(c))) for r in rows)) for c in columns}
+    print('  '.join(c.ljust(widths[c]) for c in columns))
+    print('  '.join('-' * widths[c] for c in columns))
+    for row in rows:
+        print('  '.join(_fmt(row.get(c)).ljust(widths[c]) for c in columns))
+
+
+def _fmt(value: Any) -> str:
+    if isinstance(value, float):
+        return f'{value:.3f}'
+    return '' if value is None else str(value)
+
+
+def require_dsn() -> str:
+    dsn = os.environ.get('DATABASE_URL')
+    if not dsn:
+        sys.exit('DATABASE_URL must point at a local Postgres with db_migrations applied')
+    return dsn
+
+
+def admin_token(dsn: str, function: str = 'properties') -> str:
+    '''
+    Sign a token for the first active admin in admin_users with the function's
+    own tokens module, so it passes the same user and token_version checks as
+    a token issued by the auth function.
+    '''
+    load_function(function)
+    import db
+    import tokens
+    conn = db.get_connection(dsn)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"SELECT id, username, role, token_version FROM {tokens.ADMIN_USERS_TABLE} "
+                "WHERE role = 'admin' AND is_active ORDER BY id LIMIT 1"
+            )
+            row = cursor.fetchone()
+        conn.rollback()
+    finally:
+        db.release_connection(conn)
+    if not row:
+        sys.exit('admin_users has no active admin to sign a benchmark token for')
+    return tokens.issue_token(dict(zip(('id', 'username', 'role', 'token_version'), row)))
+
+
+DISTRICTS = [
+    'Центр', 'Аджапняк', 'Аван', 'Арабкир', 'Давташен', 'Эребуни',
+    'Канакер-Зейтун', 'Малатия-Себастия', 'Нор Норк', 'Нубарашен', 'Шенгавит'
+]
+
+TITLE_WORDS = [
+    'квартира', 'дом', 'офис', 'студия', 'пентхаус', 'особняк', 'коттедж',
+    'новостройка', 'таунхаус', 'բնակարան', 'տուն', 'գրասենյակ'
+]
+
+DESCRIPTION_WORDS = [
+    'светлая', 'просторная', 'уютная', 'отремонтированная', 'меблированная', 'балкон',
+    'вид', 'на', 'Арарат', 'парковка', 'лифт', 'рядом', 'метро', 'школа', 'парк',
+    'центр', 'тихий', 'двор', 'кондиционер', 'евроремонт', 'գեղեցիկ', 'լուսավոր',
+    'կենտրոն', 'այգի', 'մետրո', 'նորակառույց'
+]
+
+STREETS = [
+    'ул. Абовяна', 'пр. Маштоца', 'ул. Туманяна', 'ул. Сарьяна', 'пр. Тиграна Меца',
+    'ул. Комитаса', 'ул. Баграмяна', 'ул. Пушкина', 'ул. Московян', 'ул. Налбандяна'
+]
+
+
+def seed_properties(conn: Any, count: int) -> None:
+    '''Insert count synthetic active listings spread over districts, types, prices and words.'''
+    with conn.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO properties (
+                title, description, property_type, transaction_type, price, currency,
+                area, rooms, district, address, latitude, longitude, features, images, status, created_at
+            )
+            SELECT initcap(title_words[1 + g %% cardinality(title_words)]) || ' ' || (1 + g %% 5) || '-комн., '
+                       || streets[1 + (g / 7) %% cardinality(streets)],
+                   array_to_string(ARRAY(
+                       SELECT description_words[1 + (g * k * 31 + k) %% cardinality(description_words)]
+                       FROM generate_series(1, 12 + g %% 40) AS k
+                   ), ' '),
+                   (ARRAY['apartment', 'house', 'commercial'])[1 + g %% 3],
+                   (ARRAY['rent', 'sale'])[1 + g %% 2],
+                   100000 + (g * 7919) %% 900000, 'AMD',
+                   30 + g %% 120, 1 + g %% 5,
+                   districts[1 + g %% cardinality(districts)],
+                   streets[1 + (g / 7) %% cardinality(streets)] || ', ' || (1 + g %% 120),
+                   40.15 + (g %% 1000) / 10000.0, 44.45 + (g %% 997) / 10000.0,
+                   ARRAY['parking'], ARRAY['/img/placeholder.jpg'], 'active',
+                   now() - (g || ' minutes')::interval
+            FROM generate_series(1, %s) AS g,
+                 (SELECT %s::text[] AS districts, %s::text[] AS title_words,
+                         %s::text[] AS description_words, %s::text[] AS streets) AS words
+            """,
+            (count, DISTRICTS, TITLE_WORDS, DESCRIPTION_WORDS, STREETS)
+        )
+    conn.commit()
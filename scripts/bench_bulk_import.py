@@ -0,0 +1,107 @@
+'''
+Business: Benchmark bulk import throughput (COPY + one upsert) against one POST per listing
+Args: DATABASE_URL of a local Postgres with db_migrations applied; --sizes 1000,5000,20000; --baseline 200 single POSTs
+Returns: rows/sec table printed to stdout; benchmark rows (external_id bench-*) are deleted afterwards
+'''
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _bench import (
+    DESCRIPTION_WORDS, DISTRICTS, STREETS, TITLE_WORDS, admin_token, load_function, make_event, print_table, require_dsn
+)
+
+
+def synthetic_records(count: int, prefix: str) -> List[Dict[str, Any]]:
+    records = []
+    for g in range(count):
+        records.append({
+            'external_id': f'{prefix}-{g}',
+            'title': f'{TITLE_WORDS[g % len(TITLE_WORDS)].capitalize()} {1 + g % 5}-комн.',
+            'description': ' '.join(DESCRIPTION_WORDS[(g * k * 31 + k) % len(DESCRIPTION_WORDS)] for k in range(1, 20)),
+            'property_type': ('apartment', 'house', 'commercial')[g % 3],
+            'transaction_type': ('rent', 'sale')[g % 2],
+            'price': 100000 + (g * 7919) % 900000,
+            'area': 30 + g % 120,
+            'rooms': 1 + g % 5,
+            'district': DISTRICTS[g % len(DISTRICTS)],
+            'address': f'{STREETS[g % len(STREETS)]}, {1 + g % 120}',
+            'latitude': 40.15 + (g % 1000) / 10000.0,
+            'longitude': 44.45 + (g % 997) / 10000.0,
+            'features': ['parking', 'балкон'],
+            'images': ['/img/placeholder.jpg']
+        })
+    return records
+
+
+def to_body(records: List[Dict[str, Any]], fmt: str) -> str:
+    if fmt == 'ndjson':
+        return '\n'.join(json.dumps(record, ensure_ascii=False) for record in records)
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(records[0]), lineterminator='\n')
+    writer.writeheader()
+    for record in records:
+        writer.writerow({key: json.dumps(value, ensure_ascii=False) if isinstance(value, list) else value
+                         for key, value in record.items()})
+    return buffer.getvalue()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='1000,5000,20000')
+    parser.add_argument('--baseline', type=int, default=200, help='listings created one POST at a time')
+    args = parser.parse_args()
+    dsn = require_dsn()
+
+    properties = load_function('properties')
+    import db
+    headers = {'X-Auth-Token': admin_token(dsn)}
+    rows = []
+
+    def cleanup() -> None:
+        conn = db.get_connection(dsn)
+        with conn.cursor() as cursor:
+            cursor.execute("DELETE FROM properties WHERE external_id LIKE 'bench-%%' OR title LIKE 'bench-post-%%'")
+        conn.commit()
+        db.release_connection(conn)
+
+    cleanup()
+    if args.baseline:
+        records = synthetic_records(args.baseline, 'bench-post')
+        started = time.perf_counter()
+        for record in records:
+            record = {**record, 'title': 'bench-post-' + record.pop('external_id')}
+            response = properties.handler(make_event('POST', headers=headers, body=json.dumps(record)), None)
+            assert response['statusCode'] == 201, response['body']
+        elapsed = time.perf_counter() - started
+        rows.append({'method': 'POST per row', 'rows': args.baseline, 'seconds': elapsed,
+                     'rows_per_sec': args.baseline / elapsed})
+
+    for size in (int(value) for value in args.sizes.split(',')):
+        for fmt in ('ndjson', 'csv'):
+            body = to_body(synthetic_records(size, f'bench-{fmt}'), fmt)
+            for label in ('insert', 'upsert'):
+                started = time.perf_counter()
+                response = properties.handler(
+                    make_event('POST', {'mode': 'import', 'format': fmt}, headers, body), None
+                )
+                elapsed = time.perf_counter() - started
+                data = json.loads(response['body'])['data']
+                assert data['valid'] == size, data
+                rows.append({'method': f'import {fmt} ({label})', 'rows': size, 'seconds': elapsed,
+                             'rows_per_sec': size / elapsed, 'body_kb': len(body.encode('utf-8')) / 1024})
+
+    cleanup()
+    print_table(rows, ['method', 'rows', 'seconds', 'rows_per_sec', 'body_kb'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+'''
+Business: Weigh the CPU cost of compressing catalog responses against the bytes it saves, per coding and level
+Args: DATABASE_URL of a local Postgres with db_migrations applied and a seeded catalog (scripts/seed_catalog.py); --iterations per body and setting, --link-kbps for the transfer time column
+Returns: table of body size, compressed size, compression time and transfer time saved for typical list, map and detail responses
+'''
+
+import argparse
+import gzip
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _bench import load_function, make_event, print_table, require_dsn, summarize, time_calls
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVELS = (1, 6, 9)
+BROTLI_QUALITIES = (1, 4, 5, 6, 9, 11)
+
+
+def catalog_bodies(properties: object) -> list:
+    '''Uncompressed bodies of the responses the site requests most, as the handler produces them.'''
+    first = properties.handler(make_event('GET', {'transaction': 'sale', 'limit': '1'}), None)
+    first_id = str(properties.json.loads(first['body'])['data']['properties'][0]['id'])
+    requests = [('detail', {'id': first_id})]
+    for limit in ('10', '20', '50', '100'):
+        requests.append((f'list, {limit} listings', {'transaction': 'sale', 'limit': limit}))
+    requests.append(('search, 20 listings', {'mode': 'search', 'query': 'квартира', 'limit': '20'}))
+    requests.append(('map, 500 points', {'mode': 'map', 'limit': '500'}))
+    bodies = []
+    for label, query in requests:
+        response = properties.handler(make_event('GET', query), None)
+        if response['statusCode'] == 200:
+            bodies.append((label, response['body'].encode('utf-8')))
+    return bodies
+
+
+def settings() -> list:
+    result = [(f'gzip {level}', lambda data, level=level: gzip.compress(data, compresslevel=level, mtime=0))
+              for level in GZIP_LEVELS]
+    if brotli is not None:
+        result += [(f'br {quality}', lambda data, quality=quality: brotli.compress(data, mode=brotli.MODE_TEXT, quality=quality))
+                   for quality in BROTLI_QUALITIES]
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--link-kbps', type=float, default=2000.0,
+                        help='client bandwidth used to turn saved bytes into saved transfer time')
+    args = parser.parse_args()
+    require_dsn()
+    if brotli is None:
+        print('brotli is not installed, measuring gzip only')
+
+    properties = load_function('properties')
+    rows = []
+    for label, data in catalog_bodies(properties):
+        for setting, compress in settings():
+            size = len(compress(data))
+            summary = summarize(time_calls(lambda: compress(data), args.iterations, warmup=2))
+            saved = len(data) - size
+            rows.append({
+                'response': label,
+                'coding': setting,
+                'bytes': len(data),
+                'compressed': size,
+                'ratio': len(data) / size,
+                'compress_ms': summary['mean_ms'],
+                'p95_ms': summary['p95_ms'],
+                'saved_kb_per_ms': saved / 1024 / summary['mean_ms'] if summary['mean_ms'] else 0.0,
+                'transfer_saved_ms': saved * 8 / args.link_kbps
+            })
+    print_table(rows, ['response', 'coding', 'bytes', 'compressed', 'ratio', 'compress_ms', 'p95_ms',
+                       'saved_kb_per_ms', 'transfer_saved_ms'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+'''
+Business: Benchmark cold vs. warm latency of the properties handler with the module-level connection pool
+Args: DATABASE_URL of a local Postgres with db_migrations applied; --iterations N
+Returns: latency table printed to stdout
+'''
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _bench import load_function, make_event, print_table, require_dsn, summarize, time_calls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+    require_dsn()
+
+    properties = load_function('properties')
+    import db
+
+    event = make_event('GET', query={'district': 'Центр'})
+
+    def cold_call() -> None:
+        db.close_all()
+        response = properties.handler(event, None)
+        assert response['statusCode'] == 200, response['body']
+
+    def warm_call() -> None:
+        response = properties.handler(event, None)
+        assert response['statusCode'] == 200, response['body']
+
+    rows = []
+    for label, fn, warmup in (('cold (connect per call)', cold_call, 0), ('warm (pooled)', warm_call, 5)):
+        summary = summarize(time_calls(fn, args.iterations, warmup=warmup))
+        summary['mode'] = label
+        rows.append(summary)
+
+    print_table(rows, ['mode', 'n', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'])
+    print()
+    print('pool stats:', db.get_pool(os.environ['DATABASE_URL']).stats())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+'''
+Business: Measure what the per-invocation instrumentation costs on the cheapest and a typical catalog request
+Args: DATABASE_URL of a local Postgres with db_migrations applied and some listings; --iterations per scenario
+Returns: latency table for each request with instrumentation off, histograms only, and histograms plus the JSON log line
+'''
+
+import argparse
+import contextlib
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _bench import load_function, make_event, print_table, require_dsn, summarize, time_calls
+
+ROUNDS = 5
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+    require_dsn()
+
+    properties = load_function('properties')
+    import instrumentation
+
+    list_event = make_event('GET', {'transaction': 'sale', 'limit': '20'})
+
+    def cache_hit(handler: object) -> None:
+        handler(list_event, None)
+
+    def cache_miss(handler: object) -> None:
+        properties.response_cache.clear()
+        handler(list_event, None)
+
+    modes = (('off', properties.handler.__wrapped__, False),
+             ('histograms', properties.handler, False),
+             ('histograms + log', properties.handler, True))
+    rows = []
+    devnull = open(os.devnull, 'w')
+    for label, request, iterations in (('list, response cache hit', cache_hit, args.iterations),
+                                       ('list, cache miss', cache_miss, max(ROUNDS, args.iterations // 10))):
+        # handler.__wrapped__ is the undecorated handler: no invocation, so every phase() is a no-op.
+        # The modes take turns over several rounds so drift in the database does not favour one.
+        samples = {mode: [] for mode, _, _ in modes}
+        for _ in range(ROUNDS):
+            for mode, handler, log in modes:
+                instrumentation.LOG_ENABLED = log
+                with contextlib.redirect_stdout(devnull):
+                    samples[mode] += time_calls(lambda: request(handler), iterations // ROUNDS, warmup=10)
+        baseline = summarize(samples['off'])['mean_ms']
+        for mode, _, _ in modes:
+            summary = summarize(samples[mode])
+            rows.append({'request': label, 'instrumentation': mode, **summary,
+                         'overhead_us': (summary['mean_ms'] - baseline) * 1000})
+    devnull.close()
+    print_table(rows, ['request', 'instrumentation', 'n', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'overhead_us'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+'''
+Business: Check and benchmark lead delivery through the outbox against a local Telegram stand-in that is slow, rate-limits and fails
+Args: DATABASE_URL of a local Postgres with db_migrations applied; --leads N, --latency-ms, --rate-limit-every, --fail-every
+Returns: submit latency table (inline send vs. outbox) and delivery counts; exits non-zero if any lead is lost or sent twice
+'''
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _bench import load_function, make_event, print_table, require_dsn, summarize
+from telegram_stub import TelegramStub
+
+CHAT_ID = '-100bench'
+
+
+def lead_event(index: int) -> dict:
+    return make_event('POST', body=json.dumps({
+        'name': f'Bench <lead> {index}', 'contactMethod': 'Telegram', 'contact': f'@bench{index}',
+        'service': 'Аренда', 'message': 'Проверка очереди & доставки'
+    }))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--leads', type=int, default=40)
+    parser.add_argument('--latency-ms', type=float, default=300)
+    parser.add_argument('--rate-limit-every', type=int, default=7)
+    parser.add_argument('--fail-every', type=int, default=5)
+    args = parser.parse_args()
+    dsn = require_dsn()
+
+    stub = TelegramStub(latency_ms=args.latency_ms, rate_limit_every=args.rate_limit_every,
+                        retry_after=1, fail_every=args.fail_every)
+    os.environ.update({
+        'TELEGRAM_API_BASE': stub.start(),
+        'TELEGRAM_BOT_TOKEN': 'bench-token',
+        'TELEGRAM_CHAT_ID': CHAT_ID,
+        # Fast retries and no per-chat pacing so the run finishes in seconds
+        'LEAD_OUTBOX_BACKOFF_BASE_SECONDS': '0.2',
+        'TELEGRAM_CHAT_MIN_INTERVAL_SECONDS': '0',
+        'LEAD_INLINE_DRAIN_SECONDS': '0'
+    })
+    submit = load_function('telegram-submit')
+    import db
+    import telegram
+
+    def execute(sql: str) -> list:
+        conn = db.get_connection(dsn)
+        with conn.cursor() as cursor:
+            cursor.execute(sql)
+            rows = cursor.fetchall() if cursor.description else []
+        conn.commit()
+        db.release_connection(conn)
+        return rows
+
+    execute(f"DELETE FROM lead_outbox WHERE chat_id = '{CHAT_ID}'")
+    rows = []
+
+    # Baseline: what the handler used to do, one blocking Bot API call per submit
+    direct = telegram.TelegramClient('bench-token', stub.base_url)
+    samples = []
+    for index in range(args.leads):
+        started = time.perf_counter()
+        try:
+            direct.call('sendMessage', {'chat_id': CHAT_ID, 'text': f'direct {index}'})
+        except telegram.TelegramError:
+            pass
+        samples.append((time.perf_counter() - started) * 1000)
+    rows.append({'mode': 'inline send (old)', **summarize(samples)})
+    stub.sent.clear()
+
+    samples = []
+    for index in range(args.leads):
+        started = time.perf_counter()
+        response = submit.handler(lead_event(index), None)
+        samples.append((time.perf_counter() - started) * 1000)
+        assert response['statusCode'] == 200, response['body']
+    rows.append({'mode': 'outbox enqueue', **summarize(samples)})
+
+    calls_before, connections_before = stub.calls, stub.connections
+    started = time.perf_counter()
+    passes = 0
+    while True:
+        passes += 1
+        submit.drain_outbox(30)
+        pending = execute(f"SELECT count(*) FROM lead_outbox WHERE chat_id = '{CHAT_ID}' AND status <> 'sent'")[0][0]
+        if not pending or passes > 50:
+            break
+        time.sleep(0.3)
+    drain_seconds = time.perf_counter() - started
+
+    print_table(rows, ['mode', 'n', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'])
+    print()
+    texts = [message['text'] for message in stub.sent]
+    delivered = sum(1 for index in range(args.leads) if any(f'@bench{index}\n' in text for text in texts))
+    summary = {
+        'leads': args.leads,
+        'delivered': delivered,
+        'duplicates': len(texts) - len(set(texts)),
+        'api_calls': stub.calls - calls_before,
+        'connections_opened': stub.connections - connections_before,
+        'drain_passes': passes,
+        'drain_seconds': round(drain_seconds, 3),
+        'outbox': dict(execute(f"SELECT status, count(*) FROM lead_outbox WHERE chat_id = '{CHAT_ID}' GROUP BY status"))
+    }
+    print(json.dumps(summary, ensure_ascii=False))
+    execute(f"DELETE FROM lead_outbox WHERE chat_id = '{CHAT_ID}'")
+    stub.stop()
+    if delivered != args.leads or summary['duplicates']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+'''
+Business: Benchmark auth login throughput and legitimate-login latency while a password-guessing burst runs, with the limiter off and on
+Args: DATABASE_URL of a local Postgres with db_migrations applied; --attackers threads, --attempts per attacker, --attack-ips addresses rotated by the attackers
+Returns: table of status counts, seconds spent in password checks (queueing included) and legitimate login latency per scenario; bench users and their attempts are deleted afterwards
+'''
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _bench import load_function, make_event, print_table, require_dsn, summarize
+
+LEGIT_USER = 'bench-legit'
+VICTIM_USER = 'bench-victim'
+PASSWORD = 'bench-password'
+
+
+def login_event(username: str, password: str, ip: str) -> Dict[str, Any]:
+    event = make_event('POST', body=json.dumps({'username': username, 'password': password}))
+    event['requestContext'] = {'identity': {'sourceIp': ip}}
+    return event
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--attackers', type=int, default=8)
+    parser.add_argument('--attempts', type=int, default=25, help='bad logins per attacker thread')
+    parser.add_argument('--attack-ips', type=int, default=4)
+    parser.add_argument('--legit-logins', type=int, default=10)
+    args = parser.parse_args()
+    dsn = require_dsn()
+
+    auth = load_function('auth')
+    import db
+    import limiter
+    import passwords
+
+    def execute(sql: str, params: tuple = ()) -> None:
+        conn = db.get_connection(dsn)
+        with conn.cursor() as cursor:
+            cursor.execute(sql, params)
+        conn.commit()
+        db.release_connection(conn)
+
+    def cleanup() -> None:
+        execute(f"DELETE FROM {limiter.LOGIN_ATTEMPTS_TABLE} WHERE attempt_key LIKE 'user:bench-%%' OR attempt_key LIKE 'ip:10.99.%%'")
+        execute("DELETE FROM t_p37006348_real_estate_agency_w.admin_users WHERE username LIKE 'bench-%%'")
+
+    cleanup()
+    password_hash = passwords.hash_password(PASSWORD)
+    for username in (LEGIT_USER, VICTIM_USER):
+        execute(
+            'INSERT INTO t_p37006348_real_estate_agency_w.admin_users (username, password_hash, email, full_name) '
+            'VALUES (%s, %s, %s, %s)',
+            (username, password_hash, f'{username}@bench.local', username)
+        )
+
+    checked = [0.0]
+    check_lock = threading.Lock()
+    original_check = passwords.check_password
+
+    def timed_check(password: str, stored: Any) -> bool:
+        started = time.perf_counter()
+        try:
+            return original_check(password, stored)
+        finally:
+            with check_lock:
+                checked[0] += time.perf_counter() - started
+
+    # index.py imported the name directly, so patch it where the handler looks it up
+    auth.check_password = timed_check
+
+    scenarios = [
+        ('limiter off', 10 ** 9, 10 ** 9),
+        ('limiter on', limiter.USER_MAX_FAILURES, limiter.IP_MAX_FAILURES)
+    ]
+    rows = []
+    for label, user_limit, ip_limit in scenarios:
+        execute(f"DELETE FROM {limiter.LOGIN_ATTEMPTS_TABLE} WHERE attempt_key LIKE 'user:bench-%%' OR attempt_key LIKE 'ip:10.99.%%'")
+        limiter.locked_cache.clear()
+        limiter.USER_MAX_FAILURES, limiter.IP_MAX_FAILURES = user_limit, ip_limit
+        checked[0] = 0.0
+        statuses: Counter = Counter()
+        status_lock = threading.Lock()
+
+        def attacker(index: int) -> None:
+            for attempt in range(args.attempts):
+                ip = f'10.99.0.{(index + attempt) % args.attack_ips + 1}'
+                response = auth.handler(login_event(VICTIM_USER, f'guess-{index}-{attempt}', ip), None)
+                with status_lock:
+                    statuses[response['statusCode']] += 1
+
+        legit_samples: List[float] = []
+        legit_failed = [0]
+
+        def legit() -> None:
+            for _ in range(args.legit_logins):
+                started = time.perf_counter()
+                response = auth.handler(login_event(LEGIT_USER, PASSWORD, '10.99.1.1'), None)
+                legit_samples.append((time.perf_counter() - started) * 1000)
+                if response['statusCode'] != 200:
+                    legit_failed[0] += 1
+
+        threads = [threading.Thread(target=attacker, args=(i,)) for i in range(args.attackers)]
+        threads.append(threading.Thread(target=legit))
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        attack_total = args.attackers * args.attempts
+        legit_summary = summarize(legit_samples)
+        rows.append({
+            'scenario': label,
+            'attempts': attack_total,
+            'attempts_per_sec': attack_total / elapsed,
+            '401': statuses[401],
+            '429': statuses[429],
+            '503': statuses[503],
+            'check_sec': checked[0],
+            'legit_p50_ms': legit_summary['p50_ms'],
+            'legit_p95_ms': legit_summary['p95_ms'],
+            'legit_failed': legit_failed[0]
+        })
+
+    cleanup()
+    print(f'bcrypt cost {passwords.BCRYPT_ROUNDS}, {passwords.BCRYPT_CONCURRENCY} concurrent checks')
+    print_table(rows, ['scenario', 'attempts', 'attempts_per_sec', '401', '429', '503', 'check_sec',
+                       'legit_p50_ms', 'legit_p95_ms', 'legit_failed'])
+
+
+if __name__ == '__main__':
+    main()
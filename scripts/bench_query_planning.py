@@ -0,0 +1,76 @@
+'''
+Business: Microbenchmark of parse/plan overhead: inlined literals vs. bound parameters vs. prepared statements
+Args: DATABASE_URL of a local Postgres with db_migrations applied; --iterations N; --seed N synthetic rows
+Returns: latency table printed to stdout
+'''
+
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _bench import DISTRICTS, load_function, print_table, require_dsn, seed_properties, summarize, time_calls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0, help='insert this many synthetic listings first')
+    args = parser.parse_args()
+    dsn = require_dsn()
+
+    load_function('properties')
+    import db
+    import queries
+
+    conn = db.get_connection(dsn)
+    if args.seed:
+        seed_properties(conn, args.seed)
+    cursor = conn.cursor()
+    rng = random.Random(42)
+
+    def random_filters():
+        return queries.parse_filters({
+            'district': rng.choice(DISTRICTS),
+            'type': rng.choice(['apartment', 'house', 'commercial']),
+            'min_price': str(rng.randrange(100000, 500000, 1000)),
+            'rooms': str(rng.randint(1, 5))
+        })
+
+    def inlined():
+        # what the handler used to do: values spliced into the SQL text
+        sql, params = queries.build_listing(random_filters(), None, 20)
+        cursor.execute(cursor.mogrify(sql, params))
+        cursor.fetchall()
+
+    def bound():
+        sql, params = queries.build_listing(random_filters(), None, 20)
+        cursor.execute(sql, params)
+        cursor.fetchall()
+
+    def prepared():
+        sql, params = queries.build_listing(random_filters(), None, 20)
+        db.execute_prepared(cursor, sql, params)
+        cursor.fetchall()
+
+    rows = []
+    for label, fn in (('inlined literals', inlined), ('bound, unprepared', bound), ('prepared', prepared)):
+        summary = summarize(time_calls(fn, args.iterations, warmup=20))
+        summary['mode'] = label
+        rows.append(summary)
+    conn.rollback()
+
+    cursor.execute('SET plan_cache_mode = force_custom_plan')
+    sql, params = queries.build_listing(random_filters(), None, 20)
+    cursor.execute('EXPLAIN (ANALYZE, FORMAT JSON) ' + sql, params)
+    plan = cursor.fetchone()[0][0]
+    db.release_connection(conn)
+
+    print_table(rows, ['mode', 'n', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'])
+    print()
+    print(f"single query: planning {plan['Planning Time']:.3f} ms, execution {plan['Execution Time']:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
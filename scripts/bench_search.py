@@ -0,0 +1,65 @@
+'''
+Business: Benchmark free-text catalog search: sequential ILIKE scan vs. trigram indexes vs. ranked full-text search mode
+Args: DATABASE_URL of a local Postgres with db_migrations applied; --seed N synthetic rows (default 100000)
+Returns: latency table printed to stdout
+'''
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _bench import load_function, print_table, require_dsn, seed_properties, summarize, time_calls
+
+QUERIES = ['квартира', 'квартиры с балконом', 'Абовяна', 'евроремонт метро', 'բնակարան', 'пентхаус вид на Арарат', 'кварира']
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--seed', type=int, default=100000, help='insert this many synthetic listings first (0 to skip)')
+    parser.add_argument('--iterations', type=int, default=20, help='runs per query')
+    args = parser.parse_args()
+    dsn = require_dsn()
+
+    load_function('properties')
+    import db
+    import queries
+
+    conn = db.get_connection(dsn)
+    if args.seed:
+        seed_properties(conn, args.seed)
+    cursor = conn.cursor()
+    cursor.execute('ANALYZE properties')
+    conn.commit()
+
+    def run(sql: str, params: list, seqscan_only: bool) -> None:
+        if seqscan_only:
+            cursor.execute('SET LOCAL enable_indexscan = off; SET LOCAL enable_bitmapscan = off')
+        cursor.execute(sql, params)
+        cursor.fetchall()
+        conn.rollback()
+
+    rows = []
+    for text in QUERIES:
+        filters = {'query': text}
+        list_sql, list_params = queries.build_listing(filters, None, 50)
+        search_sql, search_params = queries.build_search(filters, 50)
+        for label, sql, params, seqscan_only in (
+            ('ILIKE, seq scan', list_sql, list_params, True),
+            ('ILIKE, trigram index', list_sql, list_params, False),
+            ('mode=search (ranked)', search_sql, search_params, False),
+        ):
+            summary = summarize(time_calls(lambda: run(sql, params, seqscan_only), args.iterations, warmup=2))
+            cursor.execute(sql, params)
+            summary['hits'] = len(cursor.fetchall())
+            conn.rollback()
+            summary['query'] = text
+            summary['path'] = label
+            rows.append(summary)
+
+    db.release_connection(conn)
+    print_table(rows, ['query', 'path', 'hits', 'p50_ms', 'p95_ms', 'max_ms'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+'''
+Business: Benchmark the catalog serialisation paths (dict rows, tuple rows + converter table, Postgres-built JSON)
+Args: DATABASE_URL of a local Postgres with db_migrations applied; --seed N synthetic rows; --sizes 1000,10000,50000
+Returns: latency and body size table printed to stdout
+'''
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _bench import load_function, print_table, require_dsn, seed_properties, summarize, time_calls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--seed', type=int, default=0, help='insert this many synthetic listings first')
+    parser.add_argument('--sizes', default='1000,10000,50000', help='page sizes (rows) to serialise')
+    parser.add_argument('--iterations', type=int, default=10)
+    args = parser.parse_args()
+    dsn = require_dsn()
+
+    load_function('properties')
+    import db
+    import queries
+    import serializers
+
+    conn = db.get_connection(dsn)
+    if args.seed:
+        seed_properties(conn, args.seed)
+
+    rows = []
+    for size in (int(value) for value in args.sizes.split(',')):
+        sql, params = queries.build_listing({}, None, size + 1)
+        for serializer in serializers.SERIALIZERS:
+            def run():
+                page = serializers.fetch_page(conn, sql, params, queries.LIST_COLUMNS, size, serializer=serializer)
+                conn.rollback()
+                return page
+
+            page = run()
+            summary = summarize(time_calls(run, args.iterations, warmup=1))
+            summary.update({
+                'rows': page.count,
+                'serializer': serializer,
+                'body_kb': len(page.items_json.encode('utf-8')) / 1024,
+                'rows_per_ms': page.count / summary['p50_ms'] if summary['p50_ms'] else 0.0
+            })
+            rows.append(summary)
+
+    db.release_connection(conn)
+    print_table(rows, ['rows', 'serializer', 'p50_ms', 'p95_ms', 'rows_per_ms', 'body_kb'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,338 @@
+'''
+Business: Local HTTP server that runs the backend cloud functions the way the platform does: one event dict per request, warm instances reused, cold starts on demand
+Args: --port; --mode thread (one instance per function shared by --workers threads) or process (--workers processes, each with its own instances); --cold never|idle|always with --idle-timeout; --env KEY=VALUE
+Returns: serves http://127.0.0.1:<port>/<function>/<path>?<query> for every backend/<function>/index.py until interrupted
+'''
+
+import argparse
+import base64
+import concurrent.futures
+import importlib.util
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+import urllib.parse
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+FUNCTION_TIMEOUT_SECONDS = 30.0
+_instance_ids = itertools.count(1)
+_import_lock = threading.Lock()
+
+
+def discover_functions() -> List[str]:
+    return sorted(
+        name for name in os.listdir(BACKEND_DIR)
+        if os.path.isfile(os.path.join(BACKEND_DIR, name, 'index.py'))
+    )
+
+
+class FunctionContext:
+    '''The handler's context argument: request id, function name and the remaining-time budget.'''
+
+    def __init__(self, function_name: str, request_id: str, timeout: float = FUNCTION_TIMEOUT_SECONDS):
+        self.function_name = function_name
+        self.request_id = request_id
+        self.memory_limit_in_mb = 128
+        self._deadline = time.monotonic() + timeout
+
+    def get_remaining_time_in_millis(self) -> int:
+        return max(0, int((self._deadline - time.monotonic()) * 1000))
+
+
+class FunctionInstance:
+    '''
+    One loaded copy of backend/<name>/index.py, like one warm container.
+    Each function vendors its own db.py, cache.py, tokens.py..., so the
+    function's modules are imported into a private namespace: same-named
+    modules of other functions are hidden from sys.modules during the import
+    and this instance's are taken out again afterwards. Module-level state
+    (connection pools, caches) therefore lives and dies with the instance.
+    '''
+
+    def __init__(self, name: str):
+        self.name = name
+        self.instance_id = next(_instance_ids)
+        self.function_dir = os.path.join(BACKEND_DIR, name)
+        self.modules: Dict[str, Any] = {}
+        self.invocations = 0
+        self.in_flight = 0
+        self.last_used = time.monotonic()
+        self.load_ms = 0.0
+        started = time.perf_counter()
+        self.handler = self._load()
+        self.load_ms = (time.perf_counter() - started) * 1000
+
+    def _local_module_names(self) -> List[str]:
+        return [entry[:-3] for entry in os.listdir(self.function_dir) if entry.endswith('.py')]
+
+    def _load(self) -> Any:
+        local_names = self._local_module_names()
+        with _import_lock:
+            hidden = {name: sys.modules.pop(name) for name in local_names if name in sys.modules}
+            sys.path.insert(0, self.function_dir)
+            try:
+                module_name = f'fn_{self.name.replace("-", "_")}_{self.instance_id}'
+                spec = importlib.util.spec_from_file_location(module_name, os.path.join(self.function_dir, 'index.py'))
+                module = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(module)
+                self.modules = {name: sys.modules.pop(name) for name in local_names if name in sys.modules}
+                self.modules['index'] = module
+            finally:
+                sys.path.remove(self.function_dir)
+                sys.modules.update(hidden)
+        return module.handler
+
+    def invoke(self, event: Dict[str, Any], timeout: float = FUNCTION_TIMEOUT_SECONDS) -> Dict[str, Any]:
+        try:
+            context = FunctionContext(self.name, event['requestContext']['requestId'], timeout)
+            return self.handler(event, context)
+        finally:
+            self.invocations += 1
+            self.last_used = time.monotonic()
+
+    def close(self) -> None:
+        '''What the platform's container shutdown amounts to: pooled connections are closed.'''
+        db = self.modules.get('db')
+        if db is not None and hasattr(db, 'close_all'):
+            db.close_all()
+
+
+class InstanceRegistry:
+    '''
+    Warm instances per function for one process. cold='never' keeps the
+    first instance forever, 'idle' replaces it after idle_timeout seconds
+    without requests, 'always' loads a fresh instance for every request.
+    '''
+
+    def __init__(self, cold: str, idle_timeout: float):
+        self.cold = cold
+        self.idle_timeout = idle_timeout
+        self.instances: Dict[str, FunctionInstance] = {}
+        self.cold_starts = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, name: str) -> Tuple[FunctionInstance, bool]:
+        if self.cold == 'always':
+            instance = FunctionInstance(name)
+            instance.in_flight += 1
+            with self._lock:
+                self.cold_starts += 1
+            return instance, True
+        with self._lock:
+            instance = self.instances.get(name)
+            expired = (
+                instance is not None and self.cold == 'idle' and instance.in_flight == 0
+                and time.monotonic() - instance.last_used > self.idle_timeout
+            )
+            if instance is not None and not expired:
+                instance.in_flight += 1
+                return instance, False
+            if expired:
+                instance.close()
+            # Loading under the lock makes concurrent first requests wait for one cold start
+            instance = FunctionInstance(name)
+            self.cold_starts += 1
+            self.instances[name] = instance
+            instance.in_flight += 1
+            return instance, True
+
+    def invoke(self, name: str, event: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        instance, cold = self.acquire(name)
+        started = time.perf_counter()
+        try:
+            response = instance.invoke(event)
+        finally:
+            with self._lock:
+                instance.in_flight -= 1
+            if self.cold == 'always':
+                instance.close()
+        meta = {
+            'cold': cold,
+            'instance': f'{os.getpid()}-{instance.instance_id}',
+            'load_ms': instance.load_ms if cold else 0.0,
+            'handler_ms': (time.perf_counter() - started) * 1000
+        }
+        return response, meta
+
+
+_worker_registry: Optional[InstanceRegistry] = None
+
+
+def _init_worker(cold: str, idle_timeout: float, env: Dict[str, str]) -> None:
+    global _worker_registry
+    os.environ.update(env)
+    _worker_registry = InstanceRegistry(cold, idle_timeout)
+
+
+def _invoke_in_worker(name: str, event: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    return _worker_registry.invoke(name, event)
+
+
+def build_event(method: str, raw_path: str, headers: Dict[str, str], body: bytes, client_ip: str) -> Tuple[str, Dict[str, Any]]:
+    '''Translate one HTTP request into (function name, event) in the platform's event shape.'''
+    parts = urllib.parse.urlsplit(raw_path)
+    segments = parts.path.strip('/').split('/', 1)
+    function_name = segments[0]
+    rest = segments[1] if len(segments) > 1 else ''
+
+    multi_query: Dict[str, List[str]] = {}
+    for key, value in urllib.parse.parse_qsl(parts.query, keep_blank_values=True):
+        multi_query.setdefault(key, []).append(value)
+    path_parameters = {'proxy': rest} if rest else {}
+    if rest and '/' not in rest:
+        path_parameters['id'] = rest
+
+    try:
+        body_text, is_base64 = body.decode('utf-8'), False
+    except UnicodeDecodeError:
+        body_text, is_base64 = base64.b64encode(body).decode('ascii'), True
+
+    event = {
+        'httpMethod': method,
+        'url': raw_path,
+        'path': parts.path,
+        'headers': headers,
+        'queryStringParameters': {key: values[-1] for key, values in multi_query.items()},
+        'multiValueQueryStringParameters': multi_query,
+        'pathParameters': path_parameters,
+        'body': body_text if body else '',
+        'isBase64Encoded': is_base64,
+        'requestContext': {
+            'requestId': str(uuid.uuid4()),
+            'httpMethod': method,
+            'requestTime': time.strftime('%d/%b/%Y:%H:%M:%S +0000', time.gmtime()),
+            'identity': {'sourceIp': client_ip, 'userAgent': headers.get('User-Agent', '')}
+        }
+    }
+    return function_name, event
+
+
+class DevServer:
+    def __init__(self, mode: str, workers: int, cold: str, idle_timeout: float, env: Dict[str, str]):
+        self.mode = mode
+        self.functions = discover_functions()
+        os.environ.update(env)
+        if mode == 'process':
+            self.executor: concurrent.futures.Executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker, initargs=(cold, idle_timeout, env)
+            )
+            self.registry = None
+        else:
+            # Threads share one instance per function, like a container serving concurrent requests
+            self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+            self.registry = InstanceRegistry(cold, idle_timeout)
+
+    def invoke(self, name: str, event: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        if self.registry is not None:
+            future = self.executor.submit(self.registry.invoke, name, event)
+        else:
+            future = self.executor.submit(_invoke_in_worker, name, event)
+        return future.result()
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.registry is not None:
+            for instance in self.registry.instances.values():
+                instance.close()
+
+
+def make_handler(server: DevServer, quiet: bool) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _send(self, status: int, headers: Dict[str, str], body: bytes) -> None:
+            self.send_response(status)
+            for name, value in headers.items():
+                if name.lower() not in ('content-length', 'connection'):
+                    self.send_header(name, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if self.command != 'HEAD':
+                self.wfile.write(body)
+
+        def _dispatch(self) -> None:
+            started = time.perf_counter()
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length) if length else b''
+            name, event = build_event(self.command, self.path, dict(self.headers.items()), body, self.client_address[0])
+            if name not in server.functions:
+                message = json.dumps({'error': f'Unknown function {name!r}', 'functions': server.functions})
+                self._send(404, {'Content-Type': 'application/json'}, message.encode('utf-8'))
+                return
+
+            try:
+                response, meta = server.invoke(name, event)
+            except Exception as e:
+                self._send(502, {'Content-Type': 'application/json'},
+                           json.dumps({'error': f'Handler crashed: {type(e).__name__}: {e}'}).encode('utf-8'))
+                return
+
+            headers = dict(response.get('headers') or {})
+            for header, values in (response.get('multiValueHeaders') or {}).items():
+                headers[header] = ', '.join(values)
+            headers['X-Cold-Start'] = '1' if meta['cold'] else '0'
+            headers['X-Instance'] = meta['instance']
+            headers['X-Handler-Ms'] = f"{meta['handler_ms']:.2f}"
+            raw_body = response.get('body') or ''
+            payload = base64.b64decode(raw_body) if response.get('isBase64Encoded') else raw_body.encode('utf-8')
+            self._send(int(response.get('statusCode', 200)), headers, payload)
+            if not quiet:
+                print(f"{self.command} {self.path} {response.get('statusCode', 200)} "
+                      f"{(time.perf_counter() - started) * 1000:.1f}ms"
+                      + (f" cold(load {meta['load_ms']:.0f}ms)" if meta['cold'] else '')
+                      + f" instance {meta['instance']}", flush=True)
+
+        do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = do_OPTIONS = do_HEAD = _dispatch
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    return Handler
+
+
+def parse_env(pairs: List[str]) -> Dict[str, str]:
+    env = {}
+    for pair in pairs:
+        key, sep, value = pair.partition('=')
+        if not sep:
+            sys.exit(f'--env expects KEY=VALUE, got {pair!r}')
+        env[key] = value
+    return env
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--mode', choices=('thread', 'process'), default='thread')
+    parser.add_argument('--workers', type=int, default=4, help='concurrent invocations (threads or processes)')
+    parser.add_argument('--cold', choices=('never', 'idle', 'always'), default='idle')
+    parser.add_argument('--idle-timeout', type=float, default=300, help='seconds idle before an instance is recycled')
+    parser.add_argument('--env', action='append', default=[], help='KEY=VALUE passed to the functions')
+    parser.add_argument('--quiet', action='store_true')
+    args = parser.parse_args()
+
+    server = DevServer(args.mode, args.workers, args.cold, args.idle_timeout, parse_env(args.env))
+    httpd = ThreadingHTTPServer((args.host, args.port), make_handler(server, args.quiet))
+    httpd.daemon_threads = True
+    base = f'http://{args.host}:{httpd.server_address[1]}'
+    print(f'{args.mode} mode, {args.workers} workers, cold={args.cold}', flush=True)
+    for name in server.functions:
+        print(f'  {base}/{name}', flush=True)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
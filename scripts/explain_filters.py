@@ -0,0 +1,112 @@
+'''
+Business: Run EXPLAIN ANALYZE for every catalog filter combination and report the chosen plan
+Args: DATABASE_URL of a local Postgres with db_migrations applied; --seed N synthetic rows; --verbose for full plans
+Returns: one line per combination with the plan's top node, indexes used and timings
+'''
+
+import argparse
+import itertools
+import json
+import os
+import sys
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _bench import load_function, print_table, require_dsn, seed_properties
+
+FILTER_PARAMS = ['transaction', 'type', 'district', 'price', 'rooms']
+
+
+def _sample_values(cursor: Any) -> Dict[str, str]:
+    cursor.execute(
+        """
+        SELECT transaction_type, property_type, district, COUNT(*) AS n
+        FROM properties WHERE status = 'active'
+        GROUP BY 1, 2, 3 ORDER BY n DESC LIMIT 1
+        """
+    )
+    row = cursor.fetchone()
+    if not row:
+        sys.exit('No active listings; run with --seed N first')
+    cursor.execute("SELECT percentile_cont(0.25) WITHIN GROUP (ORDER BY price), "
+                   "percentile_cont(0.5) WITHIN GROUP (ORDER BY price) FROM properties WHERE status = 'active'")
+    low, high = cursor.fetchone()
+    return {
+        'transaction': row[0], 'type': row[1], 'district': row[2],
+        'min_price': str(low), 'max_price': str(high), 'rooms': '2'
+    }
+
+
+def _walk(node: Dict[str, Any]) -> List[Dict[str, Any]]:
+    nodes = [node]
+    for child in node.get('Plans', []):
+        nodes.extend(_walk(child))
+    return nodes
+
+
+def _describe(plan: Dict[str, Any]) -> Dict[str, Any]:
+    nodes = _walk(plan['Plan'])
+    scans = [n for n in nodes if 'Scan' in n['Node Type']]
+    return {
+        'top_node': plan['Plan']['Node Type'],
+        'scans': ', '.join(sorted({n['Node Type'] + (f" {n['Index Name']}" if 'Index Name' in n else '') for n in scans})),
+        'sort': 'yes' if any(n['Node Type'] in ('Sort', 'Incremental Sort') for n in nodes) else 'no',
+        'planning_ms': plan['Planning Time'],
+        'execution_ms': plan['Execution Time']
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--seed', type=int, default=0, help='insert this many synthetic listings first')
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--verbose', action='store_true', help='print every full JSON plan')
+    args = parser.parse_args()
+    dsn = require_dsn()
+
+    load_function('properties')
+    import db
+    import queries
+
+    conn = db.get_connection(dsn)
+    if args.seed:
+        seed_properties(conn, args.seed)
+    cursor = conn.cursor()
+    # VACUUM sets the visibility map, without which index-only scans never win
+    conn.autocommit = True
+    cursor.execute('VACUUM ANALYZE properties')
+    conn.autocommit = False
+    sample = _sample_values(cursor)
+
+    rows = []
+    for size in range(len(FILTER_PARAMS) + 1):
+        for combination in itertools.combinations(FILTER_PARAMS, size):
+            params = {}
+            for name in combination:
+                if name == 'price':
+                    params['min_price'] = sample['min_price']
+                    params['max_price'] = sample['max_price']
+                else:
+                    params[name] = sample[name]
+            filters = queries.parse_filters(params)
+            for kind, (sql, sql_params) in (
+                ('listing', queries.build_listing(filters, None, args.limit)),
+                ('count', queries.build_count(filters)),
+            ):
+                cursor.execute('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + sql, sql_params)
+                plan = cursor.fetchone()[0][0]
+                if args.verbose:
+                    print(f'-- {kind} {"+".join(combination) or "(none)"}')
+                    print(json.dumps(plan, indent=2))
+                row = _describe(plan)
+                row['filters'] = '+'.join(combination) or '(none)'
+                row['query'] = kind
+                rows.append(row)
+    conn.rollback()
+    db.release_connection(conn)
+
+    print_table(rows, ['filters', 'query', 'top_node', 'scans', 'sort', 'planning_ms', 'execution_ms'])
+
+
+if __name__ == '__main__':
+    main()
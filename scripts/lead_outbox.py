@@ -0,0 +1,50 @@
+'''
+Business: Operate the telegram-submit lead outbox from a shell: show its state, drain it, or requeue dead letters
+Args: stats | drain [--loop SECONDS] | requeue-dead; DATABASE_URL, TELEGRAM_BOT_TOKEN and optionally TELEGRAM_API_BASE from the environment
+Returns: JSON counts on stdout
+'''
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _bench import load_function, require_dsn
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('command', choices=('stats', 'drain', 'requeue-dead'))
+    parser.add_argument('--budget', type=float, default=25, help='seconds per drain pass')
+    parser.add_argument('--loop', type=float, default=0, help='keep draining, sleeping this many seconds between passes')
+    args = parser.parse_args()
+    dsn = require_dsn()
+
+    submit = load_function('telegram-submit')
+    import db
+    import outbox
+
+    if args.command == 'drain':
+        if not os.environ.get('TELEGRAM_BOT_TOKEN'):
+            sys.exit('TELEGRAM_BOT_TOKEN is required to drain')
+        while True:
+            print(submit.drain_outbox(args.budget)['body'], flush=True)
+            if not args.loop:
+                break
+            time.sleep(args.loop)
+        return
+
+    conn = db.get_connection(dsn)
+    try:
+        if args.command == 'requeue-dead':
+            print(json.dumps({'requeued': outbox.requeue_dead(conn)}))
+        else:
+            print(json.dumps(outbox.stats(conn)))
+    finally:
+        db.release_connection(conn)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,445 @@
+'''
+Business: Load test the catalog, auth and lead endpoints over HTTP through the local dev server with a weighted mix of filter, search, detail, login and lead-submit requests against a seeded synthetic catalog
+Args: DATABASE_URL of a local Postgres with db_migrations applied; --rows N to (re)seed the catalog first (0 keeps what is there), --duration, --warmup, --concurrency, --mix filter=50,search=20,detail=20,login=5,lead=5, --url of an already running devserver; or --compare BASE.json NEW.json
+Returns: per-endpoint p50/p95/p99 latency, RPS, errors and cache hits plus DB time from pg_stat_database; each run is saved as JSON (bench_results/ by default) to compare revisions
+'''
+
+import argparse
+import http.client
+import itertools
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _bench import load_function, print_table, require_dsn, summarize
+from seed_catalog import EXTERNAL_ID_PREFIX, seed_catalog, seeded_count
+from telegram_stub import TelegramStub
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.abspath(os.path.join(SCRIPTS_DIR, '..'))
+RESULTS_DIR = os.path.join(REPO_DIR, 'bench_results')
+
+DEFAULT_MIX = {'filter': 50, 'search': 20, 'detail': 20, 'login': 5, 'lead': 5}
+LOGIN_USER = 'bench-loadtest'
+LOGIN_PASSWORD = 'bench-loadtest-password'
+CHAT_ID = '-100loadtest'
+# Phones under +374 00 are not a real operator code, so the run's leads are easy to find and delete
+LEAD_PHONE_PREFIX = '+374 00 '
+
+SEARCH_TERMS = [
+    'квартира', 'студия', 'таунхаус', 'особняк', 'офис', 'магазин', 'помещение', 'евроремонт', 'Арарат',
+    'вид на Арарат', 'балкон', 'парковка', 'метро', 'сад гараж', 'камин', 'первая линия', 'консьерж',
+    'новая мебель', 'Центр', 'Арабкир', 'Нор Норк', 'Маштоца', 'Абовяна', 'Туманяна', 'Комитаса'
+]
+SORTS = ['newest', 'newest', 'price_asc', 'price_desc', 'area_desc', 'price_per_sqm_asc']
+PRICE_BANDS_AMD = {
+    'sale': [(10_000_000, 40_000_000), (30_000_000, 80_000_000), (60_000_000, 200_000_000), (None, 50_000_000)],
+    'rent': [(100_000, 300_000), (200_000, 600_000), (None, 400_000), (500_000, None)]
+}
+LEAD_SERVICES = ['Аренда', 'Покупка', 'Продажа', 'Консультация']
+LEAD_NAMES = ['Анна', 'Арам', 'Мариам', 'Давид', 'Елена', 'Тигран', 'Ольга', 'Карен', 'Нарек', 'Ирина']
+LEAD_MESSAGES = [
+    'Здравствуйте! Интересует этот объект, когда можно посмотреть?',
+    'Актуально ли предложение? Возможен ли торг?',
+    'Ищу квартиру в центре до 500 000 драм в месяц.',
+    'Хочу продать квартиру, нужна оценка.'
+]
+
+
+class Workload:
+    '''Builds the requests of the mix; one per client thread so the random stream is reproducible per seed.'''
+
+    def __init__(self, rng: random.Random, property_ids: List[int], districts: List[str], lead_counter: Any):
+        self.rng = rng
+        self.property_ids = property_ids
+        self.districts = districts
+        self.lead_counter = lead_counter
+
+    def filter(self) -> Tuple[str, str, Optional[dict]]:
+        rng = self.rng
+        query: Dict[str, Any] = {'limit': rng.choice([12, 20, 20, 50])}
+        transaction = rng.choice(['sale', 'rent'])
+        if rng.random() < 0.8:
+            query['transaction'] = transaction
+        if rng.random() < 0.6:
+            query['type'] = rng.choices(['apartment', 'house', 'commercial'], [70, 18, 12])[0]
+        if rng.random() < 0.6:
+            query['district'] = rng.choice(self.districts)
+        if rng.random() < 0.4:
+            low, high = rng.choice(PRICE_BANDS_AMD[transaction])
+            if low:
+                query['min_price'] = low
+            if high:
+                query['max_price'] = high
+        if rng.random() < 0.3:
+            query['rooms'] = rng.choice([1, 2, 2, 3, 3, 4])
+        if rng.random() < 0.3:
+            query['sort'] = rng.choice(SORTS)
+        return 'GET', '/properties?' + urllib.parse.urlencode(query), None
+
+    def search(self) -> Tuple[str, str, Optional[dict]]:
+        query = {'mode': 'search', 'query': self.rng.choice(SEARCH_TERMS), 'limit': 20}
+        return 'GET', '/properties?' + urllib.parse.urlencode(query), None
+
+    def detail(self) -> Tuple[str, str, Optional[dict]]:
+        return 'GET', f'/properties/{self.rng.choice(self.property_ids)}', None
+
+    def login(self) -> Tuple[str, str, Optional[dict]]:
+        return 'POST', '/auth', {'username': LOGIN_USER, 'password': LOGIN_PASSWORD}
+
+    def lead(self) -> Tuple[str, str, Optional[dict]]:
+        rng = self.rng
+        number = next(self.lead_counter)
+        return 'POST', '/telegram-submit', {
+            'name': rng.choice(LEAD_NAMES),
+            'contactMethod': rng.choice(['WhatsApp', 'Telegram', 'Звонок']),
+            'contact': f'{LEAD_PHONE_PREFIX}{number // 1000 % 1000:03d} {number % 1000:03d}',
+            'service': rng.choice(LEAD_SERVICES),
+            'message': rng.choice(LEAD_MESSAGES),
+            'property_id': rng.choice(self.property_ids) if rng.random() < 0.7 else None
+        }
+
+
+def parse_mix(raw: str) -> Dict[str, float]:
+    if not raw:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for pair in raw.split(','):
+        name, _, weight = pair.partition('=')
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            sys.exit(f'--mix: unknown request kind {name!r}, expected {", ".join(DEFAULT_MIX)}')
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            sys.exit(f'--mix expects kind=weight, got {pair!r}')
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def db_snapshot(conn: Any) -> Dict[str, Optional[float]]:
+    '''Cumulative counters of this database; active_time (PG 14+) is the time backends spent executing queries.'''
+    with conn.cursor() as cursor:
+        cursor.execute(
+            'SELECT xact_commit + xact_rollback, blks_hit, blks_read, tup_returned, tup_fetched '
+            'FROM pg_stat_database WHERE datname = current_database()'
+        )
+        row = cursor.fetchone()
+        snapshot = dict(zip(('transactions', 'blks_hit', 'blks_read', 'tup_returned', 'tup_fetched'), row))
+        conn.commit()
+        try:
+            cursor.execute('SELECT active_time FROM pg_stat_database WHERE datname = current_database()')
+            snapshot['active_ms'] = float(cursor.fetchone()[0])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            snapshot['active_ms'] = None
+    return snapshot
+
+
+def git_revision() -> Dict[str, Any]:
+    def git(*args: str) -> str:
+        try:
+            return subprocess.run(['git', *args], cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return ''
+
+    return {
+        'commit': git('rev-parse', 'HEAD'),
+        'subject': git('log', '-1', '--format=%s'),
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no'))
+    }
+
+
+def start_devserver(mode: str, workers: int, env: Dict[str, str]) -> Tuple[subprocess.Popen, str]:
+    command = [sys.executable, os.path.join(SCRIPTS_DIR, 'devserver.py'), '--port', '0', '--mode', mode,
+               '--workers', str(workers), '--cold', 'never', '--quiet']
+    process = subprocess.Popen(command, env={**os.environ, **env}, stdout=subprocess.PIPE, text=True)
+    for line in process.stdout:
+        if line.startswith('  http://'):
+            base = line.strip().rsplit('/', 1)[0]
+            threading.Thread(target=lambda: process.stdout.read(), daemon=True).start()
+            return process, base
+    sys.exit('devserver exited before listening')
+
+
+def stop_devserver(process: subprocess.Popen) -> None:
+    process.send_signal(signal.SIGINT)
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def run_clients(base_url: str, mix: Dict[str, float], workloads: List[Workload], warmup: float,
+                duration: float) -> Tuple[List[Tuple[str, float, int, float, str]], float]:
+    '''
+    Closed loop: each client thread sends its next request as soon as the
+    previous one is answered, over one keep-alive connection. Samples from
+    the warmup seconds are dropped.
+    '''
+    target = urllib.parse.urlsplit(base_url)
+    kinds, weights = list(mix), list(mix.values())
+    measure_from = time.monotonic() + warmup
+    stop_at = measure_from + duration
+    samples: List[Tuple[str, float, int, float, str]] = []
+    samples_lock = threading.Lock()
+
+    def client(workload: Workload) -> None:
+        connection = http.client.HTTPConnection(target.hostname, target.port, timeout=60)
+        local = []
+        while True:
+            now = time.monotonic()
+            if now >= stop_at:
+                break
+            kind = workload.rng.choices(kinds, weights)[0]
+            method, path, body = getattr(workload, kind)()
+            payload = json.dumps(body).encode('utf-8') if body is not None else None
+            headers = {'Content-Type': 'application/json'} if payload else {}
+            started = time.perf_counter()
+            try:
+                connection.request(method, path, body=payload, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+                handler_ms = float(response.getheader('X-Handler-Ms') or 0)
+                cache = response.getheader('X-Cache') or ''
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                status, handler_ms, cache = 0, 0.0, ''
+            elapsed = (time.perf_counter() - started) * 1000
+            if now >= measure_from:
+                local.append((kind, elapsed, status, handler_ms, cache))
+        connection.close()
+        with samples_lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=client, args=(workload,)) for workload in workloads]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, duration
+
+
+def aggregate(samples: List[Tuple[str, float, int, float, str]], seconds: float) -> Dict[str, Any]:
+    def block(rows: List[Tuple[str, float, int, float, str]]) -> Dict[str, Any]:
+        statuses = Counter(row[2] for row in rows)
+        result = {
+            **summarize([row[1] for row in rows]),
+            'rps': len(rows) / seconds,
+            'errors': sum(count for status, count in statuses.items() if status == 0 or status >= 400),
+            'statuses': {str(status): count for status, count in sorted(statuses.items())}
+        }
+        handler = summarize([row[3] for row in rows])
+        result['handler_p50_ms'], result['handler_p95_ms'] = handler['p50_ms'], handler['p95_ms']
+        cached = [row for row in rows if row[4]]
+        if cached:
+            result['cache_hit_ratio'] = sum(1 for row in cached if row[4] == 'HIT') / len(cached)
+        return result
+
+    by_kind: Dict[str, List[Tuple[str, float, int, float, str]]] = {}
+    for row in samples:
+        by_kind.setdefault(row[0], []).append(row)
+    return {
+        'overall': block(samples),
+        'endpoints': {kind: block(rows) for kind, rows in sorted(by_kind.items())}
+    }
+
+
+def db_delta(before: Dict[str, Optional[float]], after: Dict[str, Optional[float]], requests: int) -> Dict[str, Any]:
+    delta = {key: (after[key] - before[key]) if after[key] is not None and before[key] is not None else None
+             for key in before}
+    if delta['active_ms'] is not None and requests:
+        delta['active_ms_per_request'] = delta['active_ms'] / requests
+    return delta
+
+
+def prepare(dsn: str, rows: int, seed: int) -> Tuple[List[int], List[str], Dict[str, Any]]:
+    '''Seed the catalog if asked, create the login user and pick the ids detail and lead requests use.'''
+    import psycopg2
+    load_function('auth')
+    import passwords
+    conn = psycopg2.connect(dsn)
+    try:
+        if rows and seeded_count(conn) != rows:
+            print(f'seeding {rows} listings...', flush=True)
+            seed_catalog(conn, rows, seed)
+        with conn.cursor() as cursor:
+            cursor.execute('DELETE FROM t_p37006348_real_estate_agency_w.admin_users WHERE username = %s', (LOGIN_USER,))
+            cursor.execute(
+                'INSERT INTO t_p37006348_real_estate_agency_w.admin_users (username, password_hash, email, full_name) '
+                'VALUES (%s, %s, %s, %s)',
+                (LOGIN_USER, passwords.hash_password(LOGIN_PASSWORD), f'{LOGIN_USER}@bench.local', LOGIN_USER)
+            )
+            cursor.execute("SELECT id FROM properties WHERE status = 'active' ORDER BY random() LIMIT 5000")
+            property_ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute("SELECT DISTINCT district FROM properties WHERE status = 'active'")
+            districts = [row[0] for row in cursor.fetchall()]
+            cursor.execute(
+                "SELECT count(*), count(*) FILTER (WHERE status = 'active'), "
+                'count(*) FILTER (WHERE external_id LIKE %s) FROM properties', (EXTERNAL_ID_PREFIX + '%',)
+            )
+            total, active, seeded = cursor.fetchone()
+        conn.commit()
+    finally:
+        conn.close()
+    if not property_ids:
+        sys.exit('no active listings to test against; pass --rows to seed some')
+    return property_ids, districts, {'properties': total, 'active': active, 'seeded': seeded}
+
+
+def cleanup(dsn: str) -> None:
+    import limiter
+    import psycopg2
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute('DELETE FROM lead_outbox WHERE chat_id = %s', (CHAT_ID,))
+            cursor.execute('DELETE FROM leads WHERE contact LIKE %s', (LEAD_PHONE_PREFIX + '%',))
+            cursor.execute('DELETE FROM t_p37006348_real_estate_agency_w.admin_users WHERE username = %s', (LOGIN_USER,))
+            cursor.execute(f'DELETE FROM {limiter.LOGIN_ATTEMPTS_TABLE} WHERE attempt_key = %s', ('user:' + LOGIN_USER,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def print_results(result: Dict[str, Any]) -> None:
+    rows = [{'endpoint': kind, **stats} for kind, stats in result['endpoints'].items()]
+    rows.append({'endpoint': 'all', **result['overall']})
+    print_table(rows, ['endpoint', 'n', 'rps', 'errors', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms',
+                       'handler_p50_ms', 'handler_p95_ms', 'cache_hit_ratio'])
+    db = result['db']
+    if db['active_ms'] is not None:
+        print(f"\nDB: {db['active_ms']:.0f} ms executing queries "
+              f"({db.get('active_ms_per_request', 0):.2f} ms per request), {db['transactions']} transactions, "
+              f"{db['blks_read']} blocks read, {db['blks_hit']} cache hits")
+    else:
+        print(f"\nDB: {db['transactions']} transactions, {db['blks_read']} blocks read (no active_time before PG 14)")
+
+
+def compare(base_path: str, new_path: str) -> None:
+    with open(base_path, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)
+    print(f"base {base['revision']['commit'][:10]} {base['revision']['subject']}")
+    print(f"new  {new['revision']['commit'][:10]} {new['revision']['subject']}")
+    if base['dataset'] != new['dataset'] or base['config']['mix'] != new['config']['mix']:
+        print('warning: the runs used different datasets or request mixes')
+    print()
+
+    rows = []
+    endpoints = sorted(set(base['endpoints']) | set(new['endpoints'])) + ['all']
+    for endpoint in endpoints:
+        before = base['overall'] if endpoint == 'all' else base['endpoints'].get(endpoint)
+        after = new['overall'] if endpoint == 'all' else new['endpoints'].get(endpoint)
+        if not before or not after:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'rps', 'errors'):
+            change = (after[metric] - before[metric]) / before[metric] * 100 if before[metric] else None
+            rows.append({'endpoint': endpoint, 'metric': metric, 'base': before[metric], 'new': after[metric],
+                         'change_%': change})
+    if base['db'].get('active_ms_per_request') is not None and new['db'].get('active_ms_per_request') is not None:
+        before, after = base['db']['active_ms_per_request'], new['db']['active_ms_per_request']
+        rows.append({'endpoint': 'db', 'metric': 'active_ms_per_request', 'base': before, 'new': after,
+                     'change_%': (after - before) / before * 100 if before else None})
+    print_table(rows, ['endpoint', 'metric', 'base', 'new', 'change_%'])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=0, help='seed this many synthetic listings first (0: use the current catalog)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--duration', type=float, default=30, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=5, help='seconds of traffic before measuring')
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads')
+    parser.add_argument('--mix', default='', help='kind=weight,... over filter, search, detail, login, lead')
+    parser.add_argument('--url', default='', help='base URL of a running devserver (default: start one)')
+    parser.add_argument('--server-mode', choices=('thread', 'process'), default='process')
+    parser.add_argument('--server-workers', type=int, default=4)
+    parser.add_argument('--telegram-latency-ms', type=float, default=50)
+    parser.add_argument('--output', default='', help='result file (default: bench_results/loadtest-<commit>-<time>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help='compare two saved results and exit')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    dsn = require_dsn()
+    mix = parse_mix(args.mix)
+    property_ids, districts, dataset = prepare(dsn, args.rows, args.seed)
+
+    stub = TelegramStub(latency_ms=args.telegram_latency_ms)
+    server_env = {
+        'DATABASE_URL': dsn,
+        'TELEGRAM_API_BASE': stub.start(),
+        'TELEGRAM_BOT_TOKEN': 'loadtest-token',
+        'TELEGRAM_CHAT_ID': CHAT_ID
+    }
+    process = None
+    base_url = args.url.rstrip('/')
+    if not base_url:
+        process, base_url = start_devserver(args.server_mode, args.server_workers, server_env)
+
+    import psycopg2
+    stats_conn = psycopg2.connect(dsn)
+    counter = itertools.count()
+    workloads = [Workload(random.Random(args.seed * 1000 + index), property_ids, districts, counter)
+                 for index in range(args.concurrency)]
+    started_at = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    try:
+        # Warmup runs as part of the same client loop; counters are read when measuring starts
+        before_holder: Dict[str, Any] = {}
+        timer = threading.Timer(args.warmup, lambda: before_holder.update(db_snapshot(stats_conn)))
+        timer.start()
+        samples, seconds = run_clients(base_url, mix, workloads, args.warmup, args.duration)
+        timer.join()
+    finally:
+        if process:
+            # Backends flush their statistics when their connections close
+            stop_devserver(process)
+        stub.stop()
+    if not process:
+        # Idle backends of an external server report statistics within about 10 seconds
+        time.sleep(11)
+    time.sleep(0.5)
+    after = db_snapshot(stats_conn)
+    stats_conn.close()
+    cleanup(dsn)
+
+    result = {
+        'revision': git_revision(),
+        'started_at': started_at,
+        'config': {
+            'mix': mix, 'duration': args.duration, 'warmup': args.warmup, 'concurrency': args.concurrency,
+            'seed': args.seed, 'server': 'external' if args.url else f'{args.server_mode} x{args.server_workers}',
+            'telegram_latency_ms': args.telegram_latency_ms
+        },
+        'dataset': dataset,
+        **aggregate(samples, seconds)
+    }
+    result['db'] = db_delta(before_holder, after, result['overall']['n'])
+    print_results(result)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"loadtest-{result['revision']['commit'][:10] or 'nogit'}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f'\nsaved {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+'''
+Business: Command-line bulk import/export of properties through the properties function (mode=import / mode=export)
+Args: import FILE | export FILE; --url of the deployed function and --token (or ADMIN_TOKEN), or --local to call the handler in-process with DATABASE_URL
+Returns: import summary with per-line errors on stdout; export writes FILE
+'''
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _bench import admin_token, load_function, make_event, require_dsn
+
+
+def call(args: argparse.Namespace, method: str, query: Dict[str, str], body: Optional[str] = None) -> Tuple[int, str]:
+    headers = {'X-Auth-Token': args.token}
+    if args.local:
+        response = load_function('properties').handler(make_event(method, query, headers, body), None)
+        return response['statusCode'], response['body']
+
+    url = args.url + ('&' if '?' in args.url else '?') + urllib.parse.urlencode(query)
+    request = urllib.request.Request(url, data=body.encode('utf-8') if body is not None else None,
+                                     method=method, headers={**headers, 'Content-Type': 'text/plain; charset=utf-8'})
+    try:
+        with urllib.request.urlopen(request, timeout=args.timeout) as response:
+            return response.status, response.read().decode('utf-8')
+    except urllib.error.HTTPError as e:
+        return e.code, e.read().decode('utf-8')
+
+
+def batches(path: str, fmt: str, batch_lines: int) -> Iterator[Tuple[int, str]]:
+    '''
+    Split the file into request bodies of at most batch_lines records, yielding
+    (line offset, body). CSV batches repeat the header; quoted multi-line CSV
+    cells are kept together by cutting only where csv.reader ends a record.
+    '''
+    with open(path, encoding='utf-8-sig', newline='') as source:
+        if fmt == 'ndjson':
+            chunk: List[str] = []
+            offset = 0
+            for line_no, line in enumerate(source, start=1):
+                chunk.append(line)
+                if len(chunk) >= batch_lines:
+                    yield offset, ''.join(chunk)
+                    offset, chunk = line_no, []
+            if chunk:
+                yield offset, ''.join(chunk)
+            return
+
+        reader = csv.reader(source)
+        header = next(reader, None)
+        if header is None:
+            return
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        writer.writerow(header)
+        offset = 0
+        records = 0
+        for record in reader:
+            writer.writerow(record)
+            records += 1
+            if records >= batch_lines:
+                yield offset, buffer.getvalue()
+                offset = reader.line_num - 1
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerow(header)
+                records = 0
+        if records:
+            yield offset, buffer.getvalue()
+
+
+def run_import(args: argparse.Namespace) -> int:
+    totals: Dict[str, Any] = {'received': 0, 'valid': 0, 'inserted': 0, 'updated': 0, 'error_count': 0}
+    errors: List[Dict[str, Any]] = []
+    query = {'mode': 'import', 'format': args.format}
+    if args.dry_run:
+        query['dry_run'] = '1'
+
+    for offset, body in batches(args.file, args.format, args.batch_lines):
+        status, response_body = call(args, 'POST', query, body)
+        payload = json.loads(response_body)
+        if status != 200:
+            line = payload.get('line')
+            print(f"batch at line {offset + 1}: {payload.get('error')}"
+                  + (f' (line {offset + line})' if line else ''), file=sys.stderr)
+            return 1
+        data = payload['data']
+        for key in totals:
+            totals[key] += data[key]
+        errors.extend({**error, 'line': error['line'] + offset} for error in data['errors'])
+
+    for error in errors:
+        print(f"line {error['line']}: {error['field']}: {error['error']}", file=sys.stderr)
+    print(json.dumps(totals))
+    return 0 if not totals['error_count'] else 2
+
+
+def run_export(args: argparse.Namespace) -> int:
+    query = {'mode': 'export', 'format': args.format}
+    if args.all:
+        query['status'] = 'all'
+    status, body = call(args, 'GET', query)
+    if status != 200:
+        print(body, file=sys.stderr)
+        return 1
+    with open(args.file, 'w', encoding='utf-8', newline='') as target:
+        target.write(body)
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('command', choices=('import', 'export'))
+    parser.add_argument('file')
+    parser.add_argument('--format', choices=('ndjson', 'csv'), help='default: from the file extension')
+    parser.add_argument('--url', default=os.environ.get('PROPERTIES_URL', ''), help='deployed properties function URL')
+    parser.add_argument('--token', default=os.environ.get('ADMIN_TOKEN', ''), help='admin JWT (X-Auth-Token)')
+    parser.add_argument('--local', action='store_true', help='call backend/properties in-process using DATABASE_URL')
+    parser.add_argument('--batch-lines', type=int, default=5000, help='records per import request')
+    parser.add_argument('--dry-run', action='store_true', help='validate and stage without writing')
+    parser.add_argument('--all', action='store_true', help='export inactive listings too')
+    parser.add_argument('--timeout', type=float, default=60)
+    args = parser.parse_args()
+
+    args.format = args.format or ('csv' if args.file.lower().endswith('.csv') else 'ndjson')
+    if not args.local and not args.url:
+        sys.exit('--url (or PROPERTIES_URL) is required unless --local is given')
+    if args.local and not args.token:
+        args.token = admin_token(require_dsn())
+    if not args.token:
+        sys.exit('--token (or ADMIN_TOKEN) is required')
+
+    sys.exit(run_import(args) if args.command == 'import' else run_export(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+'''
+Business: Seed a local Postgres with realistic synthetic Yerevan listings for load tests: district centres from the districts table (V0001), Russian titles and descriptions, prices per district and currency, features and image arrays
+Args: DATABASE_URL of a local Postgres with db_migrations applied; --rows N (1000 to 500000), --seed for a reproducible catalog, --clean to only remove seeded rows
+Returns: seeded row count and timing on stdout; seeded rows carry external_id 'seed:<n>' so they can be removed without touching real listings
+'''
+
+import argparse
+import io
+import json
+import math
+import os
+import random
+import sys
+import time
+import uuid
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _bench import require_dsn
+
+EXTERNAL_ID_PREFIX = 'seed:'
+BATCH_SIZE = 20000
+USD_RATE = 387
+
+# Share of listings and price level per district; unknown names get the defaults
+DISTRICT_WEIGHTS = {'Центр': 18, 'Арабкир': 14, 'Давташен': 8, 'Аджапняк': 8, 'Нор Норк': 9, 'Шенгавит': 8,
+                    'Малатия-Себастия': 8, 'Эребуни': 6, 'Аван': 6, 'Канакер-Зейтун': 4, 'Нубарашен': 3}
+DISTRICT_PRICE_LEVELS = {'Центр': 1.8, 'Арабкир': 1.4, 'Давташен': 1.1, 'Аджапняк': 0.9, 'Нор Норк': 0.95,
+                         'Шенгавит': 0.85, 'Малатия-Себастия': 0.85, 'Эребуни': 0.8, 'Аван': 0.9,
+                         'Канакер-Зейтун': 1.0, 'Нубарашен': 0.6}
+
+STREETS = [
+    'ул. Абовяна', 'пр. Маштоца', 'ул. Туманяна', 'ул. Сарьяна', 'пр. Тиграна Меца', 'ул. Комитаса',
+    'пр. Баграмяна', 'ул. Пушкина', 'ул. Московян', 'ул. Налбандяна', 'ул. Киевян', 'ул. Арами',
+    'ул. Бузанда', 'ул. Вардананц', 'ул. Мамиконянц', 'ул. Азатутян', 'пр. Андраника', 'ул. Гарегина Нжде',
+    'ул. Халабяна', 'ул. Ширакаци', 'пр. Аршакуняц', 'ул. Давид Бека', 'ул. Севана', 'ул. Раффи'
+]
+
+# property_type -> (weight, [(noun, gender)])
+KINDS = {
+    'apartment': (70, [('квартира', 'f')]),
+    'house': (18, [('дом', 'm'), ('коттедж', 'm'), ('особняк', 'm'), ('таунхаус', 'm')]),
+    'commercial': (12, [('офис', 'm'), ('магазин', 'm'), ('помещение', 'n')])
+}
+ADJECTIVES = [
+    {'m': 'светлый', 'f': 'светлая', 'n': 'светлое'},
+    {'m': 'просторный', 'f': 'просторная', 'n': 'просторное'},
+    {'m': 'уютный', 'f': 'уютная', 'n': 'уютное'},
+    {'m': 'отремонтированный', 'f': 'отремонтированная', 'n': 'отремонтированное'},
+    {'m': 'новый', 'f': 'новая', 'n': 'новое'}
+]
+# (log-mean area m², sigma, min, max)
+AREAS = {'apartment': (70, 0.35, 20, 300), 'house': (180, 0.4, 60, 800), 'commercial': (120, 0.7, 15, 2000)}
+# AMD per m² at price level 1.0: sale price, monthly rent
+PRICE_PER_SQM = {
+    'apartment': (450000, 3000), 'house': (360000, 2200), 'commercial': (540000, 4500)
+}
+
+FEATURES = {
+    'apartment': ['Мебель', 'Кондиционер', 'Балкон', 'Интернет', 'Парковка', 'Лифт', 'Телевизор', 'Холодильник',
+                  'Стиральная машина', 'Посудомоечная машина', 'Водонагреватель', 'Вид на Арарат', 'Охрана',
+                  'Консьерж', 'Подземная парковка', 'Евроремонт', 'Центральное отопление'],
+    'house': ['Мебель', 'Кондиционер', 'Сад', 'Гараж', 'Бассейн', 'Камин', 'Барбекю', 'Интернет', 'Охрана',
+              'Газ', 'Водонагреватель', 'Вид на Арарат', 'Терраса'],
+    'commercial': ['Отдельный вход', 'Витрина', 'Парковка', 'Кондиционер', 'Интернет', 'Охрана', 'Лифт',
+                   'Первая линия', 'Санузел', 'Склад']
+}
+BADGES = ['Новое', 'Горячее предложение', 'Эксклюзив', 'Снижена цена', 'Без комиссии']
+
+SENTENCES = {
+    'any': [
+        'Рядом школа, детский сад, супермаркет и остановка.',
+        'До метро {minutes} минут пешком.',
+        'Из окон открывается вид на Арарат.',
+        'Окна выходят во двор, тихо.',
+        'Центральное отопление, газ и круглосуточная вода.',
+        'Удобная транспортная развязка, до центра {minutes} минут.',
+        'Во дворе детская площадка и парковка.'
+    ],
+    'apartment': [
+        'Квартира площадью {area} м² на {floor} этаже {total_floors}-этажного дома.',
+        'Евроремонт, новая мебель и бытовая техника.',
+        'Два балкона, кухня-гостиная, отдельный санузел.',
+        'Подходит для семьи с детьми.',
+        'В доме лифт и консьерж.'
+    ],
+    'house': [
+        'Дом площадью {area} м², участок {plot} соток.',
+        'Плодовый сад, гараж на две машины.',
+        'Камин в гостиной, терраса с видом на горы.',
+        'Тихая улица частного сектора.'
+    ],
+    'commercial': [
+        'Помещение площадью {area} м² на первой линии.',
+        'Высокая проходимость, отдельный вход с улицы.',
+        'Подходит под офис, магазин или салон.',
+        'Витринные окна, электричество 30 кВт.'
+    ],
+    'sale': ['Документы готовы к сделке.', 'Возможен торг.', 'Возможна ипотека.'],
+    'rent': ['Оплата помесячно, депозит за один месяц.', 'Можно с домашними животными.',
+             'Минимальный срок аренды — полгода.']
+}
+
+COLUMNS = [
+    'external_id', 'title', 'description', 'property_type', 'transaction_type', 'price', 'currency', 'area',
+    'rooms', 'bedrooms', 'bathrooms', 'floor', 'total_floors', 'year_built', 'district', 'address',
+    'street_name', 'house_number', 'apartment_number', 'latitude', 'longitude', 'features', 'images',
+    'is_new_building', 'badges', 'status', 'created_at', 'updated_at'
+]
+
+
+def load_districts(conn: Any) -> List[Tuple[str, float, float]]:
+    '''(name_ru, centre lat, centre lng) per district; V0001 lists Канакер-Зейтун twice, once per spelling.'''
+    with conn.cursor() as cursor:
+        cursor.execute('SELECT DISTINCT ON (name_ru) name_ru, center_lat, center_lng FROM districts ORDER BY name_ru, id')
+        rows = [(name, float(lat), float(lng)) for name, lat, lng in cursor.fetchall()]
+    conn.rollback()
+    if not rows:
+        sys.exit('the districts table is empty; apply db_migrations first')
+    return rows
+
+
+def _pg_array(values: List[str]) -> str:
+    return '{' + ','.join('"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"' for value in values) + '}'
+
+
+def generate_listing(rng: random.Random, index: int, districts: List[Tuple[str, float, float]],
+                     now: float) -> Dict[str, Any]:
+    district, centre_lat, centre_lng = rng.choices(districts, [DISTRICT_WEIGHTS.get(d[0], 5) for d in districts])[0]
+    level = DISTRICT_PRICE_LEVELS.get(district, 1.0)
+    property_type = rng.choices(list(KINDS), [weight for weight, _ in KINDS.values()])[0]
+    transaction_type = 'sale' if rng.random() < 0.55 else 'rent'
+
+    mean, sigma, low, high = AREAS[property_type]
+    area = round(min(high, max(low, rng.lognormvariate(math.log(mean), sigma))), 1)
+    noun, gender = rng.choice(KINDS[property_type][1])
+    if property_type == 'apartment':
+        rooms = max(1, min(6, round(area / 28)))
+        total_floors = rng.choice([4, 5, 9, 9, 10, 12, 14, 16, 18, 20])
+        floor = rng.randint(1, total_floors)
+        if rooms == 1 and area < 40:
+            noun = 'студия'
+    elif property_type == 'house':
+        rooms = max(2, min(10, round(area / 35)))
+        total_floors = rng.choice([1, 2, 2, 3])
+        floor = 1
+    else:
+        rooms = max(1, round(area / 40))
+        total_floors = rng.choice([1, 2, 5, 9, 12])
+        floor = rng.choice([1, 1, 1, 2, total_floors])
+    is_new_building = property_type == 'apartment' and rng.random() < 0.3
+    year_built = rng.randint(2018, 2026) if is_new_building else rng.randint(1950, 2017)
+
+    sale_sqm, rent_sqm = PRICE_PER_SQM[property_type]
+    price_amd = area * (sale_sqm if transaction_type == 'sale' else rent_sqm) * level * rng.lognormvariate(0, 0.2)
+    if rng.random() < (0.65 if transaction_type == 'sale' else 0.3):
+        currency, price = 'USD', round(price_amd / USD_RATE, -3 if transaction_type == 'sale' else -1)
+    else:
+        currency, price = 'AMD', round(price_amd, -4)
+
+    street = rng.choice(STREETS)
+    house_number = str(rng.randint(1, 140)) + rng.choice(['', '', '', '/1', '/2', 'а'])
+    apartment_number = str(rng.randint(1, 4 * total_floors)) if property_type == 'apartment' else None
+
+    if noun == 'квартира':
+        noun = f'{rooms}-комнатная квартира'
+    adjective = rng.choice(ADJECTIVES)[gender] + ' ' if rng.random() < 0.5 else ''
+    verb = 'Продаётся' if transaction_type == 'sale' else 'Сдаётся'
+    title = f'{verb} {adjective}{noun}, {district}'
+
+    values = {'area': area, 'floor': floor, 'total_floors': total_floors, 'minutes': rng.randint(3, 20),
+              'plot': rng.randint(3, 15)}
+    pool = SENTENCES[property_type] + SENTENCES['any'] + SENTENCES[transaction_type]
+    sentences = [SENTENCES[property_type][0]] + rng.sample(pool[1:], rng.randint(3, 7))
+    description = ' '.join(sentence.format(**values) for sentence in sentences)
+
+    features = rng.sample(FEATURES[property_type], rng.randint(2, min(9, len(FEATURES[property_type]))))
+    images = [f'https://wse.am/img/{uuid.UUID(int=rng.getrandbits(128), version=4)}.jpg'
+              for _ in range(rng.choices([0, 1, 3, 6, 10, 15], [2, 8, 25, 35, 20, 10])[0])]
+    badges = rng.sample(BADGES, 1) if rng.random() < 0.15 else []
+
+    # Listings age over two years, newer ones more likely; a few are unpublished
+    created_at = now - min(730, rng.expovariate(1 / 120)) * 86400
+    updated_at = created_at + rng.random() * (now - created_at) if rng.random() < 0.3 else created_at
+    return {
+        'external_id': f'{EXTERNAL_ID_PREFIX}{index}',
+        'title': title,
+        'description': description,
+        'property_type': property_type,
+        'transaction_type': transaction_type,
+        'price': price,
+        'currency': currency,
+        'area': area,
+        'rooms': rooms,
+        'bedrooms': max(1, rooms - 1) if property_type != 'commercial' else 0,
+        'bathrooms': 1 + (area > 110) + (area > 200),
+        'floor': floor,
+        'total_floors': total_floors,
+        'year_built': year_built,
+        'district': district,
+        'address': f'{street}, {house_number}',
+        'street_name': street,
+        'house_number': house_number,
+        'apartment_number': apartment_number,
+        'latitude': round(centre_lat + rng.gauss(0, 0.008), 6),
+        'longitude': round(centre_lng + rng.gauss(0, 0.01), 6),
+        'features': features,
+        'images': images,
+        'is_new_building': is_new_building,
+        'badges': badges,
+        'status': 'active' if rng.random() < 0.95 else 'inactive',
+        'created_at': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(created_at)),
+        'updated_at': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(updated_at))
+    }
+
+
+def _copy_row(listing: Dict[str, Any]) -> str:
+    fields = []
+    for column in COLUMNS:
+        value = listing[column]
+        if value is None:
+            fields.append('\\N')
+            continue
+        if isinstance(value, list):
+            value = _pg_array(value)
+        elif isinstance(value, bool):
+            value = 't' if value else 'f'
+        text = str(value)
+        fields.append(text.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n'))
+    return '\t'.join(fields) + '\n'
+
+
+def clean_catalog(conn: Any) -> int:
+    with conn.cursor() as cursor:
+        cursor.execute('DELETE FROM properties WHERE external_id LIKE %s', (EXTERNAL_ID_PREFIX + '%',))
+        deleted = cursor.rowcount
+    conn.commit()
+    return deleted
+
+
+def seeded_count(conn: Any) -> int:
+    with conn.cursor() as cursor:
+        cursor.execute('SELECT count(*) FROM properties WHERE external_id LIKE %s', (EXTERNAL_ID_PREFIX + '%',))
+        count = cursor.fetchone()[0]
+    conn.rollback()
+    return count
+
+
+def seed_catalog(conn: Any, rows: int, seed: int = 1, batch_size: int = BATCH_SIZE) -> None:
+    '''
+    Replace the seeded listings with rows new ones, COPYed in batches so the
+    per-row triggers (price_amd, search_vector) run as they do for real
+    inserts. The same seed produces the same catalog.
+    '''
+    rng = random.Random(seed)
+    districts = load_districts(conn)
+    now = time.time()
+    clean_catalog(conn)
+    for start in range(0, rows, batch_size):
+        buffer = io.StringIO()
+        for index in range(start, min(rows, start + batch_size)):
+            buffer.write(_copy_row(generate_listing(rng, index, districts, now)))
+        buffer.seek(0)
+        with conn.cursor() as cursor:
+            cursor.copy_expert(f"COPY properties ({', '.join(COLUMNS)}) FROM STDIN", buffer)
+        conn.commit()
+    with conn.cursor() as cursor:
+        cursor.execute('ANALYZE properties')
+    conn.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--clean', action='store_true', help='only delete previously seeded rows')
+    args = parser.parse_args()
+
+    import psycopg2
+    conn = psycopg2.connect(require_dsn())
+    try:
+        started = time.perf_counter()
+        if args.clean:
+            print(json.dumps({'deleted': clean_catalog(conn)}))
+            return
+        seed_catalog(conn, args.rows, args.seed, args.batch_size)
+        print(json.dumps({'rows': seeded_count(conn), 'seconds': round(time.perf_counter() - started, 1)}))
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+'''
+Business: Local stand-in for the Telegram Bot API (sendMessage only) to exercise lead delivery without a real bot
+Args: --port; --rate-limit-every N answers every Nth call with 429 and --retry-after; --fail-every N answers with 502; --latency-ms per call
+Returns: serves http://127.0.0.1:<port> until interrupted; set TELEGRAM_API_BASE to it. Received messages are logged to stdout
+'''
+
+import argparse
+import json
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+
+class TelegramStub:
+    '''
+    Server state shared by request threads; usable in-process by scripts
+    (start() returns the base URL, sent holds the delivered messages).
+    '''
+
+    def __init__(self, port: int = 0, rate_limit_every: int = 0, retry_after: int = 1,
+                 fail_every: int = 0, latency_ms: float = 0.0, verbose: bool = False):
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.fail_every = fail_every
+        self.latency_ms = latency_ms
+        self.verbose = verbose
+        self.calls = 0
+        self.connections = 0
+        self.sent: List[Dict[str, str]] = []
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def start(self) -> str:
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def respond(self, path: str, form: Dict[str, str]) -> tuple:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        if not path.endswith('/sendMessage') or '/bot' not in path:
+            return 404, {'ok': False, 'error_code': 404, 'description': 'Not Found'}
+        if self.rate_limit_every and call % self.rate_limit_every == 0:
+            return 429, {'ok': False, 'error_code': 429,
+                         'description': f'Too Many Requests: retry after {self.retry_after}',
+                         'parameters': {'retry_after': self.retry_after}}
+        if self.fail_every and call % self.fail_every == 0:
+            return 502, {'ok': False, 'error_code': 502, 'description': 'Bad Gateway'}
+        if not form.get('chat_id') or not form.get('text'):
+            return 400, {'ok': False, 'error_code': 400, 'description': 'Bad Request: message text is empty'}
+        with self._lock:
+            self.sent.append(form)
+            message_id = len(self.sent)
+        if self.verbose:
+            print(json.dumps({'chat_id': form['chat_id'], 'message_id': message_id, 'text': form['text']},
+                             ensure_ascii=False), flush=True)
+        return 200, {'ok': True, 'result': {'message_id': message_id, 'chat': {'id': form['chat_id']},
+                                            'date': int(time.time()), 'text': form['text']}}
+
+    def _handler_class(self) -> type:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self) -> None:
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get('Content-Length') or 0)
+                form = dict(urllib.parse.parse_qsl(self.rfile.read(length).decode('utf-8')))
+                status, payload = stub.respond(self.path, form)
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                if status == 429:
+                    self.send_header('Retry-After', str(stub.retry_after))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--rate-limit-every', type=int, default=0)
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--fail-every', type=int, default=0)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    args = parser.parse_args()
+
+    stub = TelegramStub(args.port, args.rate_limit_every, args.retry_after, args.fail_every, args.latency_ms,
+                        verbose=True)
+    print(f'Telegram stub on {stub.base_url} (export TELEGRAM_API_BASE={stub.base_url})', flush=True)
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub.server.server_close()
+
+
+if __name__ == '__main__':
+    main()
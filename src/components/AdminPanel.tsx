@@ -175,7 +175,7 @@ const AdminPanel: React.FC = () => {
 
   const checkForDuplicates = async (street: string, house: string, apartment: string, transactionType: string, currentId?: number) => {
     try {
-      const response = await Properties.list();
+      const response = await Properties.listAll();
       const properties = (response.properties || []) as Property[];
       return properties.filter(p => 
         p.street_name?.toLowerCase() === street.toLowerCase() &&
@@ -17,8 +17,8 @@ export default function MapPreview({ t, isVisible }: MapPreviewProps) {
   useEffect(() => {
     const loadPreviewData = async () => {
       try {
-        const response = await Properties.list();
-        const props = (response.properties || []).slice(0, 10);
+        const response = await Properties.list('limit=10');
+        const props = response.properties || [];
         console.log('MapPreview: Loaded properties:', props.length, props);
         setPreviewProperties(props);
       } catch (err) {
@@ -60,7 +60,7 @@ const PropertyList: React.FC<PropertyListProps> = ({ onEdit, onDelete, refetchTr
     setLoading(true);
     setError('');
     try {
-      const response = await Properties.list();
+      const response = await Properties.listAll();
       setProperties((response.properties || []) as Property[]);
     } catch (err: any) {
       console.error('Error loading properties:', err);
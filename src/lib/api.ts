@@ -70,6 +70,12 @@ export const Auth = {
   logout: () => {
     localStorage.removeItem('admin_token');
     return Promise.resolve();
+  },
+
+  // revokes every token issued to the current user, on all devices
+  logoutEverywhere: async () => {
+    await api<void>(BACKEND_URLS.auth, { method: 'DELETE' });
+    localStorage.removeItem('admin_token');
   }
 };
 
@@ -81,6 +87,9 @@ export interface Property {
   transaction_type: string;
   price: number;
   currency: string;
+  // set when the list was requested with currency=: price/currency are converted
+  original_price?: number;
+  original_currency?: string;
   area: number;
   rooms: number;
   bedrooms: number;
@@ -109,6 +118,63 @@ export interface Property {
 export interface PropertyListResponse {
   properties: Property[];
   count: number;
+  next_cursor: string | null;
+}
+
+export interface MapPoint {
+  id: number;
+  lat: number;
+  lng: number;
+  price: number;
+  type: string;
+}
+
+export interface MapPointsResponse {
+  points: MapPoint[];
+  count: number;
+  truncated: boolean;
+}
+
+export interface MapCluster {
+  lat: number;
+  lng: number;
+  count: number;
+  min_price: number;
+  median_price: number;
+  id: number | null;
+}
+
+export interface MapClustersResponse {
+  clusters: MapCluster[];
+  count: number;
+  zoom: number;
+}
+
+export interface FacetOption {
+  value: string;
+  count: number;
+}
+
+export interface PriceBin {
+  from: number;
+  to: number;
+  count: number;
+}
+
+export interface PropertyFacetsResponse {
+  facets: {
+    district: FacetOption[];
+    property_type: FacetOption[];
+    transaction_type: FacetOption[];
+    rooms: FacetOption[];
+    price: PriceBin[];
+  };
+  count: number;
+}
+
+export interface BatchUpdateResponse {
+  updated: number;
+  results: { id: number; ok: boolean; error?: string }[];
 }
 
 export const Properties = {
@@ -116,6 +182,45 @@ export const Properties = {
     return api<PropertyListResponse>(BACKEND_URLS.properties + (query ? `?${query}` : ''));
   },
   
+  listAll: async (query = '') => {
+    const params = new URLSearchParams(query);
+    params.set('limit', '100');
+    const first = await Properties.list(params.toString());
+    const properties = [...first.properties];
+    let cursor = first.next_cursor;
+    
+    while (cursor) {
+      params.set('cursor', cursor);
+      const page = await Properties.list(params.toString());
+      properties.push(...page.properties);
+      cursor = page.next_cursor;
+    }
+    
+    return { properties, count: first.count, next_cursor: null } as PropertyListResponse;
+  },
+  
+  // bbox is Leaflet's toBBoxString(): "west,south,east,north"
+  map: async (bbox: string, query = '') => {
+    const params = new URLSearchParams(query);
+    params.set('mode', 'map');
+    params.set('bbox', bbox);
+    return api<MapPointsResponse>(`${BACKEND_URLS.properties}?${params.toString()}`);
+  },
+  
+  clusters: async (bbox: string, zoom: number, query = '') => {
+    const params = new URLSearchParams(query);
+    params.set('mode', 'clusters');
+    params.set('bbox', bbox);
+    params.set('zoom', String(zoom));
+    return api<MapClustersResponse>(`${BACKEND_URLS.properties}?${params.toString()}`);
+  },
+  
+  facets: async (query = '') => {
+    const params = new URLSearchParams(query);
+    params.set('mode', 'facets');
+    return api<PropertyFacetsResponse>(`${BACKEND_URLS.properties}?${params.toString()}`);
+  },
+  
   get: async (id: number) => {
     return api<Property>(`${BACKEND_URLS.properties}?id=${id}`);
   },
@@ -134,6 +239,13 @@ export const Properties = {
     });
   },
   
+  batchUpdate: async (patches: { id: number; fields: Partial<Property> }[]) => {
+    return api<BatchUpdateResponse>(BACKEND_URLS.properties, {
+      method: 'PATCH',
+      body: JSON.stringify({ patches })
+    });
+  },
+  
   remove: async (id: number) => {
     return api<{ message: string }>(`${BACKEND_URLS.properties}?id=${id}`, {
       method: 'DELETE'
@@ -147,12 +259,55 @@ export interface TelegramSubmission {
   contact: string;
   service: string;
   message: string;
+  property_id?: number;
+}
+
+export interface Lead {
+  id: number;
+  name: string;
+  contact_method: string | null;
+  contact: string;
+  service: string | null;
+  message: string | null;
+  property_id: number | null;
+  // repeat submits from the same contact within the dedup window
+  submit_count: number;
+  created_at: string;
+  last_submitted_at: string;
+}
+
+export interface LeadFilters {
+  q?: string;
+  contact?: string;
+  service?: string;
+  contact_method?: string;
+  property_id?: number;
+  since?: string;
+  until?: string;
+  limit?: number;
+  cursor?: string;
+}
+
+export interface LeadsResponse {
+  leads: Lead[];
+  next_cursor: string | null;
 }
 
 export const Telegram = {
   submit: (data: TelegramSubmission) =>
-    api<{ success: true; message: string }>(BACKEND_URLS.telegramSubmit, {
+    api<{ success: true; message: string; delivered?: boolean; duplicate?: boolean }>(BACKEND_URLS.telegramSubmit, {
       method: 'POST',
       body: JSON.stringify(data)
     })
+};
+
+export const Leads = {
+  list: (filters: LeadFilters = {}) => {
+    const params = new URLSearchParams();
+    Object.entries(filters).forEach(([key, value]) => {
+      if (value !== undefined && value !== '') params.append(key, String(value));
+    });
+    const query = params.toString();
+    return api<LeadsResponse>(`${BACKEND_URLS.telegramSubmit}${query ? `?${query}` : ''}`);
+  }
 };
\ No newline at end of file
@@ -35,7 +35,7 @@ const FullMapPage: React.FC = () => {
     setError('');
 
     try {
-      const response = await Properties.list();
+      const response = await Properties.listAll();
       const props = (response.properties || []) as Property[];
       setAllProperties(props);
     } catch (err: any) {
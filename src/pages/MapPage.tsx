@@ -44,7 +44,7 @@ const MapPage: React.FC = () => {
     setError('');
 
     try {
-      const response = await Properties.list();
+      const response = await Properties.listAll();
       const props = (response.properties || []) as Property[];
       const propsWithDates = props.map(p => ({
         ...p,
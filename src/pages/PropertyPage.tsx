@@ -106,7 +106,7 @@ export default function PropertyPage() {
     setLoading(true);
 
     try {
-      const response = await Properties.list();
+      const response = await Properties.listAll();
       const props = (response.properties || []) as Property[];
       const propsWithDates = props.map(p => ({
         ...p,
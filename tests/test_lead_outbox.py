@@ -0,0 +1,173 @@
+'''
+Business: Checks for the telegram-submit lead outbox: drain() against scripts/telegram_stub.py and concurrent claims
+Args: DATABASE_URL of a Postgres with db_migrations applied (skipped without it); run with python -m unittest discover tests
+Returns: unittest results; the outbox rows a test creates are deleted afterwards
+'''
+
+import os
+import sys
+import threading
+import time
+import unittest
+import uuid
+from unittest import mock
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'telegram-submit'))
+import psycopg2
+import outbox
+from telegram import TelegramClient
+from telegram_stub import TelegramStub
+
+DSN = os.environ.get('DATABASE_URL')
+
+
+@unittest.skipUnless(DSN, 'DATABASE_URL is not set')
+class DrainTest(unittest.TestCase):
+    stub_options = {}
+
+    def setUp(self) -> None:
+        self.stub = TelegramStub(**self.stub_options)
+        self.client = TelegramClient('test-token', api_base=self.stub.start(), timeout=2)
+        self.conn = psycopg2.connect(DSN)
+        # Unique per test, so chat pacing left over from another test does not apply
+        self.chat_id = f'test:{uuid.uuid4().hex[:12]}'
+        self.ids = []
+
+    def tearDown(self) -> None:
+        self.client.close()
+        self.stub.stop()
+        self.conn.rollback()
+        self.conn.cursor().execute('DELETE FROM lead_outbox WHERE chat_id = %s', (self.chat_id,))
+        self.conn.commit()
+        self.conn.close()
+
+    def enqueue(self, count: int = 1) -> None:
+        for index in range(count):
+            self.ids.append(outbox.enqueue(self.conn, self.chat_id, {'text': f'lead {index}'}))
+
+    def drain(self, budget: float = 2.0) -> dict:
+        return outbox.drain(self.conn, self.client, time.monotonic() + budget, ids=self.ids)
+
+    def rows(self) -> dict:
+        cursor = self.conn.cursor()
+        cursor.execute(
+            'SELECT id, status, attempts, last_error, extract(epoch FROM next_attempt_at - CURRENT_TIMESTAMP) '
+            'FROM lead_outbox WHERE id = ANY(%s)', (self.ids,)
+        )
+        rows = {row[0]: row[1:] for row in cursor.fetchall()}
+        self.conn.rollback()
+        return rows
+
+    def make_due(self) -> None:
+        self.conn.cursor().execute('UPDATE lead_outbox SET next_attempt_at = CURRENT_TIMESTAMP WHERE id = ANY(%s)', (self.ids,))
+        self.conn.commit()
+
+
+class SendTest(DrainTest):
+    def test_sends_and_marks_sent(self) -> None:
+        self.enqueue(2)
+        with mock.patch.object(outbox, 'CHAT_MIN_INTERVAL_SECONDS', 0.01):
+            counts = self.drain()
+        self.assertEqual(counts['sent'], 2)
+        self.assertEqual(sorted(counts['sent_ids']), sorted(self.ids))
+        self.assertEqual([form['text'] for form in self.stub.sent], ['lead 0', 'lead 1'])
+        self.assertTrue(all(row[0] == 'sent' for row in self.rows().values()))
+
+    def test_chat_is_paced(self) -> None:
+        self.enqueue(2)
+        started = time.monotonic()
+        with mock.patch.object(outbox, 'CHAT_MIN_INTERVAL_SECONDS', 0.3):
+            counts = self.drain()
+        self.assertEqual(counts['sent'], 2)
+        self.assertGreaterEqual(time.monotonic() - started, 0.3)
+
+
+class RateLimitTest(DrainTest):
+    stub_options = {'rate_limit_every': 1, 'retry_after': 7}
+
+    def test_429_pauses_the_chat_without_spending_attempts(self) -> None:
+        self.enqueue(2)
+        counts = self.drain()
+        self.assertEqual(counts['rate_limited'], 1)
+        # the second message would have to wait past the deadline: released untouched
+        self.assertEqual(counts['released'], 1)
+        self.assertEqual(self.stub.calls, 1)
+        self.assertGreater(outbox._chat_paused_until[self.chat_id] - time.monotonic(), 5)
+        for status, attempts, last_error, due_in in self.rows().values():
+            self.assertEqual((status, attempts), ('pending', 0))
+            self.assertGreater(due_in, 5)
+
+
+class FailureTest(DrainTest):
+    stub_options = {'fail_every': 1}
+
+    def test_5xx_backs_off_then_dead_letters(self) -> None:
+        self.enqueue()
+        with mock.patch.object(outbox, 'MAX_ATTEMPTS', 2):
+            counts = self.drain()
+            self.assertEqual(counts['retried'], 1)
+            status, attempts, last_error, due_in = self.rows()[self.ids[0]]
+            self.assertEqual((status, attempts), ('pending', 1))
+            self.assertIn('502', last_error)
+            self.assertGreater(due_in, 1)
+
+            # not due yet: nothing is claimed
+            self.assertEqual(self.drain()['retried'], 0)
+            self.make_due()
+            counts = self.drain()
+        self.assertEqual(counts['dead'], 1)
+        self.assertEqual(self.rows()[self.ids[0]][:2], ('dead', 2))
+        self.assertEqual(self.stub.calls, 2)
+
+    def test_retry_succeeds_once_telegram_recovers(self) -> None:
+        self.enqueue()
+        self.drain()
+        self.stub.fail_every = 0
+        self.make_due()
+        self.assertEqual(self.drain()['sent'], 1)
+        self.assertEqual(self.rows()[self.ids[0]][:2], ('sent', 2))
+
+
+class ClaimTest(DrainTest):
+    def test_concurrent_claimers_take_disjoint_rows(self) -> None:
+        self.enqueue(20)
+        barrier = threading.Barrier(2)
+        claimed = []
+
+        def claimer() -> None:
+            conn = psycopg2.connect(DSN)
+            try:
+                barrier.wait()
+                claimed.append([row['id'] for row in outbox.claim(conn, 20, self.ids)])
+            finally:
+                conn.close()
+
+        threads = [threading.Thread(target=claimer) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        first, second = claimed
+        self.assertFalse(set(first) & set(second))
+        self.assertEqual(sorted(first + second), sorted(self.ids))
+
+    def test_locked_row_is_skipped_not_waited_for(self) -> None:
+        self.enqueue(3)
+        locker = psycopg2.connect(DSN)
+        claimer = psycopg2.connect(DSN)
+        try:
+            locker.cursor().execute('SELECT id FROM lead_outbox WHERE id = %s FOR UPDATE', (self.ids[0],))
+            claimer.cursor().execute("SET statement_timeout = '2s'")
+            claimer.commit()
+            rows = outbox.claim(claimer, 10, self.ids)
+            self.assertEqual([row['id'] for row in rows], self.ids[1:])
+        finally:
+            locker.rollback()
+            locker.close()
+            claimer.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
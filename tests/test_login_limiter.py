@@ -0,0 +1,81 @@
+'''
+Business: Checks for the auth function's login throttling table: failed logins purge expired attempt keys
+Args: DATABASE_URL of a Postgres with db_migrations applied (skipped without it); run with python -m unittest discover tests
+Returns: unittest results; the attempt keys a test creates are deleted afterwards
+'''
+
+import os
+import sys
+import unittest
+import uuid
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'auth'))
+import psycopg2
+from psycopg2.extras import RealDictCursor
+import limiter
+
+DSN = os.environ.get('DATABASE_URL')
+
+
+@unittest.skipUnless(DSN, 'DATABASE_URL is not set')
+class PurgeTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.conn = psycopg2.connect(DSN)
+        self.cursor = self.conn.cursor(cursor_factory=RealDictCursor)
+        # Keys of their own, dated before anything else in the table so they are purged first
+        self.prefix = f'user:test-{uuid.uuid4().hex[:12]}-'
+
+    def tearDown(self) -> None:
+        self.conn.rollback()
+        self.cursor.execute(f'DELETE FROM {limiter.LOGIN_ATTEMPTS_TABLE} WHERE attempt_key LIKE %s', (self.prefix + '%',))
+        self.conn.commit()
+        self.conn.close()
+
+    def insert(self, name: str, window_started_at: str, locked_until: str = None) -> None:
+        self.cursor.execute(
+            f'INSERT INTO {limiter.LOGIN_ATTEMPTS_TABLE} (attempt_key, failures, window_started_at, locked_until) '
+            'VALUES (%s, 1, %s, %s)',
+            (self.prefix + name, window_started_at, locked_until)
+        )
+
+    def keys(self) -> list:
+        self.cursor.execute(
+            f'SELECT attempt_key FROM {limiter.LOGIN_ATTEMPTS_TABLE} WHERE attempt_key LIKE %s ORDER BY attempt_key',
+            (self.prefix + '%',)
+        )
+        return [row['attempt_key'][len(self.prefix):] for row in self.cursor.fetchall()]
+
+    def test_failure_purges_expired_keys_in_batches(self) -> None:
+        for day in range(1, 6):
+            self.insert(f'expired-{day}', f'2000-01-0{day}')
+        self.insert('locked', '2000-01-01', '2999-01-01')
+        self.insert('current', 'now')
+        self.conn.commit()
+
+        with mock.patch.object(limiter, 'PURGE_BATCH', 3):
+            limiter.record_failure(self.cursor, [self.prefix + 'sprayed'])
+        self.conn.commit()
+        self.assertEqual(self.keys(), ['current', 'expired-4', 'expired-5', 'locked', 'sprayed'])
+
+        limiter.record_failure(self.cursor, [self.prefix + 'sprayed'])
+        self.conn.commit()
+        self.assertEqual(self.keys(), ['current', 'locked', 'sprayed'])
+        self.cursor.execute(f'SELECT failures FROM {limiter.LOGIN_ATTEMPTS_TABLE} WHERE attempt_key = %s',
+                            (self.prefix + 'sprayed',))
+        self.assertEqual(self.cursor.fetchone()['failures'], 2)
+
+    def test_success_clears_its_key_and_every_expired_key(self) -> None:
+        for day in range(1, 6):
+            self.insert(f'expired-{day}', f'2000-01-0{day}')
+        self.insert('user', 'now')
+        self.insert('current', 'now')
+        self.conn.commit()
+
+        limiter.record_success(self.cursor, self.prefix + 'user')
+        self.conn.commit()
+        self.assertEqual(self.keys(), ['current'])
+
+
+if __name__ == '__main__':
+    unittest.main()
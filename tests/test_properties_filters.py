@@ -0,0 +1,41 @@
+'''
+Business: Checks for the properties function's filter parsing that need no database
+Args: run with python -m unittest discover tests (or pytest) from the repository root
+Returns: unittest results
+'''
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'properties'))
+from queries import ValidationError, parse_filter_object
+
+
+class ParseFilterObjectTest(unittest.TestCase):
+    def test_numeric_values(self) -> None:
+        filters = parse_filter_object({'rooms': 2, 'min_price': 1000, 'max_price': 250000.5})
+        self.assertEqual(filters, {'rooms': 2, 'min_price': 1000.0, 'max_price': 250000.5})
+
+    def test_numeric_strings_and_coordinate_lists(self) -> None:
+        filters = parse_filter_object({'rooms': '3', 'bbox': [44.4, 40.1, 44.6, 40.25]})
+        self.assertEqual(filters['rooms'], 3)
+        self.assertEqual(filters['bbox'], (44.4, 40.1, 44.6, 40.25))
+
+    def test_unknown_key_is_rejected(self) -> None:
+        with self.assertRaises(ValidationError) as raised:
+            parse_filter_object({'distrct': 'Центр'})
+        self.assertEqual(raised.exception.field, 'filter.distrct')
+
+    def test_value_that_would_be_dropped_is_rejected(self) -> None:
+        for raw in ({'rooms': 'two'}, {'rooms': True}, {'district': {'name': 'Центр'}}, {'bbox': [1, 2]}):
+            with self.subTest(raw=raw), self.assertRaises(ValidationError):
+                parse_filter_object(raw)
+
+    def test_filter_must_be_an_object(self) -> None:
+        with self.assertRaises(ValidationError):
+            parse_filter_object(['district', 'Центр'])
+
+
+if __name__ == '__main__':
+    unittest.main()
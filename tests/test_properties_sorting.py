@@ -0,0 +1,79 @@
+'''
+Business: Checks for the catalog's nullable sort orders: rows without the sort key are kept, after the keyed rows, and keyset paging crosses into them
+Args: DATABASE_URL of a Postgres with db_migrations applied (skipped without it); run with python -m unittest discover tests
+Returns: unittest results; the listings a test creates are deleted afterwards
+'''
+
+import json
+import os
+import sys
+import unittest
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'properties'))
+import psycopg2
+from queries import build_count, build_listing, parse_filters
+from serializers import _FETCHERS, fetch_page
+
+DSN = os.environ.get('DATABASE_URL')
+AREAS = [50, 50, 70, None, None, 30, None]
+
+
+@unittest.skipUnless(DSN, 'DATABASE_URL is not set')
+class NullableSortTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.conn = psycopg2.connect(DSN)
+        # A district of its own, so the filtered set is only this test's listings
+        self.district = f'test:{uuid.uuid4().hex[:12]}'
+        cursor = self.conn.cursor()
+        self.areas = {}
+        for area in AREAS:
+            cursor.execute(
+                "INSERT INTO properties (title, property_type, transaction_type, price, district, address, area) "
+                "VALUES ('Sort test', 'apartment', 'sale', 100000, %s, 'Sort test', %s) RETURNING id",
+                (self.district, area)
+            )
+            self.areas[cursor.fetchone()[0]] = area
+        self.conn.commit()
+        self.filters = parse_filters({'district': self.district})
+
+    def tearDown(self) -> None:
+        self.conn.rollback()
+        self.conn.cursor().execute('DELETE FROM properties WHERE district = %s', (self.district,))
+        self.conn.commit()
+        self.conn.close()
+
+    def expected(self, descending: bool) -> list:
+        keyed = sorted((area, id) for id, area in self.areas.items() if area is not None)
+        unkeyed = sorted(id for id, area in self.areas.items() if area is None)
+        if descending:
+            keyed.reverse()
+            unkeyed.reverse()
+        return [id for _, id in keyed] + unkeyed
+
+    def read_all(self, sort: str, serializer: str, limit: int) -> list:
+        ids, after = [], None
+        while True:
+            sql, params = build_listing(self.filters, after, limit + 1, ['id'], sort)
+            page = fetch_page(self.conn, sql, params, ['id'], limit, serializer=serializer)
+            ids += [int(item['id']) for item in json.loads(page.items_json)]
+            if not page.has_more:
+                return ids
+            after = page.last_key
+
+    def test_rows_without_the_key_follow_in_every_serializer(self) -> None:
+        for sort, descending in (('area_asc', False), ('area_desc', True)):
+            for serializer in _FETCHERS:
+                for limit in (2, 3, 10):
+                    with self.subTest(sort=sort, serializer=serializer, limit=limit):
+                        self.assertEqual(self.read_all(sort, serializer, limit), self.expected(descending))
+
+    def test_count_includes_rows_without_the_key(self) -> None:
+        cursor = self.conn.cursor()
+        cursor.execute(*build_count(self.filters))
+        self.assertEqual(cursor.fetchone()[0], len(AREAS))
+        self.conn.rollback()
+
+
+if __name__ == '__main__':
+    unittest.main()